@@ -21,6 +21,9 @@ import inspect
 import tempfile
 import warnings
 import importlib
+import zipfile
+import queue
+import threading
 import itertools
 from urllib.parse import quote_plus, unquote_plus
 import collections
@@ -29,7 +32,7 @@ import toml
 import pandas
 import numpy
 import h5py
-from openquake.baselib import InvalidFile, general
+from openquake.baselib import InvalidFile, general, config
 from openquake.baselib.python3compat import encode, decode
 
 vbytes = h5py.special_dtype(vlen=bytes)
@@ -43,6 +46,7 @@ vfloat64 = h5py.special_dtype(vlen=numpy.float64)
 FLOAT = (float, numpy.float32, numpy.float64)
 INT = (int, numpy.int32, numpy.uint32, numpy.int64, numpy.uint64)
 MAX_ROWS = 10_000_000
+CHUNK_BYTES = 256 * 1024  # target size of the chunks of the layouts
 
 
 def maybe_encode(value):
@@ -57,24 +61,141 @@ def maybe_encode(value):
     return value
 
 
+def get_filter(spec):
+    """
+    Convert a compression specification into h5py options. The
+    specification is the name of a filter (gzip or lzf), possibly followed
+    by a colon and a compression level and possibly prefixed by "shuffle+"
+
+    >>> get_filter(None)
+    {}
+    >>> get_filter('gzip')
+    {'compression': 'gzip'}
+    >>> get_filter('shuffle+gzip:1')
+    {'shuffle': True, 'compression': 'gzip', 'compression_opts': 1}
+    """
+    if not spec:
+        return {}
+    opts = {}
+    if spec.startswith('shuffle+'):
+        opts['shuffle'] = True
+        spec = spec[8:]
+    name, _, level = spec.partition(':')
+    if name not in ('gzip', 'lzf'):
+        raise ValueError('Unknown compression filter %r' % name)
+    opts['compression'] = name
+    if level:
+        opts['compression_opts'] = int(level)
+    return opts
+
+
+class Layout(object):
+    """
+    Layout profile of an HDF5 dataset, i.e. chunk shape and compression.
+
+    :param chunks:
+        the chunk size for each axis: a positive integer, None for the
+        full axis or 0 for as many elements as fit in CHUNK_BYTES; if
+        chunks is None, use the default layout of h5py
+    :param compression:
+        a filter specification as accepted by `get_filter`
+    """
+    def __init__(self, chunks, compression=None):
+        self.chunks = chunks
+        self.compression = compression
+
+    def get_chunks(self, shape, dtype):
+        """
+        :param shape: the maximum shape of the dataset, possibly extendable
+        :param dtype: the dtype of the dataset
+        :returns: the chunk shape
+        """
+        itemsize = numpy.dtype(dtype).itemsize
+        chunks = []
+        for size, chunk in zip(shape, self.chunks):
+            if chunk is None:  # full axis
+                chunk = size or 1
+            elif chunk and size:
+                chunk = min(chunk, size)
+            chunks.append(chunk)
+        if 0 in chunks:  # fill the chunk up to CHUNK_BYTES
+            i = chunks.index(0)
+            other = itemsize * numpy.prod(chunks[:i] + chunks[i + 1:])
+            chunks[i] = max(int(CHUNK_BYTES // other), 1)
+            if shape[i]:
+                chunks[i] = min(chunks[i], shape[i])
+        return tuple(chunks)
+
+    def options(self, shape, dtype, compression=None):
+        """
+        :returns: a dictionary of options for h5py.Group.create_dataset
+        """
+        opts = get_filter(compression or self.compression)
+        # uncompressed fixed-shape datasets are faster if contiguous
+        chunked = shape[0] is None or opts
+        if self.chunks and chunked and 0 not in shape:
+            opts['chunks'] = self.get_chunks(shape, dtype)
+        return opts
+
+    def __repr__(self):
+        return '<%s chunks=%s, compression=%s>' % (
+            self.__class__.__name__, self.chunks, self.compression)
+
+
+# layout profiles of the hot datasets, aligned to their access patterns;
+# run `oq benchmark_hdf5` to measure their performance
+LAYOUTS = {
+    # shape GNL: when compressed, one gsim and a tile of sites per chunk,
+    # since the PoEs are written by group and read by tiles of sites
+    '_poes': Layout((1, 0, None)),
+    # the columns are appended by task and read by slices of rows;
+    # shuffling the bytes makes them more compressible
+    'gmf_data': Layout((4096,), 'shuffle+gzip'),
+    'agg_loss_table': Layout((16384,)),
+    'ruptures': Layout((0,)),
+}
+
+
+def get_layout(name, chunks=None):
+    """
+    :param name: name of a dataset or a datagroup
+    :param chunks: if given, override the chunks of the profile
+    :returns: the layout profile of the dataset or None
+
+    The compression of the profiles can be overridden in the [hdf5]
+    section of openquake.cfg.
+    """
+    layout = LAYOUTS.get(name)
+    if layout is None:
+        return None
+    compression = config.get('hdf5', {}).get(name, layout.compression)
+    return Layout(chunks or layout.chunks, compression or None)
+
+
 def create(hdf5, name, dtype, shape=(None,), compression=None,
-           fillvalue=0, attrs=None):
+           fillvalue=0, attrs=None, layout=None):
     """
     :param hdf5: a h5py.File object
     :param name: an hdf5 key string
     :param dtype: dtype of the dataset (usually composite)
     :param shape: shape of the dataset (can be extendable)
-    :param compression: None or 'gzip' are recommended
+    :param compression: None, 'gzip' or any spec accepted by `get_filter`
     :param attrs: dictionary of attributes of the dataset
+    :param layout: a Layout instance; if None, use the profile of the name
     :returns: a HDF5 dataset
     """
+    layout = layout or get_layout(name)
+    if layout:
+        opts = layout.options(shape, dtype, compression)
+    else:
+        opts = get_filter(compression)
     if shape[0] is None:  # extendable dataset
+        opts.setdefault('chunks', True)
         dset = hdf5.create_dataset(
-            name, (0,) + shape[1:], dtype, chunks=True, maxshape=shape,
-            compression=compression)
+            name, (0,) + shape[1:], dtype, maxshape=shape, **opts)
     else:  # fixed-shape dataset
-        dset = hdf5.create_dataset(name, shape, dtype, fillvalue=fillvalue,
-                                   compression=compression)
+        dset = hdf5.create_dataset(
+            name, shape, dtype, fillvalue=fillvalue, **opts)
     if attrs:
         for k, v in attrs.items():
             dset.attrs[k] = maybe_encode(v)
@@ -113,6 +234,77 @@ def extend(dset, array, **attrs):
     return newlength
 
 
+
+class BackgroundWriter(object):
+    """
+    Perform writes on an HDF5 file in a separate thread, so that the
+    caller (typically the master receiving the task results) does not
+    wait for the disk. The queue of pending writes is bounded, so a caller
+    faster than the disk is slowed down instead of filling the memory.
+    Use it as a context manager, that waits for the pending writes on exit:
+
+     with writer:
+         writer.submit(extend, dset, array)
+
+    Outside of the context manager the writes are performed immediately.
+    An error in the writer thread is raised in the caller at the next
+    submission or on exit, and the remaining pending writes are discarded.
+
+    :param monitor: a Monitor measuring the time spent writing, or None
+    :param maxsize: the maximum number of pending writes
+    """
+    def __init__(self, monitor=None, maxsize=8):
+        self.monitor = monitor
+        self.maxsize = maxsize
+        self.thread = None
+        self.exc = None
+
+    def _write(self, func, args):
+        if self.monitor is None:
+            func(*args)
+        else:
+            with self.monitor:
+                func(*args)
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:  # sent by __exit__
+                break
+            if self.exc is None:
+                try:
+                    self._write(*item)
+                except Exception as exc:
+                    self.exc = exc
+
+    def submit(self, func, *args):
+        """
+        Call func(*args) in the writer thread, blocking if there are
+        already `maxsize` pending writes
+        """
+        if self.exc is not None:
+            exc, self.exc = self.exc, None
+            raise exc
+        if self.thread is None:
+            self._write(func, args)
+        else:
+            self.queue.put((func, args))
+
+    def __enter__(self):
+        self.queue = queue.Queue(self.maxsize)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, etype, exc, tb):
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        if self.exc is not None and etype is None:
+            exc, self.exc = self.exc, None
+            raise exc
+
+
 def cls2dotname(cls):
     """
     The full Python name (i.e. `pkg.subpkg.mod.cls`) of a class
@@ -238,6 +430,82 @@ def dset2df(dset, indexfield, filterdict):
     return pandas.DataFrame(acc, index or None)
 
 
+def _memmap(dset):
+    # return a read-only memory map of a contiguous, uncompressed dataset,
+    # or None if the data are stored in any other way
+    if (dset.chunks or dset.compression or dset.external or dset.is_virtual
+            or dset.dtype.hasobject or dset.size == 0 or
+            dset.file.driver != 'sec2' or dset.file.userblock_size):
+        return
+    offset = dset.id.get_offset()
+    if offset is None:  # compact layout or space not allocated
+        return
+    if dset.file.mode != 'r':
+        dset.file.flush()  # make sure the data are on disk
+    return numpy.memmap(
+        dset.file.filename, dset.dtype, 'r', offset, dset.shape)
+
+
+def _gen_slices(dsets, slc):
+    # yield slices of at most MAX_ROWS rows aligned to the chunk boundaries
+    # of all the datasets, so that each chunk is decompressed only once
+    start, stop, step = slc.indices(len(dsets[0]))
+    if step != 1:
+        yield slc
+        return
+    chunk = int(numpy.lcm.reduce(
+        [dset.chunks[0] if dset.chunks else 1 for dset in dsets]))
+    block = max(MAX_ROWS // chunk, 1) * chunk
+    bounds = [start] + list(range(
+        (start // block + 1) * block, stop, block)) + [max(start, stop)]
+    for a, b in zip(bounds, bounds[1:]):
+        yield slice(a, b)
+
+
+def read_slice(dset, slc=slice(None)):
+    """
+    Read a slice of a dataset without intermediate copies: contiguous and
+    uncompressed datasets are memory-mapped, while chunked datasets are
+    read block by block directly into the output array.
+
+    :param dset: an HDF5 dataset
+    :param slc: a slice object
+    :returns: a numpy array (possibly a read-only memmap)
+    """
+    start, stop, step = slc.indices(len(dset))
+    if step != 1 or dset.dtype.hasobject:
+        return dset[slc]
+    mm = _memmap(dset)
+    if mm is not None:
+        return mm[start:stop]
+    out = numpy.empty((max(stop - start, 0),) + dset.shape[1:], dset.dtype)
+    for s in _gen_slices([dset], slice(start, stop)):
+        if s.stop > s.start:
+            dset.read_direct(out, s, slice(s.start - start, s.stop - start))
+    return out
+
+
+
+def read_rows(dset, rows, idx=()):
+    """
+    Read the given rows of a dataset, one hyperslab per run of
+    consecutive rows, which is much faster than a point selection.
+
+    :param dset: an HDF5 dataset
+    :param rows: a sorted array of row indices
+    :param idx: a tuple of indices for the remaining dimensions
+    :returns: a numpy array with len(rows) rows
+    """
+    rows = numpy.asarray(rows)
+    if len(rows) == 0:
+        return dset[(slice(0, 0),) + tuple(idx)]
+    breaks = (numpy.diff(rows) != 1).nonzero()[0] + 1
+    starts = numpy.concatenate([[0], breaks])
+    stops = numpy.concatenate([breaks, [len(rows)]])
+    arrays = [dset[(slice(int(rows[start]), int(rows[stop - 1]) + 1),) +
+                   tuple(idx)] for start, stop in zip(starts, stops)]
+    return numpy.concatenate(arrays)
+
 def extract_cols(datagrp, sel, slc, columns):
     """
     :param datagrp: something like and HDF5 data group
@@ -246,23 +514,21 @@ def extract_cols(datagrp, sel, slc, columns):
     :param columns: the full list of column names
     :returns: a dictionary col -> array of values
     """
-    first = columns[0]
-    nrows = len(datagrp[first])
-    if slc.start is None and slc.stop is None:  # split in slices
-        slcs = general.gen_slices(0, nrows, MAX_ROWS)
-    else:
-        slcs = [slc]
+    if not sel:  # read the columns directly
+        return {col: read_slice(datagrp[col], slc) for col in columns}
+    dsets = [datagrp[col] for col in columns]
     acc = general.AccumDict(accum=[])  # col -> arrays
-    for slc in slcs:
+    for s in _gen_slices(dsets, slc):
+        dic = {col: read_slice(datagrp[col], s) for col in sel}
         ok = slice(None)
-        dic = {col: datagrp[col][slc] for col in sel}
         for col in sel:
             if isinstance(ok, slice):  # first selection
                 ok = dic[col] == sel[col]
             else:  # other selections
                 ok &= dic[col] == sel[col]
-        for col in columns:
-            acc[col].append(datagrp[col][slc][ok])
+        for col, dset in zip(columns, dsets):
+            arr = dic[col] if col in dic else read_slice(dset, s)
+            acc[col].append(arr[ok])
     return {k: numpy.concatenate(vs) for k, vs in acc.items()}
 
 
@@ -302,7 +568,8 @@ class File(h5py.File):
         self.path = path
         return self
 
-    def create_df(self, key, nametypes, compression=None, **kw):
+    def create_df(self, key, nametypes, compression=None, layout=None,
+                  **kw):
         """
         Create a HDF5 datagroup readable as a pandas DataFrame
 
@@ -312,12 +579,25 @@ class File(h5py.File):
             list of pairs (name, dtype) or (name, array) or DataFrame
         :param compression:
             the kind of HDF5 compression to use
+        :param layout:
+            a Layout for the columns; if None, use the profile of the key
         :param kw:
             extra attributes to store
+
+        If all the columns are given as arrays and there is no compression
+        the datasets are stored contiguously and not extendable, so that
+        they can be memory-mapped by `read_df`.
         """
         if isinstance(nametypes, pandas.DataFrame):
             nametypes = {name: nametypes[name].to_numpy()
                          for name in nametypes.columns}.items()
+        nametypes = list(nametypes)
+        layout = layout or get_layout(key)
+        if layout:
+            compression = compression or layout.compression
+        fixed = compression is None and all(
+            isinstance(value, numpy.ndarray) and len(value)
+            for _, value in nametypes)
         names = []
         for name, value in nametypes:
             is_array = isinstance(value, numpy.ndarray)
@@ -327,9 +607,14 @@ class File(h5py.File):
                 dt = value.dtype
             else:
                 dt = value
-            dset = create(self, f'{key}/{name}', dt, (None,), compression)
-            if is_array:
-                extend(dset, value)
+            if fixed:
+                dset = self.create_dataset(f'{key}/{name}', value.shape, dt)
+                dset[:] = value
+            else:
+                dset = create(self, f'{key}/{name}', dt, (None,),
+                              compression, layout=layout)
+                if is_array:
+                    extend(dset, value)
             names.append(name)
         attrs = self[key].attrs
         attrs['__pdcolumns__'] = ' '.join(names)
@@ -357,26 +642,18 @@ class File(h5py.File):
             else:
                 return pandas.DataFrame(dic).set_index(index)
 
-        dtlist = []
-        for name in dset.dtype.names:
-            dt = dset.dtype[name]
-            if dt.shape:  # vector field
-                templ = name + '_%d' * len(dt.shape)
-                for i, _ in numpy.ndenumerate(numpy.zeros(dt.shape)):
-                    dtlist.append((templ % i, dt.base))
-            else:  # scalar field
-                dtlist.append((name, dt))
-        data = numpy.zeros(len(dset), dtlist)
+        data = read_slice(dset, slc)
+        dic = {}
         for name in dset.dtype.names:
-            arr = dset[name]
             dt = dset.dtype[name]
             if dt.shape:  # vector field
                 templ = name + '_%d' * len(dt.shape)
-                for i, _ in numpy.ndenumerate(numpy.zeros(dt.shape)):
-                    data[templ % i] = arr[(slice(None),) + i]
+                for i in numpy.ndindex(*dt.shape):
+                    dic[templ % i] = data[name][(slice(None),) + i]
             else:  # scalar field
-                data[name] = arr
-        return pandas.DataFrame.from_records(data, index=index)
+                dic[name] = data[name]
+        df = pandas.DataFrame(dic)
+        return df if index is None else df.set_index(index)
 
     def save_vlen(self, key, data):  # used in SourceWriterTestCase
         """
@@ -884,11 +1161,7 @@ def _fix_array(arr, key):
     return arr
 
 
-def save_npz(obj, path):
-    """
-    :param obj: object to serialize
-    :param path: an .npz pathname
-    """
+def _npz_dict(obj):
     a = {}
     for key, val in vars(obj).items():
         if key.startswith('_'):
@@ -898,11 +1171,70 @@ def save_npz(obj, path):
             a[key] = val.encode('utf-8')
         else:
             a[key] = _fix_array(val, key)
+    return a
+
+
+def save_npz(obj, path):
+    """
+    :param obj: object to serialize
+    :param path: an .npz pathname
+    """
+    a = _npz_dict(obj)
     # turn into an error https://github.com/numpy/numpy/issues/14142
     with warnings.catch_warnings():
         warnings.filterwarnings("error", category=UserWarning)
         numpy.savez_compressed(path, **a)
 
+
+class _Sink(object):
+    # a write-only file-like object collecting the bytes; since it has
+    # no .tell method zipfile writes to it in streaming mode
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def gen_npz(obj, chunksize=4 * 1024 ** 2):
+    """
+    Serialize an object in .npz format without temporary files.
+
+    :param obj: object to serialize
+    :param chunksize: approximate size in bytes of the yielded chunks
+    :yields: the bytes of the .npz file, chunk by chunk
+    """
+    fmt = numpy.lib.format
+    sink = _Sink()
+    with zipfile.ZipFile(
+            sink, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zf:
+        for key, val in _npz_dict(obj).items():
+            arr = numpy.asanyarray(val, order='C')
+            with zf.open(key + '.npy', 'w', force_zip64=True) as f:
+                if arr.dtype.hasobject:
+                    fmt.write_array(f, arr)
+                    continue
+                header = fmt.header_data_from_array_1_0(arr)
+                try:
+                    fmt.write_array_header_1_0(f, header)
+                except ValueError:  # header too large
+                    fmt.write_array_header_2_0(f, header)
+                flat = arr.reshape(-1)
+                step = max(chunksize // max(arr.itemsize, 1), 1)
+                for start in range(0, len(flat), step):
+                    f.write(flat[start:start + step].tobytes())
+                    yield sink.drain()
+    yield sink.drain()  # the zip directory written on close
+
 # #################### obj <-> json ##################### #
 
 
@@ -16,8 +16,12 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 
+import io
+import os
 import unittest
 import numpy
+import pandas
+from openquake.baselib import hdf5
 from openquake.baselib.hdf5 import dumps
 
 
@@ -28,3 +32,111 @@ class DumpsTestCase(unittest.TestCase):
 
         dic = dict(base_path=r"C:\Users\test")
         self.assertEqual(dumps(dic), '{\n"base_path": "C:\\\\Users\\\\test"}')
+
+
+class ReadDfTestCase(unittest.TestCase):
+    def test_layouts(self):
+        # contiguous (memory-mapped), chunked and compressed column datasets
+        N = 10_000
+        cols = dict(eid=numpy.arange(N, dtype=numpy.uint32) % 7,
+                    loss=numpy.arange(N, dtype=numpy.float32))
+        exp = pandas.DataFrame(cols)
+        with hdf5.File.temporary() as f:
+            f.create_df('fixed', cols.items())
+            for compression in (None, 'gzip'):
+                key = 'chunked_%s' % compression
+                f.create_df(key, [(k, v.dtype) for k, v in cols.items()],
+                            compression)
+                for k, v in cols.items():
+                    hdf5.extend(f[f'{key}/{k}'], v)
+            self.assertIsNotNone(hdf5._memmap(f['fixed/loss']))
+            self.assertIsNone(hdf5._memmap(f['chunked_None/loss']))
+            for key in ('fixed', 'chunked_None', 'chunked_gzip'):
+                pandas.testing.assert_frame_equal(f.read_df(key), exp)
+                df = f.read_df(key, 'eid', dict(eid=3), slice(1000, 5000))
+                expdf = exp[1000:5000]
+                expdf = expdf[expdf.eid == 3].set_index('eid')
+                pandas.testing.assert_frame_equal(df, expdf)
+        os.remove(f.path)
+
+
+
+class LayoutTestCase(unittest.TestCase):
+    def test_chunks(self):
+        lay = hdf5.Layout((1, 0, None))
+        self.assertEqual(lay.get_chunks((10, 1000, 20), numpy.float64),
+                         (1, 1000, 20))
+        self.assertEqual(lay.get_chunks((10, 10_000, 20), numpy.float64),
+                         (1, hdf5.CHUNK_BYTES // 160, 20))
+        self.assertEqual(hdf5.Layout((4096,)).get_chunks(
+            (None,), numpy.uint32), (4096,))
+
+    def test_create(self):
+        with hdf5.File.temporary() as f:
+            # profile of the gmf_data columns
+            f.create_df('gmf_data', [('sid', numpy.uint32)])
+            dset = f['gmf_data/sid']
+            self.assertEqual(dset.chunks, (4096,))
+            self.assertEqual(dset.compression, 'gzip')
+            self.assertTrue(dset.shuffle)
+            # uncompressed fixed-shape datasets are contiguous
+            poes = hdf5.create(f, '_poes', numpy.float64, (2, 100, 5))
+            self.assertIsNone(poes.chunks)
+            lay = hdf5.Layout((1, 50, None), 'gzip:1')
+            arr = hdf5.create(f, 'arr', numpy.float64, (2, 100, 5),
+                              layout=lay)
+            self.assertEqual(arr.chunks, (1, 50, 5))
+            self.assertEqual(arr.compression_opts, 1)
+        os.remove(f.path)
+
+
+class ReadRowsTestCase(unittest.TestCase):
+    def test(self):
+        arr = numpy.arange(60, dtype=numpy.float32).reshape(10, 2, 3)
+        with hdf5.File.temporary() as f:
+            f['arr'] = arr
+            for rows in ([], [4], [0, 1, 2, 7, 9]):
+                numpy.testing.assert_equal(
+                    hdf5.read_rows(f['arr'], rows, (1,)), arr[rows, 1])
+        os.remove(f.path)
+
+
+class GenNpzTestCase(unittest.TestCase):
+    def test(self):
+        arr = numpy.zeros(100, [('a', float), ('b', 'S5')])
+        arr['a'] = numpy.arange(100)
+        obj = hdf5.ArrayWrapper(arr, dict(kind=['mean', 'max'], imt='PGA'))
+        chunks = list(hdf5.gen_npz(obj, chunksize=100))
+        self.assertGreater(len(chunks), 2)
+        npz = numpy.load(io.BytesIO(b''.join(chunks)))
+        numpy.testing.assert_equal(npz['array'], arr)
+        self.assertEqual(list(npz['kind']), ['mean', 'max'])
+        self.assertEqual(npz['imt'], b'PGA')
+
+
+class BackgroundWriterTestCase(unittest.TestCase):
+    def test_ordered_writes(self):
+        writer = hdf5.BackgroundWriter(maxsize=2)
+        with hdf5.File.temporary() as f:
+            dset = hdf5.create(f, 'dset', numpy.int32)
+            with writer:
+                for i in range(100):
+                    writer.submit(hdf5.extend, dset, numpy.int32([i]))
+                    self.assertLessEqual(writer.queue.qsize(), 2)
+            # all the pending writes are flushed on exit
+            numpy.testing.assert_equal(dset[()], numpy.arange(100))
+            writer.submit(hdf5.extend, dset, numpy.int32([100]))  # sync
+            self.assertEqual(len(dset), 101)
+        os.remove(f.path)
+
+    def test_error(self):
+        def fail(n):
+            raise ValueError(n)
+        writes = []
+        writer = hdf5.BackgroundWriter()
+        with self.assertRaises(ValueError):
+            with writer:
+                writer.submit(fail, 1)
+                writer.submit(writes.append, 2)  # discarded
+        self.assertEqual(writes, [])
+        self.assertIsNone(writer.exc)
@@ -21,6 +21,7 @@ import abc
 import pdb
 import logging
 import operator
+import collections
 import traceback
 from datetime import datetime
 from shapely import wkt
@@ -426,6 +427,22 @@ class HazardCalculator(BaseCalculator):
             return len(self.sitecol.complete) if self.sitecol else None
         return len(self.datastore['sitecol'])
 
+    @general.cached_property
+    def rerun_hazard(self):
+        """
+        :returns:
+            True if the hazard must be computed even if there is a parent
+            calculation, i.e. if the parent is a preclassical or if the
+            parent is a classical and the rupture_table option is set
+        """
+        parent = self.datastore.parent
+        if parent == ():
+            return False
+        mode = parent['oqparam'].calculation_mode
+        return mode == 'preclassical' or (
+            self.oqparam.rupture_table and
+            mode == self.oqparam.calculation_mode == 'classical')
+
     @property
     def few_sites(self):
         """
@@ -469,7 +486,7 @@ class HazardCalculator(BaseCalculator):
                 'Please set max_sites_disagg=%d in %s' % (
                     len(self.sitecol), oq.inputs['job_ini']))
         if ('source_model_logic_tree' in oq.inputs and
-                oq.hazard_calculation_id is None):
+                (oq.hazard_calculation_id is None or self.rerun_hazard)):
             with self.monitor('composite source model', measuremem=True):
                 self.csm = csm = readinput.get_composite_source_model(
                     oq, self.datastore.hdf5)
@@ -670,10 +687,15 @@ class HazardCalculator(BaseCalculator):
                         None: object}).array
             policy_name = array.dtype.names[0]
             policy_idx = getattr(self.assetcol.tagcol, policy_name + '_idx')
-            insurance = numpy.zeros((len(policy_idx), 2))
+            # a policy repeated on Y rows has Y layers
+            layers = collections.Counter(array[policy_name])
+            insurance = numpy.zeros(
+                (len(policy_idx), max(layers.values()), 2))
+            layer = collections.Counter()
             for pol, ded, lim in array[
                     [policy_name, 'deductible', 'insurance_limit']]:
-                insurance[policy_idx[pol]] = ded, lim
+                insurance[policy_idx[pol], layer[pol]] = ded, lim
+                layer[pol] += 1
             self.policy_dict[loss_type] = insurance
             if self.policy_name and policy_name != self.policy_name:
                 raise ValueError(
@@ -748,7 +770,11 @@ class HazardCalculator(BaseCalculator):
                      if self.datastore.parent else None)
         self.policy_name = ''
         self.policy_dict = {}
-        if 'exposure' in oq.inputs:
+        reuse = oq.reuse_exposure and oq.hazard_calculation_id
+        if reuse and 'assetcol' not in self.datastore.parent:
+            raise ValueError('reuse_exposure is set but calculation #%d has '
+                             'no exposure' % oq.hazard_calculation_id)
+        if 'exposure' in oq.inputs and not reuse:
             exposure = self.read_exposure(haz_sitecol)
             self.datastore['assetcol'] = self.assetcol
             self.datastore['cost_calculator'] = exposure.cost_calculator
@@ -756,6 +782,9 @@ class HazardCalculator(BaseCalculator):
                 self.datastore['assetcol/exposures'] = (
                     numpy.array(exposure.exposures, hdf5.vstr))
         elif 'assetcol' in self.datastore.parent:
+            if reuse:
+                logging.info('Reusing the exposure of calculation #%d',
+                             oq.hazard_calculation_id)
             assetcol = self.datastore.parent['assetcol']
             if oq.region:
                 region = wkt.loads(oq.region)
@@ -773,6 +802,9 @@ class HazardCalculator(BaseCalculator):
                              len(self.assetcol), len(assetcol))
             else:
                 self.assetcol = assetcol
+            if reuse and oq.inputs.get('insurance'):
+                k, v = zip(*oq.inputs['insurance'].items())
+                self.load_insurance_data(k, v)
         else:  # no exposure
             self.sitecol = haz_sitecol
             if self.sitecol and oq.imtls:
@@ -1174,7 +1206,7 @@ def create_gmf_data(dstore, prim_imts, sec_imts=(), data=None):
         eff_time = oq.investigation_time * oq.ses_per_logic_tree_path * R
     else:
         eff_time = 0
-    dstore.create_df('gmf_data', items, 'gzip')
+    dstore.create_df('gmf_data', items)  # compressed by its layout
     dstore.set_attrs('gmf_data', num_events=len(dstore['events']),
                      imts=' '.join(map(str, prim_imts)),
                      effective_time=eff_time)
@@ -1207,13 +1239,7 @@ def save_agg_values(dstore, assetcol, lossnames, aggby):
             kvs.append(key + val)
             lst.append(' '.join(val))
         dstore['agg_keys'] = numpy.array(kvs, dt)
-        if aggby == ['id']:
-            kids = assetcol['ordinal']
-        elif aggby == ['site_id']:
-            kids = assetcol['site_id']
-        else:
-            key2i = {key: i for i, key in enumerate(aggkey)}
-            kids = [key2i[tuple(t)] for t in assetcol[aggby]]
+        kids = assetcol.get_kids(aggby)
         dstore['assetcol/kids'] = U16(kids)
         agg_number[:K] = general.fast_agg(kids, assetcol['number'], M=K)
     agg_number[K] = assetcol['number'].sum()
@@ -33,13 +33,18 @@ from openquake.baselib.general import (
     get_nbytes_msg)
 from openquake.hazardlib.source.point import (
     PointSource, grid_point_sources, msr_name)
-from openquake.hazardlib.source.base import EPS
+from openquake.hazardlib.source.base import EPS, FaultGeom
+from openquake.hazardlib.source.rupture import to_rup_table, from_rup_table
 from openquake.hazardlib.sourceconverter import SourceGroup
+from openquake.hazardlib.imt import from_string
 from openquake.hazardlib.contexts import ContextMaker, get_effect
+from openquake.hazardlib.gsim.gmpe_table import MeanStdTable
 from openquake.hazardlib.calc.filters import split_source, SourceFilter
 from openquake.hazardlib.calc.hazard_curve import classical as hazclassical
 from openquake.hazardlib.probability_map import ProbabilityMap
 from openquake.commonlib import calc, readinput, datastore
+from openquake.commonlib.source_reader import (
+    FAULT_CODES, get_geom_key, get_rup_key)
 from openquake.calculators import getters
 from openquake.calculators import base
 
@@ -53,6 +58,7 @@ BUFFER = 1.5  # enlarge the pointsource_distance sphere to fix the weight
 # collected together in an extra-slow task, as it happens in SHARE
 # with ps_grid_spacing=50
 get_weight = operator.attrgetter('weight')
+RUPTABLE_CODES = b'PSCKX'  # sources with ruptures storable in a table
 grp_extreme_dt = numpy.dtype([('et_id', U16), ('grp_trt', hdf5.vstr),
                              ('extreme_poe', F32)])
 
@@ -61,6 +67,145 @@ def get_source_id(src):  # used in submit_tasks
     return src.source_id.split(':')[0]
 
 
+def get_geom_files(dstore):
+    """
+    :param dstore: a DataStore instance
+    :returns: the filenames of the datastore and of its ancestors
+    """
+    fnames = []
+    while dstore != ():
+        fnames.append(dstore.filename)
+        dstore = dstore.parent
+    return fnames
+
+
+def read_geoms(srcs, fnames):
+    """
+    Set the ._geom attribute of the fault sources with a FaultGeom
+    stored in one of the given files, if any.
+
+    :param srcs: a list of sources
+    :param fnames: a list of datastore filenames
+    """
+    todo = {src.geom_key for src in srcs
+            if src.code in FAULT_CODES and src._geom is None}
+    todo.discard('')
+    geoms = {}
+    for fname in fnames:
+        if not todo:
+            break
+        with hdf5.File(fname, 'r') as f:
+            if 'fault_geom' not in f:
+                continue
+            grp = f['fault_geom']
+            for key in list(todo):
+                if key in grp:
+                    # NB: the meshes are small, so they are read in memory
+                    geoms[key] = FaultGeom.from_arrays(
+                        grp[key]['mesh'][()], grp[key]['slices'][()])
+                    todo.discard(key)
+    for src in srcs:
+        if src.code in FAULT_CODES and src.geom_key in geoms:
+            src._geom = geoms[src.geom_key]
+
+
+def attach_geoms(srcs):
+    """
+    Attach a FaultGeom to the fault sources without one, so that it
+    is shared by the split sources
+    """
+    for src in srcs:
+        if src.code in FAULT_CODES and src.geom_key and src._geom is None:
+            src._geom = src.get_geom()
+
+
+def _tabular(src):
+    # True for the sources with a rupture table; point sources with
+    # more than one hypocenter or nodal plane are excluded since their
+    # ruptures depend on the pointsource_distance
+    if src.code not in RUPTABLE_CODES or not getattr(src, 'rup_key', ''):
+        return False
+    return src.code != b'P' or src.count_nphc() == 1
+
+
+def read_rup_tables(srcs, fnames, shift_hypo):
+    """
+    Set the ._rups attribute of the sources, by reading the ruptures from
+    the rupture tables stored in the given files or by generating them.
+
+    :param srcs: a list of split sources
+    :param fnames: a list of datastore filenames
+    :param shift_hypo: the shift_hypo parameter
+    :returns: a list of pairs (rup_key, ArrayWrapper) for the new tables
+    """
+    todo = {get_rup_key(src, shift_hypo): src
+            for src in srcs if _tabular(src)}
+    for fname in fnames:
+        if not todo:
+            break
+        with hdf5.File(fname, 'r') as f:
+            if 'rupture_table' not in f:
+                continue
+            grp = f['rupture_table']
+            for key in list(todo):
+                if key in grp:
+                    src = todo.pop(key)
+                    src._rups = from_rup_table(
+                        grp[key]['rups'][()], grp[key]['geoms'][()],
+                        src.tectonic_region_type,
+                        src.temporal_occurrence_model)
+    tables = []
+    for key, src in todo.items():
+        src._rups = list(src.iter_ruptures(shift_hypo=shift_hypo))
+        if src._rups:
+            tables.append((key, to_rup_table(src._rups)))
+    return tables
+
+
+def store_rup_tables(h5, tables):
+    """
+    Store the rupture tables in the datastore, if not already there
+
+    :param h5: a DataStore instance
+    :param tables: a list of pairs (rup_key, ArrayWrapper)
+    """
+    for rup_key, aw in tables:
+        key = 'rupture_table/' + rup_key
+        if key not in h5:
+            h5[key + '/rups'] = aw.array
+            h5.hdf5.save_vlen(key + '/geoms', aw.geom)
+
+
+def pop_geoms(srcs):
+    """
+    Remove the ._geom attribute from the fault sources, to avoid
+    transferring the meshes back to the master.
+
+    :param srcs: a list of sources
+    :returns: a list of pairs (geom_key, FaultGeom)
+    """
+    geoms = {}
+    for src in srcs:
+        geom = vars(src).pop('_geom', None)
+        if geom is not None and src.geom_key:
+            geoms[src.geom_key] = geom
+    return list(geoms.items())
+
+
+def store_geoms(h5, geoms):
+    """
+    Store the fault geometries in the datastore, if not already there
+    (possibly in the parent datastore)
+
+    :param h5: a DataStore instance
+    :param geoms: a list of pairs (geom_key, FaultGeom)
+    """
+    for geom_key, geom in geoms:
+        key = 'fault_geom/' + geom_key
+        if key not in h5:
+            h5[key + '/mesh'], h5[key + '/slices'] = geom.to_arrays()
+
+
 def get_extreme_poe(array, imtls):
     """
     :param array: array of shape (L, G) with L=num_levels, G=num_gsims
@@ -91,7 +236,9 @@ def run_preclassical(csm, oqparam, h5):
     param = dict(maximum_distance=oqparam.maximum_distance,
                  pointsource_distance=oqparam.pointsource_distance,
                  ps_grid_spacing=oqparam.ps_grid_spacing,
-                 split_sources=oqparam.split_sources)
+                 split_sources=oqparam.split_sources,
+                 # the current datastore cannot be read before swmr_on
+                 geom_files=get_geom_files(h5.parent) if h5 else [])
     srcfilter = SourceFilter(
         csm.sitecol.reduce(10000) if csm.sitecol else None,
         oqparam.maximum_distance)
@@ -106,6 +253,7 @@ def run_preclassical(csm, oqparam, h5):
 
     if res and h5:
         csm.update_source_info(res['calc_times'], nsites=True)
+        store_geoms(h5, res.pop('fault_geom', []))
 
     for grp_id, srcs in res.items():
         # srcs can be empty if the minimum_magnitude filter is on
@@ -169,6 +317,9 @@ def preclassical(srcs, srcfilter, params, monitor):
     md = params['maximum_distance'](trt)
     pd = (params['pointsource_distance'](trt)
           if params['pointsource_distance'] else 0)
+    with monitor('reading fault geometries'):
+        read_geoms(srcs, params['geom_files'])
+        attach_geoms(srcs)
     with monitor('splitting sources'):
         # this can be slow
         for src in srcs:
@@ -204,6 +355,7 @@ def preclassical(srcs, srcfilter, params, monitor):
                     factor = (close + (far + EPS) / nphc) / (close + far + EPS)
                     src.num_ruptures *= factor
     dic['calc_times'] = calc_times
+    dic['fault_geom'] = pop_geoms(srcs + sources + dic[grp_id])
     dic['before'] = len(sources)
     dic['after'] = len(dic[grp_id])
     if params['ps_grid_spacing']:
@@ -217,7 +369,20 @@ def classical(srcs, rlzs_by_gsim, params, monitor):
     Read the SourceFilter and call the classical calculator in hazardlib
     """
     srcfilter = monitor.read('srcfilter')
-    return hazclassical(srcs, srcfilter, rlzs_by_gsim, params, monitor)
+    with monitor('reading fault geometries'):
+        read_geoms(srcs, params['geom_files'])
+    if params['interpolate_gsims']:
+        trt = srcs[0].tectonic_region_type
+        params['gsim_tables'] = monitor.read('gsim_tables/' + trt)
+    tables = []
+    if params['rupture_table'] and not getattr(srcs, 'atomic', False):
+        srcs = [split for src in srcs for split in split_source(src)]
+        with monitor('reading rupture tables'):
+            tables = read_rup_tables(
+                srcs, params['geom_files'], params['shift_hypo'])
+    dic = hazclassical(srcs, srcfilter, rlzs_by_gsim, params, monitor)
+    dic['rup_table'] = tables
+    return dic
 
 
 class Hazard:
@@ -278,7 +443,7 @@ class ClassicalCalculator(base.HazardCalculator):
     Classical PSHA calculator
     """
     core_task = classical
-    accept_precalc = ['classical']
+    accept_precalc = ['classical', 'preclassical']
 
     def agg_dicts(self, acc, dic):
         """
@@ -314,20 +479,26 @@ class ClassicalCalculator(base.HazardCalculator):
             acc[extra['source_id'].split(':')[0]] = pmap
 
         self.maxradius = max(self.maxradius, extra.pop('maxradius'))
+        for gsim, errors in extra.pop('gsim_errors').items():
+            self.gsim_errors[gsim] = numpy.maximum(
+                self.gsim_errors.get(gsim, 0), errors)
         with self.monitor('aggregate curves'):
             if pmap:
                 self.haz.init(acc, grp_id)
                 acc[grp_id] |= pmap
 
+        # the writes are performed by the background writer
+        if dic['rup_table']:
+            self.writer.submit(
+                store_rup_tables, self.datastore, dic['rup_table'])
+
         # store rup_data if there are few sites
         if self.few_sites and len(dic['rup_data']['src_id']):
-            with self.monitor('saving rup_data'):
-                store_ctxs(self.datastore, dic['rup_data'], grp_id)
+            self.writer.submit(
+                store_ctxs, self.datastore, dic['rup_data'], grp_id)
 
-        if self.counts[grp_id] == 0:
-            with self.monitor('saving probability maps'):
-                if grp_id in acc:
-                    self.haz.store_poes(grp_id, acc.pop(grp_id))
+        if self.counts[grp_id] == 0 and grp_id in acc:
+            self.writer.submit(self.haz.store_poes, grp_id, acc.pop(grp_id))
         return acc
 
     def create_dsets(self):
@@ -365,6 +536,7 @@ class ClassicalCalculator(base.HazardCalculator):
             self.datastore.create_df('rup', descr, 'gzip')
         self.by_task = {}  # task_no => src_ids
         self.maxradius = 0
+        self.gsim_errors = {}  # gsim -> (mean error, std error)
         self.Ns = len(self.csm.source_info)
         self.rel_ruptures = AccumDict(accum=0)  # trt -> rel_ruptures
         # NB: the relevant ruptures are less than the effective ruptures,
@@ -402,7 +574,7 @@ class ClassicalCalculator(base.HazardCalculator):
 
     def init(self):
         super().init()
-        if self.oqparam.hazard_calculation_id:
+        if self.oqparam.hazard_calculation_id and not self.rerun_hazard:
             full_lt = self.datastore.parent['full_lt']
             et_ids = self.datastore.parent['et_ids'][:]
         else:
@@ -435,7 +607,12 @@ class ClassicalCalculator(base.HazardCalculator):
         self.ct = (self.oqparam.concurrent_tasks or 1) * 2.5
         # NB: it is CRITICAL for performance to have shape GNL and not NLG
         # dset[g, :, :] = XXX is fast, dset[:, :, g] = XXX is ultra-slow
-        self.datastore.create_dset('_poes', F64, poes_shape)
+        # if compressed, a chunk contains the tile of sites of a PmapGetter
+        # in post_execute, up to 64 MB
+        tile = -(-self.N // (self.oqparam.concurrent_tasks or 1))
+        tile = min(tile, 2 ** 23 // nlevels)
+        layout = hdf5.get_layout('_poes', (1, tile, None))
+        self.datastore.create_dset('_poes', F64, poes_shape, layout=layout)
         if not self.oqparam.hazard_calculation_id:
             self.datastore.swmr_on()
 
@@ -446,7 +623,8 @@ class ClassicalCalculator(base.HazardCalculator):
         tectonic region type.
         """
         oq = self.oqparam
-        if oq.hazard_calculation_id and not oq.compare_with_classical:
+        if (oq.hazard_calculation_id and not oq.compare_with_classical
+                and not self.rerun_hazard):
             with datastore.read(self.oqparam.hazard_calculation_id) as parent:
                 self.full_lt = parent['full_lt']
             self.calc_stats()  # post-processing
@@ -455,6 +633,10 @@ class ClassicalCalculator(base.HazardCalculator):
         assert oq.max_sites_per_tile > oq.max_sites_disagg, (
             oq.max_sites_per_tile, oq.max_sites_disagg)
         psd = self.set_psd()  # must go before to set the pointsource_distance
+        if oq.rupture_table:
+            # key of the rupture tables stored in the datastore
+            for src in self.csm.get_sources(atomic=False):
+                src.rup_key = get_geom_key(src)
         run_preclassical(self.csm, oq, self.datastore)
 
         # exit early if we want to perform only a preclassical
@@ -479,16 +661,37 @@ class ClassicalCalculator(base.HazardCalculator):
         logging.info('Sending %d tasks', len(args))
         smap = parallel.Starmap(classical, args, h5=self.datastore.hdf5)
         smap.monitor.save('srcfilter', self.src_filter())
+        if oq.interpolate_gsims:
+            with self.monitor('building gsim tables'):
+                for trt, tables in self.build_gsim_tables().items():
+                    smap.monitor.save('gsim_tables/' + trt, tables)
         self.datastore.swmr_on()
         smap.h5 = self.datastore.hdf5
-        pmaps = smap.reduce(self.agg_dicts)
+        self.writer = hdf5.BackgroundWriter(self.monitor('saving poes'))
+        with self.writer:
+            pmaps = smap.reduce(self.agg_dicts)
         logging.debug("busy time: %s", smap.busytime)
         self.haz.store_disagg(pmaps)
-        if not oq.hazard_calculation_id:
+        if not oq.hazard_calculation_id or self.rerun_hazard:
             self.haz.store_disagg()
         self.store_info(psd)
         return True
 
+    def build_gsim_tables(self):
+        """
+        :returns: a dictionary trt -> {gsim string: MeanStdTable}
+        """
+        oq = self.oqparam
+        imts = [from_string(imt) for imt in oq.imtls]
+        tables = {}
+        for trt, gsims in self.full_lt.get_gsims_by_trt().items():
+            mags = self.datastore['source_mags/' + trt][()].astype(float)
+            maxdist = oq.maximum_distance(trt)
+            tables[trt] = {str(gsim): MeanStdTable(
+                gsim, imts, mags, maxdist, self.sitecol.complete)
+                           for gsim in gsims}
+        return tables
+
     def store_info(self, psd):
         """
         Store full_lt, source_info and by_task
@@ -511,6 +714,10 @@ class ClassicalCalculator(base.HazardCalculator):
                 es[task_no] = effsites
                 si[task_no] = ' '.join(source_ids[s] for s in srcids)
             self.by_task.clear()
+        for gsim, (mean_err, std_err) in sorted(self.gsim_errors.items()):
+            logging.info('Max errors of the interpolated %s: %.4f on the '
+                         'log-mean, %.4f on the stddev', gsim,
+                         mean_err, std_err)
         if self.calc_times:  # can be empty in case of errors
             self.numctxs = sum(arr[0] for arr in self.calc_times.values())
             numsites = sum(arr[1] for arr in self.calc_times.values())
@@ -570,7 +777,10 @@ class ClassicalCalculator(base.HazardCalculator):
             min_weight=oq.min_weight,
             collapse_level=oq.collapse_level, hint=hint,
             max_sites_disagg=oq.max_sites_disagg,
-            split_sources=oq.split_sources, af=self.af)
+            split_sources=oq.split_sources, af=self.af,
+            rupture_table=oq.rupture_table,
+            interpolate_gsims=oq.interpolate_gsims,
+            geom_files=get_geom_files(self.datastore))
         return psd
 
     def get_args(self, grp_ids, hazard):
@@ -657,8 +867,8 @@ class ClassicalCalculator(base.HazardCalculator):
               if name.startswith('rup_')}
         if nr:  # few sites, log the number of ruptures per magnitude
             logging.info('%s', nr)
-        if (self.oqparam.hazard_calculation_id is None
-                and '_poes' in self.datastore):
+        if ((self.oqparam.hazard_calculation_id is None
+             or self.rerun_hazard) and '_poes' in self.datastore):
             self.datastore.swmr_on()  # needed
             self.calc_stats()
 
@@ -699,8 +909,9 @@ class ClassicalCalculator(base.HazardCalculator):
         ct = oq.concurrent_tasks or 1
         logging.info('Building hazard statistics')
         self.weights = [rlz.weight for rlz in self.realizations]
-        dstore = (self.datastore.parent if oq.hazard_calculation_id
-                  else self.datastore)
+        from_parent = (oq.hazard_calculation_id and
+                       not self.rerun_hazard)
+        dstore = self.datastore.parent if from_parent else self.datastore
         allargs = [  # this list is very fast to generate
             (getters.PmapGetter(
                 dstore, self.weights, t.sids, oq.imtls, oq.poes),
@@ -711,7 +922,7 @@ class ClassicalCalculator(base.HazardCalculator):
             dist = 'no'
         else:
             dist = None  # parallelize as usual
-        if oq.hazard_calculation_id is None:  # essential before Starmap
+        if not from_parent:  # essential before Starmap
             self.datastore.swmr_on()
         self.hazard = {}  # kind -> array
         parallel.Starmap(
@@ -40,33 +40,24 @@ def classical_risk(riskinputs, param, monitor):
     weights = [w['default'] for w in param['weights']]
     statnames, stats = zip(*param['stats'])
     for ri in riskinputs:
-        A = len(ri.assets)
-        L = len(crmodel.lti)
         R = ri.hazard_getter.num_rlzs
-        loss_curves = numpy.zeros((R, L, A), object)
-        avg_losses = numpy.zeros((R, L, A))
-        for out in ri.gen_outputs(crmodel, monitor):
-            r = out['rlzi']
+        outs = list(ri.gen_outputs(crmodel, monitor))
+        # there are R consecutive outputs for each taxonomy
+        for start in range(0, len(outs), R):
+            group = outs[start:start + R]
+            aids = group[0]['assets']['ordinal']
             for li, loss_type in enumerate(crmodel.loss_types):
-                # loss_curves has shape (A, C)
-                for i, asset in enumerate(out['assets']):
-                    loss_curves[r, li, i] = lc = out[loss_type][i]
-                    aid = asset['ordinal']
-                    avg = scientific.average_loss(lc)
-                    avg_losses[r, li, i] = avg
-                    lcurve = (lc['loss'], lc['poe'], avg)
-                    result['loss_curves'].append((li, r, aid, lcurve))
-
-        # compute statistics
-        for li, loss_type in enumerate(crmodel.loss_types):
-            for i, asset in enumerate(out['assets']):
-                avg_stats = compute_stats(avg_losses[:, li, i], stats, weights)
-                losses = loss_curves[0, li, i]['loss']
-                all_poes = numpy.array(
-                    [loss_curves[r, li, i]['poe'] for r in range(R)])
-                poes_stats = compute_stats(all_poes, stats, weights)
+                curves = numpy.array([out[loss_type] for out in group])
+                losses = curves['loss']  # shape (R, A, C)
+                poes = curves['poe']  # shape (R, A, C), the same for all A
+                avgs = scientific.average_loss(curves)  # shape (R, A)
+                result['loss_curves'].append((li, aids, losses, poes, avgs))
+                # the poes do not depend on the asset, so their statistics
+                # are computed only once and broadcast
+                poes_stats = compute_stats(poes[:, 0], stats, weights)
+                avg_stats = compute_stats(avgs, stats, weights)
                 result['stat_curves'].append(
-                    (li, asset['ordinal'], losses, poes_stats, avg_stats))
+                    (li, aids, losses[0], poes_stats, avg_stats))
     if R == 1:  # the realization is the same as the mean
         del result['loss_curves']
     return result
@@ -116,12 +107,15 @@ class ClassicalRiskCalculator(base.RiskCalculator):
         stats = list(self.oqparam.hazard_stats())
         stat_curves = numpy.zeros((self.A, self.S), self.loss_curve_dt)
         avg_losses = numpy.zeros((self.A, self.S, self.L), F32)
-        for li, a, losses, statpoes, statloss in result['stat_curves']:
+        for li, aids, losses, statpoes, statloss in result['stat_curves']:
             stat_curves_lt = stat_curves[ltypes[li]]
+            C = losses.shape[1]
             for s in range(self.S):
-                avg_losses[a, s, li] = statloss[s]
-                base.set_array(stat_curves_lt['poes'][a, s], statpoes[s])
-                base.set_array(stat_curves_lt['losses'][a, s], losses)
+                avg_losses[aids, s, li] = statloss[s]
+                stat_curves_lt['poes'][aids, s, :C] = statpoes[s]
+                stat_curves_lt['poes'][aids, s, C:] = numpy.nan
+                stat_curves_lt['losses'][aids, s, :C] = losses
+                stat_curves_lt['losses'][aids, s, C:] = numpy.nan
         self.datastore['avg_losses-stats'] = avg_losses
         self.datastore.set_shape_descr(
             'avg_losses-stats', asset_id=self.assetcol['id'],
@@ -132,11 +126,15 @@ class ClassicalRiskCalculator(base.RiskCalculator):
         if self.R > 1:  # individual realizations saved only if many
             loss_curves = numpy.zeros((self.A, self.R), self.loss_curve_dt)
             avg_losses = numpy.zeros((self.A, self.R, self.L), F32)
-            for li, r, a, (losses, poes, avg) in result['loss_curves']:
-                lc = loss_curves[a, r][ltypes[li]]
-                avg_losses[a, r, li] = avg
-                base.set_array(lc['losses'], losses)
-                base.set_array(lc['poes'], poes)
+            for li, aids, losses, poes, avgs in result['loss_curves']:
+                lc = loss_curves[ltypes[li]]
+                C = losses.shape[2]
+                for r in range(self.R):
+                    avg_losses[aids, r, li] = avgs[r]
+                    lc['losses'][aids, r, :C] = losses[r]
+                    lc['losses'][aids, r, C:] = numpy.nan
+                    lc['poes'][aids, r, :C] = poes[r]
+                    lc['poes'][aids, r, C:] = numpy.nan
             self.datastore['avg_losses-rlzs'] = avg_losses
             self.datastore.set_shape_descr(
                 'avg_losses-rlzs', asset_id=self.assetcol['id'],
@@ -209,29 +209,13 @@ class EventBasedCalculator(base.HazardCalculator):
         :param acc: accumulator dictionary
         :param result: an AccumDict with events, ruptures, gmfs and hcurves
         """
-        sav_mon = self.monitor('saving gmfs')
         agg_mon = self.monitor('aggregating hcurves')
-        primary = self.oqparam.get_primary_imtls()
-        sec_imts = self.oqparam.get_sec_imts()
-        with sav_mon:
-            df = result.pop('gmfdata')
-            if len(df):
-                dset = self.datastore['gmf_data/sid']
-                times = result.pop('times')
-                [task_no] = numpy.unique(times['task_no'])
-                rupids = list(times['rup_id'])
-                self.datastore['gmf_data/time_by_rup'][rupids] = times
-                hdf5.extend(dset, df.sid.to_numpy())
-                hdf5.extend(self.datastore['gmf_data/eid'], df.eid.to_numpy())
-                for m in range(len(primary)):
-                    hdf5.extend(self.datastore[f'gmf_data/gmv_{m}'],
-                                df[f'gmv_{m}'])
-                for sec_imt in sec_imts:
-                    hdf5.extend(self.datastore[f'gmf_data/{sec_imt}'],
-                                df[sec_imt])
-                sig_eps = result.pop('sig_eps')
-                hdf5.extend(self.datastore['gmf_data/sigma_epsilon'], sig_eps)
-                self.offset += len(df)
+        df = result.pop('gmfdata')
+        if len(df):
+            # the writes are performed by the background writer
+            self.writer.submit(self.save_gmfs, df, result.pop('times'),
+                               result.pop('sig_eps'))
+            self.offset += len(df)
         if self.offset >= TWO32:
             raise RuntimeError(
                 'The gmf_data table has more than %d rows' % TWO32)
@@ -241,9 +225,25 @@ class EventBasedCalculator(base.HazardCalculator):
                 r, sid, imt = str2rsi(key)
                 array = acc[r].setdefault(sid, 0).array[imtls(imt), 0]
                 array[:] = 1. - (1. - array) * (1. - poes)
-        self.datastore.flush()
         return acc
 
+    def save_gmfs(self, df, times, sig_eps):
+        """
+        Save the GMFs, the times by rupture and the sigma_epsilon arrays
+        produced by a task; called by the background writer
+        """
+        primary = self.oqparam.get_primary_imtls()
+        sec_imts = self.oqparam.get_sec_imts()
+        self.datastore['gmf_data/time_by_rup'][list(times['rup_id'])] = times
+        hdf5.extend(self.datastore['gmf_data/sid'], df.sid.to_numpy())
+        hdf5.extend(self.datastore['gmf_data/eid'], df.eid.to_numpy())
+        for m in range(len(primary)):
+            hdf5.extend(self.datastore[f'gmf_data/gmv_{m}'], df[f'gmv_{m}'])
+        for sec_imt in sec_imts:
+            hdf5.extend(self.datastore[f'gmf_data/{sec_imt}'], df[sec_imt])
+        hdf5.extend(self.datastore['gmf_data/sigma_epsilon'], sig_eps)
+        self.datastore.flush()
+
     def set_param(self, **kw):
         oq = self.oqparam
         if oq.ground_motion_fields and oq.min_iml.sum() == 0:
@@ -357,7 +357,9 @@ class EventBasedCalculator(base.HazardCalculator):
         smap = parallel.Starmap(
             self.core_task.__func__, allargs, h5=self.datastore.hdf5)
         smap.monitor.save('srcfilter', self.srcfilter)
-        acc = smap.reduce(self.agg_dicts, self.acc0())
+        self.writer = hdf5.BackgroundWriter(self.monitor('saving gmfs'))
+        with self.writer:
+            acc = smap.reduce(self.agg_dicts, self.acc0())
         if 'gmf_data' not in self.datastore:
             return acc
         if oq.ground_motion_fields:
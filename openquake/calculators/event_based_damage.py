@@ -27,6 +27,7 @@ from openquake.calculators.event_based_risk import EventBasedRiskCalculator
 from openquake.calculators.post_risk import get_loss_builder
 
 U8 = numpy.uint8
+I64 = numpy.int64
 U16 = numpy.uint16
 U32 = numpy.uint32
 F32 = numpy.float32
@@ -54,7 +55,7 @@ def event_based_damage(df, param, monitor):
     :param df: a DataFrame of GMFs with fields sid, eid, gmv_...
     :param param: a dictionary of parameters coming from the job.ini
     :param monitor: a Monitor instance
-    :returns: damages as a dictionary (eid, kid) -> LD
+    :returns: a DataFrame (event_id, agg_id, loss_id, dmg_1, ...)
     """
     mon_risk = monitor('computing risk', measuremem=False)
     dstore = datastore.read(param['hdf5path'])
@@ -72,14 +73,15 @@ def event_based_damage(df, param, monitor):
     ci = {dc: i + 1 for i, dc in enumerate(dmg_csq)}
     DC = len(ci) + 1
     with mon_risk:
-        dddict = general.AccumDict(accum=numpy.zeros((L, DC), F32))  # eid, kid
+        # damages keyed by the integer (eid * (K + 1) + kid) * L + lti
+        acc = DamageAccumulator(DC)
         for taxo, asset_df in assets_df.groupby('taxonomy'):
             for sid, adf in asset_df.groupby('site_id'):
                 gmf_df = df[df.sid == sid]
                 if len(gmf_df) == 0:
                     continue
                 out = crmodel.get_output(taxo, adf, gmf_df)
-                eids = out['eids']
+                eids = I64(out['eids']) * (K + 1)
                 aids = out['assets']['ordinal']
                 for lti, lt in enumerate(out['loss_types']):
                     fractions = out[lt]
@@ -91,28 +93,53 @@ def event_based_damage(df, param, monitor):
                         csq = crmodel.compute_csq(asset, fractions[a], lt)
                         for name, values in csq.items():
                             ddd[a, :, ci[name]] = values
-                    tot = ddd.sum(axis=0)
-                    for e, eid in enumerate(eids):
-                        dddict[eid, K][lti] += tot[e]
-                        if K:
-                            for a, aid in enumerate(aids):
-                                dddict[eid, kids[aid]][lti] += ddd[a, e]
-    return to_dframe(dddict, ci, L)
-
-
-def to_dframe(adic, ci, L):
-    dic = general.AccumDict(accum=[])
-    for (eid, kid), dd in sorted(adic.items()):
-        for lti in range(L):
-            dic['event_id'].append(eid)
-            dic['agg_id'].append(kid)
-            dic['loss_id'].append(lti)
-            for sname, si in ci.items():
-                dic[sname].append(dd[lti, si])
-    fix_dtype(dic, U32, ['event_id'])
-    fix_dtype(dic, U16, ['agg_id'])
-    fix_dtype(dic, U8, ['loss_id'])
-    fix_dtype(dic, F32, ci)
+                    acc.add((eids + K) * L + lti, ddd.sum(axis=0))
+                    if K:
+                        keys = (eids + kids[aids, None]) * L + lti  # (A, E)
+                        acc.add(keys.flatten(), ddd.reshape(-1, DC))
+    return to_dframe(*acc.reduce(), ci, K, L)
+
+
+class DamageAccumulator(object):
+    """
+    Accumulate damages with integer keys, by reducing them with a sort
+    when the number of stored rows exceeds `maxrows`
+    """
+    def __init__(self, DC, maxrows=1_000_000):
+        self.DC = DC
+        self.maxrows = maxrows
+        self.keys = []
+        self.values = []
+        self.nrows = 0
+
+    def add(self, keys, values):
+        self.keys.append(keys)
+        self.values.append(values)
+        self.nrows += len(keys)
+        if self.nrows > self.maxrows:
+            keys, values = self.reduce()
+            self.keys, self.values = [keys], [values]
+            self.nrows = len(keys)
+
+    def reduce(self):
+        """
+        :returns: (U unique keys, U summed damages)
+        """
+        if not self.keys:
+            return numpy.zeros(0, I64), numpy.zeros((0, self.DC), F32)
+        return general.fast_agg2(numpy.concatenate(self.keys),
+                                 numpy.concatenate(self.values))
+
+
+def to_dframe(keys, values, ci, K, L):
+    """
+    :returns: a DataFrame (event_id, agg_id, loss_id, dmg_1, ...)
+    """
+    eids, rest = numpy.divmod(keys, (K + 1) * L)
+    kids, ltis = numpy.divmod(rest, L)
+    dic = dict(event_id=U32(eids), agg_id=U16(kids), loss_id=U8(ltis))
+    for sname, si in ci.items():
+        dic[sname] = F32(values[:, si])
     return pandas.DataFrame(dic)
 
 
@@ -158,27 +185,32 @@ class DamageCalculator(EventBasedRiskCalculator):
         logging.info('Building aggregated curves from %s of agg_loss_table',
                      general.humansize(size))
         builder = get_loss_builder(self.datastore)
-        alt_df = self.datastore.read_df('agg_loss_table')
-        del alt_df['event_id']
-        dic = general.AccumDict(accum=[])
-        columns = sorted(
-            set(alt_df.columns) - {'agg_id', 'loss_id', 'variance'})
+        # read one column at a time, to keep the memory occupation low
+        alt = self.datastore.getitem('agg_loss_table')
+        columns = sorted(set(alt.attrs['__pdcolumns__'].split()) -
+                         {'event_id', 'agg_id', 'loss_id', 'variance'})
         periods = [0] + list(builder.return_periods)
-        for (agg_id, loss_id), df in alt_df.groupby(
-                [alt_df.agg_id, alt_df.loss_id]):
-            tots = [df[col].sum() * oq.time_ratio for col in columns]
-            curves = [builder.build_curve(df[col].to_numpy())
-                      for col in columns]
-            for p, period in enumerate(periods):
-                dic['agg_id'].append(agg_id)
-                dic['loss_id'].append(loss_id)
-                dic['return_period'].append(period)
-                if p == 0:
-                    for col, tot in zip(columns, tots):
-                        dic[col].append(tot)
-                else:
-                    for col, curve in zip(columns, curves):
-                        dic[col].append(curve[p - 1])
+        # sort by (agg_id, loss_id) and build all the curves at once
+        agg_ids = alt['agg_id'][:]
+        loss_ids = alt['loss_id'][:]
+        order = numpy.lexsort((loss_ids, agg_ids))
+        agg_ids, loss_ids = agg_ids[order], loss_ids[order]
+        new = numpy.ones(len(order), bool)
+        new[1:] = (agg_ids[1:] != agg_ids[:-1]) | (
+            loss_ids[1:] != loss_ids[:-1])
+        starts, = numpy.where(new)
+        offsets = numpy.append(starts, len(order))
+        G, P1 = len(starts), len(periods)
+        dic = dict(agg_id=numpy.repeat(agg_ids[starts], P1),
+                   loss_id=numpy.repeat(loss_ids[starts], P1),
+                   return_period=numpy.tile(periods, G))
+        for col in columns:
+            values = alt[col][:][order]
+            res = numpy.zeros((G, P1))
+            res[:, 0] = numpy.add.reduceat(
+                values, starts, dtype=float) * oq.time_ratio
+            res[:, 1:] = builder.build_curves(values, offsets)
+            dic[col] = res.flatten()
         fix_dtype(dic, U16, ['agg_id'])
         fix_dtype(dic, U8, ['loss_id'])
         fix_dtype(dic, U32, ['return_period'])
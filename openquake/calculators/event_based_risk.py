@@ -70,6 +70,36 @@ def aggregate_losses(alt, K, kids, correl):
     return lbe
 
 
+def gen_outputs(df, assets_df, crmodel, param, rndgen, mon_risk):
+    """
+    Yield a single output for all taxonomies when the vulnerability
+    functions can be packed, otherwise an output per taxonomy. The
+    secondary losses (i.e. the insured losses) are computed in a separate
+    stage, starting from the ground-up losses.
+    """
+    vtables = crmodel.get_vtables()
+    if vtables:
+        with mon_risk:
+            outs = [crmodel.get_event_losses(assets_df, df, vtables, rndgen)]
+    else:
+        outs = _gen_outputs_by_taxo(df, assets_df, crmodel, rndgen, mon_risk)
+    for out in outs:
+        with mon_risk:
+            for sec_loss in param['sec_losses']:
+                sec_loss.update(out, assets_df)
+        yield out
+
+
+def _gen_outputs_by_taxo(df, assets_df, crmodel, rndgen, mon_risk):
+    for taxo, asset_df in assets_df.groupby('taxonomy'):
+        gmf_df = df[numpy.isin(df.sid.to_numpy(), asset_df.site_id.to_numpy())]
+        if len(gmf_df) == 0:
+            continue
+        with mon_risk:
+            out = crmodel.get_output(taxo, asset_df, gmf_df, rndgen=rndgen)
+        yield out
+
+
 def event_based_risk(df, param, monitor):
     """
     :param df: a DataFrame of GMFs with fields sid, eid, gmv_...
@@ -100,14 +130,7 @@ def event_based_risk(df, param, monitor):
     else:
         rndgen = MultiEventRNG(
             param['master_seed'], numpy.unique(df.eid), correl)
-    for taxo, asset_df in assets_df.groupby('taxonomy'):
-        gmf_df = df[numpy.isin(df.sid.to_numpy(), asset_df.site_id.to_numpy())]
-        if len(gmf_df) == 0:
-            continue
-        with mon_risk:
-            out = crmodel.get_output(
-                taxo, asset_df, gmf_df, param['sec_losses'], rndgen)
-
+    for out in gen_outputs(df, assets_df, crmodel, param, rndgen, mon_risk):
         for lni, ln in enumerate(crmodel.oqparam.loss_names):
             alt = out[ln]
             if len(alt) == 0:
@@ -323,6 +346,8 @@ class EventBasedRiskCalculator(event_based.EventBasedCalculator):
         """
         Compute risk from GMFs or ruptures depending on what is stored
         """
+        self.writer = hdf5.BackgroundWriter(
+            self.monitor('saving agg_loss_table'))
         if 'gmf_data' not in self.datastore:  # start from ruptures
             smap = parallel.Starmap(start_ebrisk, h5=self.datastore.hdf5)
             smap.monitor.save('srcfilter', self.src_filter())
@@ -331,7 +356,8 @@ class EventBasedRiskCalculator(event_based.EventBasedCalculator):
             for rg in getters.gen_rupture_getters(
                     self.datastore, self.oqparam.concurrent_tasks):
                 smap.submit((rg, self.param))
-            smap.reduce(self.agg_dicts)
+            with self.writer:
+                smap.reduce(self.agg_dicts)
             gmf_bytes = self.datastore['gmf_info']['gmfbytes']
             if len(gmf_bytes) == 0:
                 raise RuntimeError(
@@ -345,7 +371,8 @@ class EventBasedRiskCalculator(event_based.EventBasedCalculator):
             smap.monitor.save('assets', self.assetcol.to_dframe())
             smap.monitor.save('crmodel', self.crmodel)
             smap.monitor.save('rlz_id', self.rlzs)
-            smap.reduce(self.agg_dicts)
+            with self.writer:
+                smap.reduce(self.agg_dicts)
         return 1
 
     def agg_dicts(self, dummy, dic):
@@ -355,20 +382,28 @@ class EventBasedRiskCalculator(event_based.EventBasedCalculator):
         """
         if not dic:
             return
+        # the writes are performed by the background writer
         if 'gmf_info' in dic:
-            hdf5.extend(self.datastore['gmf_info'], dic.pop('gmf_info'))
+            self.writer.submit(
+                hdf5.extend, self.datastore['gmf_info'], dic.pop('gmf_info'))
             return
         lti = self.oqparam.lti
         self.oqparam.ground_motion_fields = False  # hack
-        with self.monitor('saving agg_loss_table'):
-            for ln, ls in dic.items():
-                if isinstance(ls, pandas.DataFrame):
-                    for name in ls.columns:
-                        dset = self.datastore['agg_loss_table/' + name]
-                        hdf5.extend(dset, ls[name].to_numpy())
-                else:  # summing avg_losses, fast
-                    for coo in ls:
-                        self.avg_losses[coo.row, coo.col, lti[ln]] += coo.data
+        for ln, ls in dic.items():
+            if isinstance(ls, pandas.DataFrame):
+                self.writer.submit(self.save_alt, ls)
+            else:  # summing avg_losses, fast
+                for coo in ls:
+                    self.avg_losses[coo.row, coo.col, lti[ln]] += coo.data
+
+    def save_alt(self, df):
+        """
+        Append a DataFrame of losses to the agg_loss_table; called by the
+        background writer
+        """
+        for name in df.columns:
+            dset = self.datastore['agg_loss_table/' + name]
+            hdf5.extend(dset, df[name].to_numpy())
 
     def post_execute(self, dummy):
         """
@@ -15,10 +15,18 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake. If not, see <http://www.gnu.org/licenses/>.
+import os
+import gzip
+import shutil
 import zipfile
 import logging
-from openquake.baselib.general import CallableDict
-from openquake.commonlib.writers import write_csv
+import numpy
+import pandas
+from openquake.baselib import hdf5, parallel
+from openquake.baselib.general import CallableDict, gen_slices, gettemp
+from openquake.commonlib.writers import write_csv, FIVEDIGITS
+
+ROWS_PER_PART = 1_000_000  # rows in a sorted block of a streaming export
 
 
 class MissingExporter(Exception):
@@ -78,3 +86,208 @@ def export_input_zip(ekey, dstore):
             logging.info('Archiving %s' % k)
             z.writestr(k, data)
     return [dest]
+
+
+def _open(fname, mode):
+    # open a text file, gzip-compressed if the name ends with .gz
+    if fname.endswith('.gz'):
+        return gzip.open(fname, mode + 't', newline='')
+    return open(fname, mode, newline='')
+
+
+def _write_runs(datagrp, sel, keys, tmp, blocksize):
+    # first pass of the external sort: store blocks of rows sorted by keys
+    # in the temporary file and count the rows by value of the first key
+    columns = datagrp.attrs['__pdcolumns__'].split()
+    for col in columns:
+        hdf5.create(tmp, col, datagrp[col].dtype)
+    counts = numpy.zeros(0, int)
+    runs = []
+    nrows = len(datagrp[columns[0]])
+    for slc in gen_slices(0, nrows, blocksize):
+        dic = hdf5.extract_cols(datagrp, sel, slc, columns)
+        order = numpy.lexsort([dic[key] for key in reversed(keys)])
+        for col in columns:
+            hdf5.extend(tmp[col], dic[col][order])
+        cnt = numpy.bincount(dic[keys[0]])
+        if len(cnt) > len(counts):
+            counts = numpy.pad(counts, (0, len(cnt) - len(counts)))
+        counts[:len(cnt)] += cnt
+        runs.append(len(order))
+    return columns, runs, counts
+
+
+def _gen_slices(key0, runs, counts, blocksize):
+    # yield, for each range of values of the first key, the slices of the
+    # sorted runs containing it; the ranges contain ~blocksize rows and
+    # key0 is the dataset of the first key, read one run at the time
+    cum = counts.cumsum()
+    edges = numpy.searchsorted(
+        cum, numpy.arange(blocksize, cum[-1], blocksize), 'right')
+    edges = numpy.unique(
+        numpy.concatenate([[0], edges, [len(counts)]]))
+    pos = []  # for each run, the positions of the edges
+    start = 0
+    for nrows in runs:
+        pos.append(start + numpy.searchsorted(
+            key0[start:start + nrows], edges))
+        start += nrows
+    for i in range(len(edges) - 1):
+        yield [slice(p[i], p[i + 1]) for p in pos if p[i + 1] > p[i]]
+
+
+def export_block(tmpname, slices, keys, dest, transform, args, monitor):
+    """
+    Merge the given slices of the sorted runs and write them in CSV format
+    (without header) on the file `dest`, compressed if it ends with .gz
+
+    :returns: a dictionary with the destination and the header
+    """
+    with hdf5.File(tmpname, 'r') as h5:
+        columns = h5.attrs['columns'].split()
+        dic = {col: numpy.concatenate([h5[col][s] for s in slices])
+               for col in columns}
+        order = numpy.lexsort([dic[key] for key in reversed(keys)])
+        df = pandas.DataFrame({col: dic[col][order] for col in columns})
+        if transform:
+            df = transform(df, h5, *args)
+    with _open(dest, 'w') as f:
+        df.to_csv(f, index=False, header=False, float_format=FIVEDIGITS,
+                  line_terminator='\r\n')
+    return dict(dest=dest, header=list(df.columns), nrows=len(df))
+
+
+def export_sorted_csv(datagrp, keys, dest, sel=(), renamedict=None,
+                      comment=None, transform=None, args=(), extra=()):
+    """
+    Export a column dataset in CSV format, sorted by the given keys, with
+    bounded memory: the rows are sorted in blocks and stored in a temporary
+    file, then each range of the first key is merged and formatted by
+    a separate task; the resulting parts are concatenated in order.
+    If `dest` ends with .gz the file is gzip-compressed.
+
+    :param datagrp: a group of column datasets (i.e. with __pdcolumns__)
+    :param keys: integer columns to sort by
+    :param dest: path of the CSV file to generate
+    :param sel: dictionary column name -> value specifying a selection
+    :param renamedict: dictionary used to rename the columns in the header
+    :param comment: optional dictionary to be converted in a comment
+    :param transform: function (df, h5, \*args) -> df called in the tasks
+    :param args: extra arguments for the transform function
+    :param extra: dictionary of arrays to store in the temporary file
+    :returns: the number of exported rows
+    """
+    tmpname = gettemp(dir=os.path.dirname(dest), suffix='.hdf5')
+    with hdf5.File(tmpname, 'w') as tmp:
+        columns, runs, counts = _write_runs(
+            datagrp, sel, keys, tmp, ROWS_PER_PART)
+        tmp.attrs['columns'] = ' '.join(columns)
+        for key, array in dict(extra).items():
+            tmp[key] = array
+        allslices = [] if counts.sum() == 0 else list(_gen_slices(
+            tmp[keys[0]], runs, counts, ROWS_PER_PART))
+    logging.info('Exporting %d rows in %d part(s)', counts.sum(),
+                 len(allslices))
+    gz = '.gz' if dest.endswith('.gz') else ''
+    allargs = [(tmpname, slices, keys, '%s.%d%s' % (dest, i, gz),
+                transform, args) for i, slices in enumerate(allslices)]
+    # the parts are returned in order of completion
+    parts = {dic['dest']: dic for dic in parallel.Starmap(
+        export_block, allargs)}
+    parts = [parts[args[3]] for args in allargs]
+    header = parts[0]['header'] if parts else columns
+    with _open(dest, 'w') as f:
+        write_csv(f, [], header=header, comment=comment,
+                  renamedict=renamedict)
+    with open(dest, 'ab') as f:  # gzip members can be concatenated
+        for part in parts:
+            with open(part['dest'], 'rb') as p:
+                shutil.copyfileobj(p, f)
+            os.remove(part['dest'])
+    os.remove(tmpname)
+    return sum(part['nrows'] for part in parts)
+
+
+def gen_batches(dset, blocksize=None, renamedict=None):
+    """
+    Read a structured dataset or a group of column datasets in blocks
+
+    :param dset: a structured dataset or a group with __pdcolumns__
+    :param blocksize: maximum number of rows per block (or ROWS_PER_PART)
+    :param renamedict: a dictionary for renaming the columns
+    :yields: dictionaries column name -> array (at least one)
+    """
+    blocksize = blocksize or ROWS_PER_PART
+    ren = renamedict or {}
+    if '__pdcolumns__' in dset.attrs:
+        columns = dset.attrs['__pdcolumns__'].split()
+        for slc in gen_slices(0, len(dset[columns[0]]), blocksize):
+            yield {ren.get(col, col): hdf5.read_slice(dset[col], slc)
+                   for col in columns}
+        return
+    for slc in gen_slices(0, len(dset), blocksize):
+        arr = hdf5.read_slice(dset, slc)
+        dic = {}
+        for name in arr.dtype.names:
+            if arr.dtype[name].shape:  # vector field
+                for i, col in enumerate(arr[name].reshape(len(arr), -1).T):
+                    dic['%s_%d' % (ren.get(name, name), i)] = col
+            else:  # scalar field
+                dic[ren.get(name, name)] = arr[name]
+        yield dic
+
+
+def export_feather(dest, batches, metadata=None):
+    """
+    Export a table in Arrow IPC file format (i.e. Feather V2), compressed
+    with zstd and written one record batch at the time, so that the table
+    is never fully in memory. Requires pyarrow.
+
+    :param dest: path of the .feather file to generate
+    :param batches: an iterable of dictionaries column name -> array
+    :param metadata: optional dictionary to store in the schema
+    :returns: the number of exported rows
+    """
+    import pyarrow  # optional dependency
+    from pyarrow import ipc
+    meta = {k: str(v) for k, v in (metadata or {}).items()}
+    opts = ipc.IpcWriteOptions(compression='zstd')
+    writer = None
+    nrows = 0
+    for dic in batches:
+        batch = pyarrow.record_batch(
+            [arr.astype(str) if arr.dtype.kind == 'S' else arr
+             for arr in dic.values()], names=list(dic))
+        if writer is None:  # first batch
+            writer = ipc.new_file(
+                dest, batch.schema.with_metadata(meta), options=opts)
+        writer.write_batch(batch)
+        nrows += batch.num_rows
+    writer.close()
+    return nrows
+
+
+def gen_kind_batches(get, idcols, kinds, names, blocksize=None):
+    """
+    Read in blocks an array of shape (N, K, ...), where K is the number of
+    realizations or statistics, and flatten it in N * K rows
+
+    :param get: a function slice -> array of shape (n, K, ...)
+    :param idcols: a dictionary of arrays of length N (site_id, lon, ...)
+    :param kinds: K names, like 'rlz-000' or 'mean'
+    :param names: names of the columns of the flattened trailing dimensions
+    :param blocksize: maximum number of rows per block (or ROWS_PER_PART)
+    :yields: dictionaries column name -> array (at least one)
+    """
+    blocksize = blocksize or ROWS_PER_PART
+    N = len(next(iter(idcols.values())))
+    K = len(kinds)
+    for slc in gen_slices(0, N, max(blocksize // K, 1)):
+        arr = get(slc)
+        n = len(arr)
+        dic = {col: numpy.repeat(ids[slc], K) for col, ids in idcols.items()}
+        dic['kind'] = numpy.tile(numpy.array(kinds), n)
+        values = arr.reshape(n * K, -1)
+        for i, name in enumerate(names):
+            dic[name] = values[:, i]
+        yield dic
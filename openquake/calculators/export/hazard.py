@@ -31,7 +31,8 @@ from openquake.baselib.python3compat import decode
 from openquake.hazardlib.imt import from_string
 from openquake.calculators.views import view
 from openquake.calculators.extract import extract, get_sites, get_info
-from openquake.calculators.export import export
+from openquake.calculators.export import (
+    export, export_sorted_csv, export_feather, gen_batches, gen_kind_batches)
 from openquake.calculators.getters import gen_rupture_getters
 from openquake.commonlib import writers, hazard_writers, calc, util
 
@@ -245,6 +246,65 @@ def export_hcurves_csv(ekey, dstore):
     return sorted(fnames)
 
 
+@export.add(('hcurves', 'feather'), ('hmaps', 'feather'))
+def export_hazard_feather(ekey, dstore):
+    """
+    Exports the hazard curves or maps into .feather files, one for the
+    realizations and one for the statistics, with a row per site and kind
+
+    :param ekey: export key, i.e. a pair (datastore key, fmt)
+    :param dstore: datastore object
+    """
+    oq = dstore['oqparam']
+    sitecol = dstore['sitecol'].complete
+    idcols = dict(site_id=sitecol.sids, lon=sitecol.lons, lat=sitecol.lats)
+    if ekey[0] == 'hmaps':
+        names = ['%s-%s' % (imt, poe) for imt in oq.imtls for poe in oq.poes]
+    elif oq.soil_intensities is not None:
+        names = ['%s-%s' % (imt, iml) for imt in oq.imtls
+                 for iml in oq.soil_intensities]
+    else:
+        names = ['%s-%s' % (imt, iml) for imt, imls in oq.imtls.items()
+                 for iml in imls]
+    md = dstore.metadata
+    md.update(investigation_time=oq.investigation_time)
+    fnames = []
+    for kind in ('rlzs', 'stats'):
+        try:
+            dset = dstore.getitem('%s-%s' % (ekey[0], kind))
+        except KeyError:  # no individual realizations or no statistics
+            continue
+        if kind == 'stats':
+            kinds = list(oq.hazard_stats())
+        else:
+            kinds = ['rlz-%03d' % r for r in range(dset.shape[1])]
+        fname = hazard_curve_name(dstore, ekey, kind)
+        export_feather(fname, gen_kind_batches(
+            dset.__getitem__, idcols, kinds, names), md)
+        fnames.append(fname)
+    return fnames
+
+
+@export.add(('gmf_data', 'feather'), ('events', 'feather'))
+def export_table_feather(ekey, dstore):
+    """
+    Exports gmf_data or events into a .feather file
+
+    :param ekey: export key, i.e. a pair (datastore key, fmt)
+    :param dstore: datastore object
+    """
+    oq = dstore['oqparam']
+    ren = {'sid': 'site_id', 'eid': 'event_id'}
+    for m, imt in enumerate(oq.imtls):
+        ren[f'gmv_{m}'] = 'gmv_' + imt
+    for imt in oq.get_sec_imts():
+        ren[imt] = f'sep_{imt}'
+    fname = dstore.build_fname(ekey[0].replace('_', '-'), '', ekey[1])
+    export_feather(fname, gen_batches(dstore.getitem(ekey[0]),
+                                      renamedict=ren), dstore.metadata)
+    return [fname]
+
+
 UHS = collections.namedtuple('UHS', 'imls location')
 
 
@@ -403,26 +463,25 @@ def export_hazard_npz(ekey, dstore):
     return [fname]
 
 
-@export.add(('gmf_data', 'csv'))
+@export.add(('gmf_data', 'csv'), ('gmf_data', 'csv.gz'))
 def export_gmf_data_csv(ekey, dstore):
     oq = dstore['oqparam']
     imts = list(oq.imtls)
-    df = dstore.read_df('gmf_data').sort_values(['eid', 'sid'])
     ren = {'sid': 'site_id', 'eid': 'event_id'}
     for m, imt in enumerate(imts):
         ren[f'gmv_{m}'] = 'gmv_' + imt
     for imt in oq.get_sec_imts():
         ren[imt] = f'sep_{imt}'
-    df.rename(columns=ren, inplace=True)
     event_id = dstore['events']['id']
     f = dstore.build_fname('sitemesh', '', 'csv')
     arr = dstore['sitecol'][['lon', 'lat']]
     sids = numpy.arange(len(arr), dtype=U32)
     sites = util.compose_arrays(sids, arr, 'site_id')
     writers.write_csv(f, sites)
-    fname = dstore.build_fname('gmf', 'data', 'csv')
-    writers.CsvWriter(fmt=writers.FIVEDIGITS).save(
-        df, fname, comment=dstore.metadata)
+    fname = dstore.build_fname('gmf', 'data', 'csv') + ekey[1][3:]
+    # the GMFs can be too large to be sorted in memory
+    export_sorted_csv(dstore['gmf_data'], ['eid', 'sid'], fname,
+                      renamedict=ren, comment=dstore.metadata)
     if 'sigma_epsilon' in dstore['gmf_data']:
         sig_eps_csv = dstore.build_fname('sigma_epsilon', '', 'csv')
         sig_eps = dstore['gmf_data/sigma_epsilon'][()]
@@ -27,7 +27,9 @@ from openquake.hazardlib.stats import compute_stats2
 from openquake.risklib import scientific
 from openquake.calculators.extract import (
     extract, build_damage_dt, build_damage_array, sanitize)
-from openquake.calculators.export import export, loss_curves
+from openquake.calculators.export import (
+    export, export_sorted_csv, export_feather, gen_batches, gen_kind_batches,
+    loss_curves)
 from openquake.calculators.export.hazard import savez
 from openquake.calculators import views
 from openquake.commonlib import writers
@@ -184,6 +186,52 @@ def export_avg_losses(ekey, dstore):
     return writer.getsaved()
 
 
+@export.add(('avg_losses-rlzs', 'feather'), ('avg_losses-stats', 'feather'))
+def export_avg_losses_feather(ekey, dstore):
+    """
+    :param ekey: export key, i.e. a pair (datastore key, fmt)
+    :param dstore: datastore object
+    """
+    oq = dstore['oqparam']
+    name, kind = ekey[0].split('-')
+    stats = oq.hazard_stats()
+    if ekey[0] in set(dstore):  # stored
+        dset = dstore.getitem(ekey[0])
+        get = dset.__getitem__
+    else:  # compute the statistics on the fly, one block at the time
+        dset = dstore.getitem(name + '-rlzs')
+        weights = dstore['weights'][()]
+
+        def get(slc):
+            return compute_stats2(dset[slc], list(stats.values()), weights)
+    if kind == 'stats':
+        kinds = list(stats)
+    else:
+        kinds = ['rlz-%03d' % r for r in range(dset.shape[1])]
+    md = dstore.metadata
+    md.update(dict(investigation_time=oq.investigation_time,
+                   risk_investigation_time=oq.risk_investigation_time))
+    dest = dstore.build_fname(name, kind, ekey[1])
+    export_feather(dest, gen_kind_batches(
+        get, dict(asset_id=dstore['assetcol']['id']), kinds,
+        oq.loss_names), md)
+    return [dest]
+
+
+@export.add(('agg_loss_table', 'feather'))
+def export_agg_loss_table_feather(ekey, dstore):
+    """
+    :param ekey: export key, i.e. a pair (datastore key, fmt)
+    :param dstore: datastore object
+    """
+    dest = dstore.build_fname('agg_loss_table', '', ekey[1])
+    md = dstore.metadata
+    md.update(dstore.get_attrs('agg_loss_table'))
+    md.update(loss_names=' '.join(dstore['oqparam'].loss_names))
+    export_feather(dest, gen_batches(dstore.getitem('agg_loss_table')), md)
+    return [dest]
+
+
 @export.add(('src_loss_table', 'csv'))
 def export_src_loss_table(ekey, dstore):
     """
@@ -201,8 +249,22 @@ def export_src_loss_table(ekey, dstore):
     return writer.getsaved()
 
 
+def _alt_block(df, h5, loss_names, investigation_time):
+    # convert a block of the agg_loss_table sorted by event into the
+    # losses_by_event format; called by export_sorted_csv
+    df = views.alt_to_many_columns(df, loss_names)
+    eids = df.event_id.to_numpy()
+    e0, e1 = int(eids.min()), int(eids.max()) + 1
+    evs = h5['events'][e0:e1][eids - e0]
+    df['rlz_id'] = evs['rlz_id']
+    if investigation_time:  # not scenario
+        df['rup_id'] = evs['rup_id']
+        df['year'] = evs['year']
+    return df
+
+
 # this is used by scenario_risk, event_based_risk and ebrisk
-@export.add(('agg_loss_table', 'csv'))
+@export.add(('agg_loss_table', 'csv'), ('agg_loss_table', 'csv.gz'))
 def export_agg_loss_table(ekey, dstore):
     """
     :param ekey: export key, i.e. a pair (datastore key, fmt)
@@ -218,12 +280,18 @@ def export_agg_loss_table(ekey, dstore):
     events = dstore['events'][()]
     try:
         K = dstore.get_attr('agg_loss_table', 'K', 0)
-        df = dstore.read_df('agg_loss_table', 'agg_id', dict(agg_id=K))
-        df = views.alt_to_many_columns(df, oq.loss_names)
     except KeyError:  # scenario_damage + consequences
         df = dstore.read_df('losses_by_event')
         ren = {'loss_%d' % li: ln for li, ln in enumerate(oq.loss_names)}
         df.rename(columns=ren, inplace=True)
+    else:  # the table can be too large to be sorted in memory
+        dest += ekey[1][3:]  # possibly .gz
+        export_sorted_csv(
+            dstore['agg_loss_table'], ['event_id'], dest, dict(agg_id=K),
+            comment=md, transform=_alt_block,
+            args=(oq.loss_names, oq.investigation_time),
+            extra={'events': events})
+        return [dest]
     evs = events[df.event_id.to_numpy()]
     df['rlz_id'] = evs['rlz_id']
     if oq.investigation_time:  # not scenario
@@ -15,8 +15,11 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
-from urllib.parse import parse_qs
+from urllib.parse import parse_qs, parse_qsl, urlencode
 from functools import lru_cache
+import os
+import hashlib
+import tempfile
 import collections
 import logging
 import json
@@ -37,6 +40,7 @@ from openquake.baselib.python3compat import encode, decode
 from openquake.hazardlib.gsim.base import ContextMaker
 from openquake.hazardlib.calc import disagg, stochastic, filters
 from openquake.hazardlib.source import rupture
+from openquake.hazardlib.site import SiteIndex
 from openquake.calculators import getters
 from openquake.commonlib import calc, util, oqvalidation, writers, datastore
 
@@ -115,12 +119,21 @@ def parse(query_string, info={}):
     {'kind': ['mean'], 'k': [0], 'rlzs': False}
     >>> parse('kind=rlz-3&imt=PGA&site_id=0', {'stats': {}})
     {'kind': ['rlz-3'], 'imt': ['PGA'], 'site_id': [0], 'k': [3], 'rlzs': True}
+
+    The sites can be selected by ID, by bounding box or by geohash:
+
+    >>> parse('site_id=0,3&site_id=5&bbox=0,40,10,45.5&geohash=9q8')
+    {'site_id': [0, 3, 5], 'bbox': [(0, 40, 10, 45.5)], 'geohash': ['9q8']}
     """
     qdic = parse_qs(query_string)
     loss_types = info.get('loss_types', [])
     for key, val in qdic.items():  # for instance, convert site_id to an int
         if key == 'loss_type':
             qdic[key] = [loss_types[k] for k in val]
+        elif key == 'site_id':
+            qdic[key] = [int(sid) for v in val for sid in v.split(',')]
+        elif key == 'geohash':  # geohashes like 123 are not numbers
+            qdic[key] = val
         else:
             qdic[key] = [lit_eval(v) for v in val]
     if info:
@@ -394,23 +407,74 @@ def extract_sitecol(dstore, what):
     return dstore['sitecol'].array
 
 
+def get_site_index(dstore):
+    """
+    :returns: a SiteIndex over the site collection of the datastore
+    """
+    key = dstore.filename, os.path.getmtime(dstore.filename)
+    try:
+        return _site_index[key]
+    except KeyError:
+        if len(_site_index) >= 8:  # discard the oldest index
+            del _site_index[next(iter(_site_index))]
+        sitecol = dstore['sitecol']
+        index = _site_index[key] = SiteIndex(
+            sitecol['sids'][()], sitecol['lon'][()], sitecol['lat'][()])
+        return index
+
+
+_site_index = {}  # (filename, mtime) -> SiteIndex
+
+
+def get_sids(dstore, params):
+    """
+    :param dstore: a DataStore instance
+    :param params: a dictionary returned by `parse`
+    :returns: the ordered site IDs selected by the parameters site_id, bbox
+              and geohash, or None if there are no site selectors
+    """
+    selected = []
+    if 'site_id' in params:
+        num_sites = len(dstore['sitecol/sids'])
+        # negative site IDs count from the end, as in `dstore.sel`
+        selected.append(numpy.array(params['site_id']) % num_sites)
+    if 'bbox' in params or 'geohash' in params:
+        index = get_site_index(dstore)
+        for bbox in params.get('bbox', []):
+            selected.append(index.within_bbox(bbox))
+        for code in params.get('geohash', []):
+            selected.append(index.within_geohash(code))
+    if not selected:
+        return None
+    sids = numpy.unique(selected[0])
+    for sel in selected[1:]:
+        sids = numpy.intersect1d(sids, sel)
+    return sids
+
+
 def _items(dstore, name, what, info):
+    # read only the hyperslabs of the selected sites, realizations and IMTs
     params = parse(what, info)
-    filt = {}
-    if 'site_id' in params:
-        filt['site_id'] = params['site_id'][0]
+    sids = get_sids(dstore, params)
+    imt = ALL
     if 'imt' in params:
         [imt] = params['imt']
-        filt['imt'] = imt
+        m = info['imt'][imt]
+        imt = slice(m, m + 1)
     if params['rlzs']:
-        for k in params['k']:
-            filt['rlz_id'] = k
-            yield 'rlz-%03d' % k, dstore.sel(name + '-rlzs', **filt)[:, 0]
+        dset = dstore[name + '-rlzs']
+        keys = ['rlz-%03d' % k for k in params['k']]
     else:
+        dset = dstore[name + '-stats']
         stats = list(info['stats'])
-        for k in params['k']:
-            filt['stat'] = stat = stats[k]
-            yield stat, dstore.sel(name + '-stats', **filt)[:, 0]
+        keys = [stats[k] for k in params['k']]
+    for key, k in zip(keys, params['k']):
+        if sids is None:
+            yield key, dset[:, k, imt]
+        else:
+            yield key, hdf5.read_rows(dset, sids, (k, imt))
+    if sids is not None:
+        params['site_id'] = sids
     yield from params.items()
 
 
@@ -1367,6 +1431,69 @@ def extract_eids_by_gsim(dstore, what):
         yield gsims[r], numpy.array(evs['id'])
 
 
+def _normalize_query(what):
+    # sort the query parameters, so that equivalent queries share the cache
+    if '?' not in what:
+        return what
+    key, query = what.split('?', 1)
+    return key + '?' + urlencode(sorted(parse_qsl(query, True)))
+
+
+def _evict(cachedir, maxsize, keep):
+    # remove the least recently used files until the size is below maxsize
+    stats = []
+    for entry in os.scandir(cachedir):
+        if entry.name.endswith('.npz') and entry.path != keep:
+            try:
+                st = entry.stat()
+            except FileNotFoundError:  # removed by another process
+                continue
+            stats.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in stats) + os.path.getsize(keep)
+    for _, size, path in sorted(stats):
+        if total <= maxsize:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:  # removed by another process
+            pass
+        total -= size
+
+
+def cached_npz(dstore, what, cachedir, maxsize=1024 ** 3):
+    """
+    Extract `what` from the datastore and save it as an .npz file in the
+    `cachedir`, unless it is there already. The cache key contains the
+    calculation ID, the normalized query and the modification time of the
+    datastore (and of its parent), so any change invalidates the cache.
+    The least recently used files are removed when the cache exceeds
+    `maxsize` bytes.
+
+    :param dstore: a DataStore instance
+    :param what: a string like 'hcurves?kind=mean&imt=PGA'
+    :param cachedir: the directory of the cache
+    :param maxsize: the maximum size of the cache in bytes
+    :returns: the path of the .npz file
+    """
+    mtimes = [os.path.getmtime(dstore.filename)]
+    if dstore.parent != ():
+        mtimes.append(os.path.getmtime(dstore.parent.filename))
+    key = repr((dstore.calc_id, _normalize_query(what), mtimes))
+    fname = os.path.join(
+        cachedir, hashlib.sha1(key.encode('utf8')).hexdigest() + '.npz')
+    if os.path.exists(fname):
+        os.utime(fname)  # mark as recently used
+        return fname
+    os.makedirs(cachedir, exist_ok=True)
+    obj = extract(dstore, what)
+    fd, tmp = tempfile.mkstemp(dir=cachedir, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        hdf5.save_npz(obj, f)
+    os.replace(tmp, fname)  # atomic, for concurrent requests
+    _evict(cachedir, maxsize, fname)
+    return fname
+
+
 # #####################  extraction from the WebAPI ###################### #
 
 
@@ -16,12 +16,11 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 
-import os
 import logging
 import itertools
 import numpy
 
-from openquake.baselib import general, parallel, python3compat
+from openquake.baselib import general, python3compat
 from openquake.hazardlib.stats import set_rlzs_stats
 from openquake.commonlib import datastore
 from openquake.risklib import scientific
@@ -127,16 +126,6 @@ def get_src_loss_table(dstore, L):
     return zip(*sorted(acc.items()))
 
 
-def post_risk(builder, krl_losses, monitor):
-    """
-    :returns: dictionary krl -> loss curve
-    """
-    res = {}
-    for k, r, l, losses in krl_losses:
-        res[k, r, l] = builder.build_curve(losses, r)
-    return res
-
-
 @base.calculators.add('post_risk')
 class PostRiskCalculator(base.RiskCalculator):
     """
@@ -197,31 +186,23 @@ class PostRiskCalculator(base.RiskCalculator):
             alt_df = alt_df.groupby(['event_id', 'agg_id']).sum().reset_index()
         alt_df['rlz_id'] = rlz_id[alt_df.event_id.to_numpy()]
         units = self.datastore['cost_calculator'].get_units(oq.loss_names)
-        dist = ('no' if os.environ.get('OQ_DISTRIBUTE') == 'no'
-                else 'processpool')  # use only the local cores
-        smap = parallel.Starmap(post_risk, h5=self.datastore.hdf5,
-                                distribute=dist)
-        # producing concurrent_tasks/2 = num_cores tasks
-        blocksize = int(numpy.ceil(
-            (K + 1) * self.R / (oq.concurrent_tasks // 2 or 1)))
-        krl_losses = []
-        agg_losses = numpy.zeros((K + 1, self.R, self.L), F32)
-        agg_curves = numpy.zeros((K + 1, self.R, self.L, P), F32)
-        gb = alt_df.groupby([alt_df.agg_id, alt_df.rlz_id, alt_df.loss_id])
-        # NB: in the future we may use multiprocessing.shared_memory
-        for (k, r, lni), df in gb:
-            agg_losses[k, r, lni] = df.loss.sum()
-            krl_losses.append((k, r, lni, df.loss.to_numpy()))
-            if len(krl_losses) >= blocksize:
-                size = len(krl_losses) * 8
-                logging.info('Sending %s of losses',
-                             general.humansize(size))
-                smap.submit((builder, krl_losses))
-                krl_losses[:] = []
-        if krl_losses:
-            smap.submit((builder, krl_losses))
-        for krl, curve in smap.reduce().items():
-            agg_curves[krl] = curve
+        # build a CSR layout of the losses, grouped by (agg_id, rlz_id,
+        # loss_id), and compute all the curves at once
+        with self.monitor('building agg_curves', measuremem=True):
+            gids = numpy.ravel_multi_index(
+                (alt_df.agg_id.to_numpy(), alt_df.rlz_id.to_numpy(),
+                 alt_df.loss_id.to_numpy()), (K + 1, self.R, self.L))
+            order = numpy.argsort(gids, kind='stable')
+            uniq, inv, counts = numpy.unique(
+                gids[order], return_inverse=True, return_counts=True)
+            losses = alt_df.loss.to_numpy()[order]
+            offsets = numpy.zeros(len(uniq) + 1, int)
+            numpy.cumsum(counts, out=offsets[1:])
+            k, r, lni = numpy.unravel_index(uniq, (K + 1, self.R, self.L))
+            agg_losses = numpy.zeros((K + 1, self.R, self.L), F32)
+            agg_losses[k, r, lni] = numpy.bincount(inv, losses)
+            agg_curves = numpy.zeros((K + 1, self.R, self.L, P), F32)
+            agg_curves[k, r, lni] = builder.build_curves(losses, offsets, r)
         R = len(self.datastore['weights'])
         time_ratio = oq.time_ratio / R if oq.collect_rlzs else oq.time_ratio
         self.datastore['agg_losses-rlzs'] = agg_losses * time_ratio
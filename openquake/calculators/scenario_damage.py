@@ -19,8 +19,9 @@
 import logging
 import numpy
 from openquake.baselib import hdf5
-from openquake.baselib.general import AccumDict, humansize
+from openquake.baselib.general import humansize
 from openquake.hazardlib.stats import set_rlzs_stats, avg_std
+from openquake.risklib import scientific
 from openquake.calculators import base, views
 
 U16 = numpy.uint16
@@ -37,19 +38,19 @@ def floats_in(numbers):
     return (U32(numbers) != numbers).sum()
 
 
-def bin_ddd(fractions, n, seed):
+def bin_ddd(fractions, numbers, seed):
     """
-    Converting fractions into discrete damage distributions using bincount
-    and numpy.random.choice
+    Converting fractions into discrete damage distributions with a
+    vectorized multinomial sampling
+
+    :param fractions: array of shape (A, E, D)
+    :param numbers: array of A asset numbers
+    :param seed: random seed to use
+    :returns: array of U32 of shape (A, E, D)
     """
-    n = int(n)
-    D = fractions.shape[1]  # shape (E, D)
-    ddd = numpy.zeros(fractions.shape, U32)
-    numpy.random.seed(seed)
-    for e, frac in enumerate(fractions):
-        ddd[e] = numpy.bincount(
-            numpy.random.choice(D, n, p=frac/frac.sum()), minlength=D)
-    return ddd
+    rng = numpy.random.default_rng(seed)
+    fractions = fractions / fractions.sum(axis=2)[:, :, None]
+    return scientific.multinomial(rng, numbers[:, None], fractions)
 
 
 def run_sec_sims(damages, haz, sec_sims, seed):
@@ -90,60 +91,67 @@ def scenario_damage(riskinputs, param, monitor):
 
     # algorithm used to compute the discrete damage distributions
     float_dmg_dist = param['float_dmg_dist']
-    z = numpy.zeros((L, D - 1), F32 if float_dmg_dist else U32)
-    d_event = AccumDict(accum=z)
-    res = {'d_event': d_event, 'd_asset': []}
+    seed = param['master_seed']
+    num_events = param['num_events']  # per realization
+    E = num_events.sum()
+    d_event = numpy.zeros((E, L, D - 1), F32 if float_dmg_dist else U32)
+    # the events affecting at least an asset
+    res = {'d_event': d_event, 'd_asset': [], 'seen': numpy.zeros(E, bool)}
     for name in consequences:
         res['avg_' + name] = []
-        res[name + '_by_event'] = AccumDict(accum=numpy.zeros(L, F64))
+        res[name + '_by_event'] = numpy.zeros((E, L), F64)
         # using F64 here is necessary: with F32 the non-associativity
         # of addition would hurt too much with multiple tasks
-    seed = param['master_seed']
-    num_events = param['num_events']  # per realization
-    acc = []  # (aid, eid, lid, ds...)
+    aed = []  # arrays with fields (aid, eid, lid, ds...)
+    dt = numpy.dtype(param['asset_damage_dt'])
     sec_sims = param['secondary_simulations'].items()
     for ri in riskinputs:
         # here instead F32 floats are ok
         R = ri.hazard_getter.num_rlzs
         for out in ri.gen_outputs(crmodel, monitor):
+            assets = out['assets']
+            aids = assets['ordinal']
+            numbers = assets['number']
             for r in range(R):
                 ne = num_events[r]  # total number of events
                 ok = out['haz'].rlz.to_numpy() == r  # events beloging to rlz r
                 if ok.sum() == 0:
                     continue
                 eids = out['eids'][ok]
+                res['seen'][eids] = True
                 for lti, loss_type in enumerate(crmodel.loss_types):
-                    for asset, fractions in zip(
-                            out['assets'], out[loss_type][:, ok]):
-                        aid = asset['ordinal']
-                        if float_dmg_dist:
-                            damages = fractions * asset['number']
-                            if sec_sims:
-                                run_sec_sims(
-                                    damages, out['haz'][ok], sec_sims,
-                                    seed + aid)
-                        else:
-                            damages = bin_ddd(
-                                fractions, asset['number'], seed + aid)
-                        # damages has shape E', D with E' == len(eids)
-                        for e, ddd in enumerate(damages):
-                            dmg = ddd[1:]
-                            if dmg.sum():
-                                eid = eids[e]  # (aid, eid, l) is unique
-                                acc.append((aid, eid, lti) + tuple(dmg))
-                                d_event[eid][lti] += ddd[1:]
-                        tot = damages.sum(axis=0)  # (E', D) -> D
-                        nodamage = asset['number'] * (ne - len(damages))
-                        tot[0] += nodamage
-                        res['d_asset'].append((lti, r, aid, tot))
-                        csq = crmodel.compute_csq(asset, fractions, loss_type)
-                        for name, values in csq.items():
-                            res['avg_%s' % name].append(
-                                (lti, r, asset['ordinal'], values.sum(axis=0)))
-                            by_event = res[name + '_by_event']
-                            for eid, value in zip(eids, values):
-                                by_event[eid][lti] += value
-    res['aed'] = numpy.array(acc, param['asset_damage_dt'])
+                    fractions = out[loss_type][:, ok]  # shape (A, E', D)
+                    if float_dmg_dist:
+                        damages = fractions * numbers[:, None, None]
+                        if sec_sims:
+                            for a, aid in enumerate(aids):
+                                run_sec_sims(damages[a], out['haz'][ok],
+                                             sec_sims, seed + aid)
+                    else:
+                        # the seed depends on the first asset of the
+                        # site and taxonomy, as assets are never split
+                        damages = bin_ddd(fractions, numbers, seed + aids[0])
+                    # damages has shape (A, E', D) with E' == len(eids)
+                    dmg = damages[:, :, 1:]
+                    a_idx, e_idx = dmg.sum(axis=2).nonzero()
+                    arr = numpy.zeros(len(a_idx), dt)  # (aid, eid, l) unique
+                    arr['aid'] = aids[a_idx]
+                    arr['eid'] = eids[e_idx]
+                    arr['lid'] = lti
+                    for d, dsname in enumerate(dt.names[3:]):
+                        arr[dsname] = dmg[a_idx, e_idx, d]
+                    aed.append(arr)
+                    d_event[eids, lti] += dmg.sum(axis=0)
+                    tot = damages.sum(axis=1, dtype=F64)  # shape (A, D)
+                    tot[:, 0] += numbers * (ne - len(eids))  # no damage
+                    res['d_asset'].append((lti, r, aids, tot))
+                    csq = crmodel.compute_csq(assets, fractions, loss_type)
+                    for name, values in csq.items():  # shape (A, E')
+                        res['avg_%s' % name].append(
+                            (lti, r, aids, values.sum(axis=1)))
+                        res[name + '_by_event'][eids, lti] += values.sum(
+                            axis=0)
+    res['aed'] = numpy.concatenate(aed) if aed else numpy.zeros(0, dt)
     return res
 
 
@@ -243,11 +251,9 @@ class ScenarioDamageCalculator(base.RiskCalculator):
         tot = self.assetcol['number'].sum()
         dt = F32 if self.param['float_dmg_dist'] else U32
         dbe = numpy.zeros((self.E, L, D), dt)  # shape E, L, D
-        dbe[:, :, 0] = tot
-        for e, dmg_by_lt in result['d_event'].items():
-            for li, dmg in enumerate(dmg_by_lt):
-                dbe[e, li,  0] = tot - dmg.sum()
-                dbe[e, li,  1:] = dmg
+        d_event = result['d_event']  # shape (E, L, D - 1)
+        dbe[:, :, 0] = tot - d_event.sum(axis=2)
+        dbe[:, :, 1:] = d_event
         self.datastore['dmg_by_event'] = dbe
         self.datastore['avg_portfolio_damage'] = avg_std(
             dbe.astype(float), weights)
@@ -260,6 +266,7 @@ class ScenarioDamageCalculator(base.RiskCalculator):
         # consequence distributions
         del result['d_asset']
         del result['d_event']
+        seen = result.pop('seen')
         dtlist = [('event_id', U32), ('rlz_id', U16), ('loss', (F32, (L,)))]
         for name, csq in result.items():
             if name.startswith('avg_'):
@@ -271,9 +278,11 @@ class ScenarioDamageCalculator(base.RiskCalculator):
                                asset_id=self.assetcol['id'],
                                loss_type=oq.loss_names)
             elif name.endswith('_by_event'):
-                arr = numpy.zeros(len(csq), dtlist)
-                for i, (eid, loss) in enumerate(csq.items()):
-                    arr[i] = (eid, rlz[eid], loss)
+                eids = seen.nonzero()[0]
+                arr = numpy.zeros(len(eids), dtlist)
+                arr['event_id'] = eids
+                arr['rlz_id'] = rlz[eids]
+                arr['loss'] = csq[eids]
                 self.datastore[name] = arr
 
     def sanity_check(self):
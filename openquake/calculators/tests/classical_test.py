@@ -26,7 +26,7 @@ from openquake.hazardlib import lt
 from openquake.commonlib import readinput
 from openquake.calculators.views import view
 from openquake.calculators.export import export
-from openquake.calculators.extract import extract
+from openquake.calculators.extract import extract, cached_npz
 from openquake.calculators.getters import get_slice_by_g
 from openquake.calculators.tests import CalculatorTestCase, NOT_DARWIN
 from openquake.qa_tests_data.classical import (
@@ -105,6 +105,14 @@ class ClassicalTestCase(CalculatorTestCase):
         sitecol = extract(self.calc.datastore, 'sitecol')
         self.assertEqual(len(sitecol.array), 1)
 
+        # check the extract cache, with equivalent queries
+        cachedir = os.path.join(self.calc.oqparam.export_dir, 'cache')
+        fname = cached_npz(self.calc.datastore, 'hcurves?kind=rlz-0&imt=PGA',
+                           cachedir)
+        self.assertEqual(fname, cached_npz(
+            self.calc.datastore, 'hcurves?imt=PGA&kind=rlz-0', cachedir))
+        self.assertEqual(numpy.load(fname)['rlz-000'].shape, (1, 1, 3))
+
         # check minimum_magnitude discards the source
         with self.assertRaises(RuntimeError) as ctx:
             self.run_calc(case_1.__file__, 'job.ini', minimum_magnitude='4.5')
@@ -255,6 +263,38 @@ class ClassicalTestCase(CalculatorTestCase):
         G = 1  # and not 2
         self.calc.datastore['_poes'].shape[-1] == G
 
+    def test_case_14_fault_geom(self):
+        # the fault geometries of a preclassical are reused by the child
+        self.run_calc(case_14.__file__, 'job.ini',
+                      calculation_mode='preclassical')
+        parent = self.calc.datastore
+        keys = list(parent['fault_geom'])
+        self.assertEqual(len(keys), 1)
+        self.assert_curves_ok(['hazard_curve-rlz-000_PGA.csv'],
+                              case_14.__file__,
+                              hazard_calculation_id=str(parent.calc_id))
+        geom_keys = {src.geom_key for src in self.calc.csm.get_sources()}
+        self.assertEqual(sorted(geom_keys), keys)
+        self.assertNotIn('fault_geom', self.calc.datastore.hdf5)
+
+    def test_case_14_rupture_table(self):
+        # the rupture tables of the parent are reused by the child
+        self.assert_curves_ok(['hazard_curve-rlz-000_PGA.csv'],
+                              case_14.__file__, rupture_table='true')
+        parent = self.calc.datastore
+        self.assertGreater(len(parent['rupture_table']), 0)
+        self.assert_curves_ok(['hazard_curve-rlz-000_PGA.csv'],
+                              case_14.__file__, rupture_table='true',
+                              hazard_calculation_id=str(parent.calc_id),
+                              delta=1E-5)
+        self.assertNotIn('rupture_table', self.calc.datastore.hdf5)
+
+    def test_case_14_interpolate_gsims(self):
+        # the interpolated GSIMs give curves close to the exact ones
+        self.assert_curves_ok(['hazard_curve-rlz-000_PGA.csv'],
+                              case_14.__file__, interpolate_gsims='true',
+                              delta=2E-3)
+
     def test_case_15(self):
         # this is a case with both splittable and unsplittable sources
         self.assert_curves_ok('''\
@@ -281,6 +321,15 @@ hazard_uhs-std.csv
         arr = numpy.load(fname)['all']
         self.assertEqual(arr['mean'].dtype.names, ('0.01', '0.1', '0.2'))
 
+        # extract the curves and maps of the sites in a bbox or geohash
+        dstore = self.calc.datastore
+        aw = extract(dstore, 'hcurves?kind=mean&imt=PGA&bbox=-0.05,-1,1,1')
+        self.assertEqual(list(aw.site_id), [1, 2])
+        aac(aw.mean, dstore['hcurves-stats'][1:, 0])
+        aw = extract(dstore, 'hmaps?kind=max&geohash=7zz&site_id=-3')
+        self.assertEqual(list(aw.site_id), [0])
+        aac(aw.max, dstore.sel('hmaps-stats', stat='max')[:1, 0])
+
         # check deserialization of source_model_lt
         smlt = self.calc.datastore['full_lt/source_model_lt']
         exp = str(list(smlt))
@@ -159,6 +159,19 @@ class EventBasedRiskTestCase(CalculatorTestCase):
         self.assertEqualFiles('portfolio_losses.txt', fname, delta=1E-5)
         os.remove(fname)
 
+    def test_reuse_exposure(self):
+        # rerun the risk part reusing the GMFs and the exposure of the parent
+        self.run_calc(case_1f.__file__, 'job_h.ini')
+        hc_id = str(self.calc.datastore.calc_id)
+        self.run_calc(case_1f.__file__, 'job_r.ini',
+                      hazard_calculation_id=hc_id)
+        loss0 = view('portfolio_losses', self.calc.datastore)
+        self.run_calc(case_1f.__file__, 'job_r.ini',
+                      hazard_calculation_id=hc_id, reuse_exposure='true')
+        self.assertNotIn('assetcol/array', self.calc.datastore.hdf5)
+        loss1 = view('portfolio_losses', self.calc.datastore)
+        self.assertEqual(loss0, loss1)
+
     def test_ct_independence(self):
         # vulnerability function with BT
         self.run_calc(case_1f.__file__, 'job.ini', concurrent_tasks='0')
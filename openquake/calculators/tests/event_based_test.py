@@ -18,8 +18,11 @@
 
 import io
 import os
+import gzip
 import re
 import math
+import unittest
+from unittest import mock
 import pandas
 
 import numpy.testing
@@ -149,12 +152,32 @@ class EventBasedTestCase(CalculatorTestCase):
         self.assertEqualFiles('expected/gmf-data.csv', fname)
         self.assertEqualFiles('expected/sites.csv', sitefile)
 
+        # export in many compressed parts
+        with mock.patch('openquake.calculators.export.ROWS_PER_PART', 10):
+            [fname, _, _] = export(('gmf_data', 'csv.gz'), self.calc.datastore)
+        with gzip.open(fname, 'rt') as f:
+            fname = gettemp(f.read(), suffix='.csv')
+        self.assertEqualFiles('expected/gmf-data.csv', fname)
+
         out = self.run_calc(blocksize.__file__, 'job.ini',
                             concurrent_tasks='4', exports='csv')
         [fname, sig_eps, _] = out['gmf_data', 'csv']
         self.assertEqualFiles('expected/gmf-data.csv', fname)
         self.assertEqualFiles('expected/sig-eps.csv', sig_eps)
 
+    def test_feather(self):
+        try:
+            from pyarrow import feather
+        except ImportError:
+            raise unittest.SkipTest('pyarrow is not installed')
+        self.run_calc(blocksize.__file__, 'job.ini')
+        with mock.patch('openquake.calculators.export.ROWS_PER_PART', 10):
+            [fname] = export(('gmf_data', 'feather'), self.calc.datastore)
+        df = feather.read_feather(fname)
+        expected = self.calc.datastore.read_df('gmf_data')
+        self.assertEqual(list(df.columns), ['site_id', 'event_id', 'gmv_PGA'])
+        numpy.testing.assert_equal(df.to_numpy(), expected.to_numpy())
+
     def test_case_1(self):
         out = self.run_calc(case_1.__file__, 'job.ini', exports='csv,xml')
 
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+#
+# Copyright (C) 2021 GEM Foundation
+#
+# OpenQuake is free software: you can redistribute it and/or modify it
+# under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# OpenQuake is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with OpenQuake. If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+import numpy
+from openquake.baselib import hdf5
+from openquake.hazardlib.calc.stochastic import rupture_dt
+from openquake.calculators.views import rst_table
+
+U8 = numpy.uint8
+U32 = numpy.uint32
+F32 = numpy.float32
+F64 = numpy.float64
+BLOCKSIZE = 10_000  # rows appended at each write, as a task would do
+
+
+def gen_columns(profile, rows, rng):
+    """
+    :yields: blocks of synthetic columns for the given table profile
+    """
+    for start in range(0, rows, BLOCKSIZE):
+        n = min(BLOCKSIZE, rows - start)
+        if profile == 'gmf_data':
+            yield dict(sid=rng.integers(0, 10_000, n, U32),
+                       eid=numpy.arange(start, start + n, dtype=U32) // 100,
+                       gmv_0=rng.random(n, F32))
+        else:  # agg_loss_table
+            yield dict(event_id=numpy.arange(start, start + n, dtype=U32),
+                       agg_id=rng.integers(0, 100, n, U32),
+                       loss_id=rng.integers(0, 5, n, U8),
+                       loss=rng.random(n, F32),
+                       variance=rng.random(n, F32))
+
+
+def bench_table(f, profile, layout, rows, rng):
+    # append the columns by blocks and read them back by slices
+    first = next(gen_columns(profile, 1, rng))
+    f.create_df(profile, [(k, v.dtype) for k, v in first.items()],
+                layout=layout)
+    t0 = time.time()
+    for cols in gen_columns(profile, rows, rng):
+        for k, v in cols.items():
+            hdf5.extend(f[f'{profile}/{k}'], v)
+    f.flush()
+    twrite = time.time() - t0
+    t0 = time.time()
+    for start in range(0, rows, 10 * BLOCKSIZE):
+        f.read_df(profile, slc=slice(start, start + 10 * BLOCKSIZE))
+    return twrite, time.time() - t0
+
+
+def bench_poes(f, layout, rows, rng, G=10, L=50, ntiles=20):
+    # write the PoEs by gsim and read them back by tiles of sites
+    N = max(rows // (G * L), ntiles)
+    hdf5.create(f, '_poes', F64, (G, N, L), layout=layout)
+    t0 = time.time()
+    for g in range(G):
+        f['_poes'][g] = rng.random((N, L))
+    f.flush()
+    twrite = time.time() - t0
+    t0 = time.time()
+    tile = int(numpy.ceil(N / ntiles))
+    for start in range(0, N, tile):
+        f['_poes'][:, start:start + tile]
+    return twrite, time.time() - t0
+
+
+def bench_ruptures(f, layout, rows, rng):
+    # append the ruptures by blocks and read them back in full
+    hdf5.create(f, 'ruptures', rupture_dt, layout=layout)
+    t0 = time.time()
+    for start in range(0, rows, BLOCKSIZE):
+        arr = numpy.zeros(min(BLOCKSIZE, rows - start), rupture_dt)
+        arr['id'] = numpy.arange(start, start + len(arr))
+        arr['mag'] = rng.uniform(5, 8, len(arr))
+        hdf5.extend(f['ruptures'], arr)
+    f.flush()
+    twrite = time.time() - t0
+    t0 = time.time()
+    f['ruptures'][()]
+    return twrite, time.time() - t0
+
+
+def main(*, rows: int = 1_000_000, compression=None):
+    """
+    Measure the write and read throughput of the HDF5 layout profiles
+    of the hot datasets on synthetic data, compared with the default
+    h5py layout
+    """
+    rng = numpy.random.default_rng(42)
+    data = []
+    for profile in hdf5.LAYOUTS:
+        layout = hdf5.get_layout(profile)
+        if compression:
+            layout.compression = compression
+        default = hdf5.Layout(None, layout.compression)
+        for name, lay in [('default', default), ('profile', layout)]:
+            with hdf5.File.temporary() as f:
+                if profile == '_poes':
+                    tw, tr = bench_poes(f, lay, rows, rng)
+                elif profile == 'ruptures':
+                    tw, tr = bench_ruptures(f, lay, rows, rng)
+                else:
+                    tw, tr = bench_table(f, profile, lay, rows, rng)
+                dset = f[profile] if profile in ('_poes', 'ruptures') else (
+                    f[profile + '/' + next(iter(f[profile]))])
+                chunks = dset.chunks
+            nbytes = os.path.getsize(f.path)
+            os.remove(f.path)
+            data.append((profile, name, chunks, lay.compression,
+                         '%.1f' % (nbytes / 1024 ** 2),
+                         '%.1f' % (nbytes / 1024 ** 2 / tw),
+                         '%.1f' % (nbytes / 1024 ** 2 / tr)))
+    print(rst_table(data, ['profile', 'layout', 'chunks', 'compression',
+                           'MB on disk', 'write MB/s', 'read MB/s']))
+
+
+main.rows = 'number of synthetic rows for each dataset'
+main.compression = 'compression filter, like gzip, gzip:1, lzf, shuffle+gzip'
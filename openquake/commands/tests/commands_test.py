@@ -565,6 +565,14 @@ Source Loss Table'''.splitlines())
         shutil.rmtree(tempdir)
 
 
+class BenchmarkHDF5TestCase(unittest.TestCase):
+    def test(self):
+        with Print.patch() as p:
+            sap.runline('openquake.commands benchmark_hdf5 -r 20000')
+        self.assertIn('gmf_data', str(p))
+        self.assertIn('shuffle+gzip', str(p))
+
+
 class CheckInputTestCase(unittest.TestCase):
     def test_invalid(self):
         job_zip = os.path.join(list(test_data.__path__)[0],
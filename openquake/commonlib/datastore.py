@@ -306,7 +306,7 @@ class DataStore(collections.abc.MutableMapping):
         return dict(dset.attrs)
 
     def create_dset(self, key, dtype, shape=(None,), compression=None,
-                    fillvalue=0, attrs=None):
+                    fillvalue=0, attrs=None, layout=None):
         """
         Create a one-dimensional HDF5 dataset.
 
@@ -315,12 +315,15 @@ class DataStore(collections.abc.MutableMapping):
         :param shape: shape of the dataset, possibly extendable
         :param compression: the kind of HDF5 compression to use
         :param attrs: dictionary of attributes of the dataset
+        :param layout: a Layout instance, by default the profile of the key
         :returns: a HDF5 dataset
         """
         return hdf5.create(
-            self.hdf5, key, dtype, shape, compression, fillvalue, attrs)
+            self.hdf5, key, dtype, shape, compression, fillvalue, attrs,
+            layout)
 
-    def create_df(self, key, nametypes, compression=None, **kw):
+    def create_df(self, key, nametypes, compression=None, layout=None,
+                  **kw):
         """
         Create a HDF5 datagroup readable as a pandas DataFrame
 
@@ -330,10 +333,12 @@ class DataStore(collections.abc.MutableMapping):
             list of pairs (name, dtype) or (name, array) or DataFrame
         :param compression:
             the kind of HDF5 compression to use
+        :param layout:
+            a Layout for the columns, by default the profile of the key
         :param kw:
             extra attributes to store
         """
-        return self.hdf5.create_df(key, nametypes, compression, **kw)
+        return self.hdf5.create_df(key, nametypes, compression, layout, **kw)
 
     def export_path(self, relname, export_dir=None):
         """
@@ -21,6 +21,8 @@ Set up some system-wide loggers
 import os.path
 import socket
 import logging
+import threading
+import traceback
 from datetime import datetime
 from contextlib import contextmanager
 from openquake.baselib import zeromq, config, parallel
@@ -35,20 +37,59 @@ LEVELS = {'debug': logging.DEBUG,
 DBSERVER_PORT = int(os.environ.get('OQ_DBSERVER_PORT') or config.dbserver.port)
 
 
+# thread-local pool of sockets to the DbServer
+_local = threading.local()
+
+
+def _get_socket():
+    # return a persistent socket, one per process, thread and address
+    key = config.dbserver.host, DBSERVER_PORT
+    if getattr(_local, 'pid', None) != os.getpid():
+        # first call in this thread or forked process: do not reuse the
+        # sockets of the parent process
+        _local.pid = os.getpid()
+        _local.sockets = {}
+    sockets = _local.sockets
+    try:
+        return sockets[key]
+    except KeyError:
+        host = socket.gethostbyname(config.dbserver.host)
+        sock = zeromq.Socket(
+            'tcp://%s:%s' % (host, DBSERVER_PORT), zeromq.zmq.REQ, 'connect')
+        sock.__enter__()
+        sock.zsocket.setsockopt(zeromq.zmq.LINGER, 0)
+        sockets[key] = sock
+        return sock
+
+
+def _discard_sockets():
+    # close the sockets of the current thread, to reconnect at the next call
+    for sock in getattr(_local, 'sockets', {}).values():
+        sock.__exit__(None, None, None)
+    _local.sockets = {}
+
+
 def dbcmd(action, *args):
     """
-    A dispatcher to the database server.
+    A dispatcher to the database server. The connection is kept open
+    and reused by the following calls in the same process and thread;
+    in case of errors it is closed and a new one is opened at the next call.
 
     :param string action: database action to perform
     :param tuple args: arguments
     """
-    host = socket.gethostbyname(config.dbserver.host)
-    sock = zeromq.Socket(
-        'tcp://%s:%s' % (host, DBSERVER_PORT), zeromq.zmq.REQ, 'connect')
-    with sock:
+    if action == 'finish':  # store the pending logs before the status
+        for handler in logging.root.handlers:
+            if isinstance(handler, LogDatabaseHandler):
+                handler.flush()
+    sock = _get_socket()
+    try:
         res = sock.send((action,) + args)
-        if isinstance(res, parallel.Result):
-            return res.get()
+    except BaseException:  # the REQ socket is now in an invalid state
+        _discard_sockets()
+        raise
+    if isinstance(res, parallel.Result):
+        return res.get()
     return res
 
 
@@ -101,17 +142,53 @@ class LogFileHandler(logging.FileHandler):
 
 class LogDatabaseHandler(logging.Handler):
     """
-    Log stream handler
+    Log handler storing the records in the database. The records are
+    buffered and sent in bulk every `interval` seconds by a background
+    thread; in forked processes, where the thread is not running, they
+    are sent immediately.
     """
-    def __init__(self, job_id):
+    def __init__(self, job_id, interval=1.):
         super().__init__()
         self.job_id = job_id
+        self.interval = interval
+        self.pid = os.getpid()
+        self.records = []
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._ship, daemon=True)
+        self.thread.start()
 
     def emit(self, record):  # pylint: disable=E0202
         if record.levelno >= logging.INFO:
-            dbcmd('log', self.job_id, datetime.utcnow(), record.levelname,
-                  '%s/%s' % (record.processName, record.process),
-                  record.getMessage())
+            rec = (self.job_id, datetime.utcnow(), record.levelname,
+                   '%s/%s' % (record.processName, record.process),
+                   record.getMessage())
+            if os.getpid() == self.pid:
+                self.records.append(rec)  # emit is called under self.lock
+            else:
+                dbcmd('log', *rec)
+
+    def flush(self):
+        """
+        Send the buffered records to the database
+        """
+        with self.lock:
+            records, self.records = self.records, []
+        if records:
+            dbcmd('log_many', records)
+
+    def _ship(self):
+        while not self.stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:  # keep shipping even if the DbServer fails
+                traceback.print_exc()
+
+    def close(self):
+        if os.getpid() == self.pid:
+            self.stop.set()
+            self.thread.join()
+            self.flush()
+        super().close()
 
 
 @contextmanager
@@ -142,6 +219,7 @@ def handle(job_id, log_level='info', log_file=None):
     finally:
         for handler in handlers:
             logging.root.removeHandler(handler)
+            handler.close()
 
 
 def init(calc_id='nojob', level=logging.INFO):
@@ -218,7 +218,9 @@ export_dir:
   Default: the current directory, "."
 
 exports:
-  Specify what kind of outputs to export by default.
+  Specify what kind of outputs to export by default. The formats csv.gz
+  (compressed CSV) and feather (Arrow IPC, requires pyarrow) are supported
+  for the largest outputs.
   Example: *exports = csv, rst*.
   Default: empty list
 
@@ -299,6 +301,15 @@ interest_rate:
   Example: *interest_rate = 0.05*.
   Default: no default
 
+interpolate_gsims:
+  Used in classical calculations to replace the GSIMs with interpolation
+  tables of means and standard deviations over a grid of magnitudes,
+  distances and vs30 values, built at the beginning of the calculation.
+  It is faster but approximated: the maximum errors with respect to the
+  exact GSIMs on a sample of contexts are logged.
+  Example: *interpolate_gsims = true*.
+  Default: false
+
 investigation_time:
   Hazard investigation time in years, used in classical and event based
   calculations.
@@ -493,6 +504,14 @@ return_periods:
   Example: *return_periods = 200 500 1000*.
   Default: empty list.
 
+reuse_exposure:
+  Used in risk calculations starting from a parent calculation with
+  an exposure: if set, the exposure, the site collection and the
+  association of the parent are reused without reading again the
+  exposure file; useful when only the risk models are changed.
+  Example: *reuse_exposure = true*.
+  Default: False
+
 risk_imtls:
   INTERNAL. Automatically set by the engine.
 
@@ -513,6 +532,13 @@ rupture_mesh_spacing:
   Example: *rupture_mesh_spacing = 2.0*.
   Default: 5.0
 
+rupture_table:
+  Used in classical calculations to store the ruptures generated by the
+  sources in the datastore, so that a child calculation (for instance with
+  a different gsim_logic_tree) can read them instead of regenerating them.
+  Example: *rupture_table = true*.
+  Default: false
+
 ruptures_per_block:
   INTERNAL
 
@@ -753,6 +779,7 @@ class OqParam(valid.ParamSet):
     intensity_measure_types_and_levels = valid.Param(
         valid.intensity_measure_types_and_levels, None)
     interest_rate = valid.Param(valid.positivefloat)
+    interpolate_gsims = valid.Param(valid.boolean, False)
     investigation_time = valid.Param(valid.positivefloat, None)
     lrem_steps_per_interval = valid.Param(valid.positiveint, 0)
     steps_per_interval = valid.Param(valid.positiveint, 1)
@@ -799,6 +826,8 @@ class OqParam(valid.ParamSet):
     complex_fault_mesh_spacing = valid.Param(
         valid.NoneOr(valid.positivefloat), None)
     return_periods = valid.Param(valid.positiveints, [])
+    reuse_exposure = valid.Param(valid.boolean, False)
+    rupture_table = valid.Param(valid.boolean, False)
     ruptures_per_block = valid.Param(valid.positiveint, 500)  # for UCERF
     sampling_method = valid.Param(
         valid.Choice('early_weights', 'late_weights',
@@ -875,31 +875,48 @@ def get_crmodel(oqparam):
 
 def get_exposure(oqparam):
     """
-    Read the full exposure in memory and build a list of
-    :class:`openquake.risklib.asset.Asset` instances.
+    Read the full exposure in memory as a structured array of assets,
+    possibly memory-mapped from the cache directory.
 
     :param oqparam:
         an :class:`openquake.commonlib.oqvalidation.OqParam` instance
     :returns:
         an :class:`Exposure` instance or a compatible AssetCollection
     """
-    if oqparam.cachedir and not os.path.exists(oqparam.cachedir):
-        os.makedirs(oqparam.cachedir)
-    checksum = _checksum(oqparam.inputs['exposure'])
-    fname = os.path.join(oqparam.cachedir, 'exp_%s.pik' % checksum)
-    if os.path.exists(fname):
+    fnames = oqparam.inputs['exposure']
+    by_country = 'country' in oqparam.aggregate_by
+    if oqparam.cachedir:
+        if not os.path.exists(oqparam.cachedir):
+            os.makedirs(oqparam.cachedir)
+        # the cache depends on the XML and CSV files and on the parameters
+        # used when reading the exposure
+        datafiles = [datafile for exp in asset.Exposure.read_headers(fnames)
+                     for datafile in exp.datafiles]
+        params = (oqparam.calculation_mode, oqparam.region,
+                  sorted(oqparam.ignore_missing_costs), by_country)
+        checksum = _checksum(fnames + datafiles,
+                             zlib.adler32(repr(params).encode('utf8')))
+        fname = os.path.join(oqparam.cachedir, 'exp_%s.pik' % checksum)
+        npyname = fname[:-4] + '.npy'
+    if oqparam.cachedir and os.path.exists(npyname):
         logging.info('Reading %s', fname)
         with open(fname, 'rb') as f:
-            return pickle.load(f)
-    exposure = asset.Exposure.read(
-        oqparam.inputs['exposure'], oqparam.calculation_mode,
-        oqparam.region, oqparam.ignore_missing_costs,
-        by_country='country' in oqparam.aggregate_by)
+            exposure = pickle.load(f)
+        # memory-map the preprocessed array of assets
+        exposure.array = numpy.load(npyname, mmap_mode='r')
+    else:
+        exposure = asset.Exposure.read(
+            fnames, oqparam.calculation_mode, oqparam.region,
+            oqparam.ignore_missing_costs, by_country=by_country)
+        if oqparam.cachedir:
+            logging.info('Saving %s', fname)
+            array, exposure.array = exposure.array, None
+            with open(fname, 'wb') as f:
+                pickle.dump(exposure, f)
+            # saved last, since its existence marks a complete cache
+            numpy.save(npyname, array)
+            exposure.array = array
     exposure.mesh, exposure.assets_by_site = exposure.get_mesh_assets_by_site()
-    if oqparam.cachedir:
-        logging.info('Saving %s', fname)
-        with open(fname, 'wb') as f:
-            pickle.dump(exposure, f)
     return exposure
 
 
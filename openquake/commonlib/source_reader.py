@@ -21,6 +21,7 @@ import pickle
 import operator
 import logging
 import zlib
+import hashlib
 import numpy
 
 from openquake.baselib import parallel, general
@@ -28,6 +29,7 @@ from openquake.hazardlib import nrml, sourceconverter, InvalidFile
 from openquake.hazardlib.lt import apply_uncertainties
 
 TWO16 = 2 ** 16  # 65,536
+FAULT_CODES = b'SCK'  # simple, complex and kite fault sources
 by_id = operator.attrgetter('source_id')
 
 CALC_TIME, NUM_SITES, EFF_RUPTURES, TASK_NO = 3, 4, 5, 7
@@ -177,6 +179,32 @@ def _build_groups(full_lt, smdict):
     return groups
 
 
+def _pickle(src):
+    # pickle the source attributes, except source_id and et_id
+    dic = {k: v for k, v in vars(src).items()
+           if k not in 'source_id et_id samples'}
+    return pickle.dumps(dic, protocol=4)
+
+
+def get_geom_key(src):
+    """
+    :param src: a source (typically a fault source)
+    :returns: a SHA1 hex digest independent from source_id and et_id
+    """
+    return hashlib.sha1(_pickle(src)).hexdigest()
+
+
+def get_rup_key(src, shift_hypo):
+    """
+    :param src: a split source with a .rup_key attribute
+    :param shift_hypo: the shift_hypo parameter
+    :returns: a SHA1 hex digest identifying the ruptures of the source
+    """
+    ident = (src.rup_key, src.source_id, getattr(src, 'min_mag', 0),
+             shift_hypo)
+    return hashlib.sha1(repr(ident).encode('utf8')).hexdigest()
+
+
 def reduce_sources(sources_with_same_id):
     """
     :param sources_with_same_id: a list of sources with the same source_id
@@ -184,9 +212,7 @@ def reduce_sources(sources_with_same_id):
     """
     out = []
     for src in sources_with_same_id:
-        dic = {k: v for k, v in vars(src).items()
-               if k not in 'source_id et_id samples'}
-        src.checksum = zlib.adler32(pickle.dumps(dic, protocol=4))
+        src.checksum = zlib.adler32(_pickle(src))
     for srcs in general.groupby(
             sources_with_same_id, operator.attrgetter('checksum')).values():
         # duplicate sources: same id, same checksum
@@ -231,6 +257,9 @@ def _get_csm(full_lt, groups):
                 sources = general.random_filter(split, float(ss)) or split[0]
             # set ._wkt attribute (for later storage in the source_wkt dataset)
             for src in sources:
+                if src.code in FAULT_CODES:
+                    # key of the fault geometry stored in the datastore
+                    src.geom_key = get_geom_key(src)
                 src._wkt = src.wkt()
             src_groups.append(sourceconverter.SourceGroup(trt, sources))
     for ag in atomic:
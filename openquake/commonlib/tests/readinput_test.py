@@ -21,6 +21,7 @@ import tempfile
 import unittest.mock as mock
 import unittest
 from io import BytesIO
+import numpy
 
 from openquake.baselib import general
 from openquake.hazardlib import InvalidFile, site_amplification
@@ -439,6 +440,18 @@ exposure_file = %s''' % os.path.basename(self.exposure4))
         self.assertIn('''\
 Found case-duplicated fields [['ID', 'id']] in ''', str(ctx.exception))
 
+    def test_cache(self):
+        # the second read memory-maps the array saved in the cachedir
+        job_ini = os.path.join(os.path.dirname(ebr2.__file__), 'job.ini')
+        oqparam = readinput.get_oqparam(job_ini)
+        oqparam.cachedir = tempfile.mkdtemp()
+        exp1 = readinput.get_exposure(oqparam)
+        exp2 = readinput.get_exposure(oqparam)
+        self.assertIsInstance(exp2.array, numpy.memmap)
+        self.assertEqual(exp1.array.tolist(), exp2.array.tolist())
+        self.assertEqual(exp1.tagcol.taxonomy, exp2.tagcol.taxonomy)
+        self.assertEqual(len(exp1.assets_by_site), len(exp2.assets_by_site))
+
     def test_GEM4ALL(self):
         # test a call used in the GEM4ALL importer, pure XML
         fname = os.path.join(os.path.dirname(case_caracas.__file__),
@@ -520,6 +533,23 @@ class SitecolAssetcolTestCase(unittest.TestCase):
         self.assertEqual(len(assetcol), 151)
         self.assertEqual(len(discarded), 0)
 
+    def test_agg_values(self):
+        oq = readinput.get_oqparam('job.ini', case_16)
+        oq.aggregate_by = ['taxonomy', 'site_id']
+        sitecol, assetcol, discarded = readinput.get_sitecol_assetcol(oq)
+        tagnames = ['taxonomy', 'site_id']
+        aggkey = list(assetcol.tagcol.get_aggkey(tagnames))
+        kids = assetcol.get_kids(tagnames)
+        for kid, ass in zip(kids, assetcol):
+            self.assertEqual(aggkey[kid],
+                             (ass['taxonomy'], ass['site_id'] + 1))
+        agg_values = assetcol.get_agg_values(['structural'], tagnames)
+        self.assertEqual(agg_values.shape, (len(aggkey) + 1, 1))
+        numpy.testing.assert_allclose(
+            agg_values[:-1].sum(), agg_values[-1, 0])
+        agg = assetcol.aggregateby(tagnames, assetcol['value-structural'])
+        numpy.testing.assert_allclose(agg.flat, agg_values[:-1, 0])
+
     def test_site_amplification(self):
         oq = readinput.get_oqparam('job.ini', case_16)
         oq.inputs['amplification'] = os.path.join(
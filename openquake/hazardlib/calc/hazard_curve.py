@@ -117,6 +117,7 @@ def classical(group, src_filter, gsims, param, monitor=Monitor()):
     extra['source_id'] = src.source_id
     extra['grp_id'] = src.grp_id
     extra['maxradius'] = maxradius
+    extra['gsim_errors'] = cmaker.gsim_errors
     group_probability = getattr(group, 'grp_probability', None)
     if src_mutex and group_probability:
         pmap *= group_probability
@@ -216,6 +216,9 @@ class ContextMaker(object):
         self.ctx_mon = monitor('make_contexts', measuremem=False)
         self.loglevels = DictArray(self.imtls) if self.imtls else {}
         self.shift_hypo = param.get('shift_hypo')
+        # gsim -> MeanStdTable, used instead of the GSIM if given
+        self.gsim_tables = param.get('gsim_tables', {})
+        self.gsim_errors = {}  # gsim -> (mean error, std error)
         with warnings.catch_warnings():
             # avoid RuntimeWarning: divide by zero encountered in log
             warnings.simplefilter("ignore")
@@ -256,9 +259,18 @@ class ContextMaker(object):
         if self.single_site_opt.any():
             ctx = self.multi(ctxs)
         for g, gsim in enumerate(self.gsims):
+            table = self.gsim_tables.get(gsim)
             with self.gmf_mon:
                 # builds mean_std of shape (2, N, M)
-                if self.single_site_opt[g] and C > 1 and (nsites == 1).all():
+                if table is not None:
+                    mean_std = table.get_mean_std(ctxs, self.imts)
+                    if gsim not in self.gsim_errors:
+                        # compare with the exact GSIM on a sample of contexts
+                        exact = gsim.get_mean_std(ctxs, self.imts)
+                        err = numpy.abs(mean_std - exact).max(axis=(1, 2))
+                        self.gsim_errors[gsim] = tuple(err)
+                elif self.single_site_opt[g] and C > 1 and (
+                        nsites == 1).all():
                     mean_std = gsim.get_mean_std1(ctx, self.imts)
                 else:
                     mean_std = gsim.get_mean_std(ctxs, self.imts)
@@ -590,6 +602,9 @@ class PmapMaker(object):
                             probs += (1. - pne) * ctx.weight
 
     def _ruptures(self, src, filtermag=None):
+        rups = getattr(src, '_rups', None)  # set by the engine, if any
+        if rups is not None and filtermag is None:
+            return iter(rups)
         return src.iter_ruptures(
             shift_hypo=self.shift_hypo, mag=filtermag)
 
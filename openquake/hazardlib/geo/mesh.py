@@ -378,19 +378,29 @@ class Mesh(object):
         # to polygon distance, which gives the most accurate value
         # of distance in km (and that value is zero for points inside
         # the polygon).
+        proj, segments = self._proj_segments
+        mesh_xx, mesh_yy = proj(mesh.lons[idxs], mesh.lats[idxs])
+        # replace geodetic distance values for points-closer-than-the-threshold
+        # by more accurate point-to-polygon distance values.
+        distances[idxs] = geo_utils.point_to_segments_distance(
+            segments, mesh_xx, mesh_yy)
+
+        return distances
+
+    @cached_property
+    def _proj_segments(self):
+        """
+        :returns:
+            the projection and the segments of the enclosing polygon,
+            computed once per mesh and used in the Joyner-Boore distance
+        """
         proj, polygon = self._get_proj_enclosing_polygon()
         if not isinstance(polygon, shapely.geometry.Polygon):
             # either line or point is our enclosing polygon. draw
             # a square with side of 10 m around in order to have
             # a proper polygon instead.
             polygon = polygon.buffer(self.DIST_TOLERANCE, 1)
-        mesh_xx, mesh_yy = proj(mesh.lons[idxs], mesh.lats[idxs])
-        # replace geodetic distance values for points-closer-than-the-threshold
-        # by more accurate point-to-polygon distance values.
-        distances[idxs] = geo_utils.point_to_polygon_distance(
-            polygon, mesh_xx, mesh_yy)
-
-        return distances
+        return proj, geo_utils.get_segments(polygon)
 
     def _get_proj_enclosing_polygon(self):
         """
@@ -509,6 +509,34 @@ class MultiSurface(BaseSurface):
         # GC2-U coordinate for the fault
         self._get_gc2_coordinates_for_rupture(edge_sets)
 
+    def _set_gc2_segments(self):
+        """
+        Stack the segments of all the traces into arrays, so that the
+        generalised coordinates can be computed for all the segments at once:
+        origins, unit vectors along and normal to strike, lengths and
+        cumulative lengths s_ij.
+        """
+        p0s, p1s, lengths, sijs = [], [], [], []
+        for j, edges in enumerate(self.cartesian_edges):
+            ok = numpy.isfinite(edges)
+            if not ok.all():
+                edges = edges[ok].reshape((-1, 3))
+            n = len(edges) - 1
+            p0s.append(edges[:-1, :2])
+            p1s.append(edges[1:, :2])
+            lengths.append(self.length_set[j][:n])
+            sijs.append(self.cum_length_set[j][:n] + numpy.dot(
+                edges[0, :2] - self.p0, self.gc2_config["b_hat"]))
+        p0s = numpy.concatenate(p0s)
+        vec = numpy.concatenate(p1s) - p0s
+        u_hats = vec / numpy.linalg.norm(vec, axis=1)[:, None]
+        self.gc2_config["p0s"] = p0s
+        self.gc2_config["u_hats"] = u_hats
+        self.gc2_config["t_hats"] = numpy.column_stack(
+            [u_hats[:, 1], -u_hats[:, 0]])
+        self.gc2_config["lengths"] = numpy.concatenate(lengths)
+        self.gc2_config["sijs"] = numpy.concatenate(sijs)
+
     def _get_gc2_coordinates_for_rupture(self, edge_sets):
         """
         Calculates the GC2 coordinates for the nodes of the upper edge of the
@@ -521,31 +549,6 @@ class MultiSurface(BaseSurface):
         # GC2 length should be the largest positive GC2 value of the edges
         self.gc_length = numpy.max(rup_gc2u)
 
-    def _get_ut_i(self, seg, sx, sy):
-        """
-        Returns the U and T coordinate for a specific trace segment
-
-        :param seg:
-            End points of the segment edge
-
-        :param sx:
-            Sites longitudes rendered into coordinate system
-
-        :param sy:
-            Sites latitudes rendered into coordinate system
-        """
-        p0x, p0y, p1x, p1y = seg[0, 0], seg[0, 1], seg[1, 0], seg[1, 1]
-        # Unit vector normal to strike
-        t_i_vec = [p1y - p0y, -(p1x - p0x), 0.0]
-        t_i_hat = t_i_vec / numpy.linalg.norm(t_i_vec)
-        # Unit vector along strike
-        u_i_vec = [p1x - p0x, p1y - p0y, 0.0]
-        u_i_hat = u_i_vec / numpy.linalg.norm(u_i_vec)
-        # Vectors from P0 to sites
-        rsite = numpy.column_stack([sx - p0x, sy - p0y])
-        return numpy.sum(u_i_hat[:-1] * rsite, axis=1),\
-            numpy.sum(t_i_hat[:-1] * rsite, axis=1)
-
     def get_generalised_coordinates(self, lons, lats):
         """
         Transforms the site positions into the generalised coordinate form
@@ -560,76 +563,51 @@ class MultiSurface(BaseSurface):
         # If the GC2 configuration has not been setup already - do it!
         if not self.gc2_config:
             self._setup_gc2_framework()
-        # Initially the weights are set to zero
+        if "p0s" not in self.gc2_config:
+            self._set_gc2_segments()
+        cfg = self.gc2_config
         sx, sy = self.proj(lons, lats)
-        sum_w_i = numpy.zeros_like(lons)
-        sum_w_i_t_i = numpy.zeros_like(lons)
-        sum_wi_ui_si = numpy.zeros_like(lons)
-        # Find the cumulative length of the fault up until the given segment
-        # Essentially calculating s_i
-        general_t = numpy.zeros_like(lons)
-        general_u = numpy.zeros_like(lons)
-        on_segment = numpy.zeros_like(lons, dtype=bool)
-        # Loop over the traces
-        for j, edges in enumerate(self.cartesian_edges):
-
-            # import pdb; pdb.set_trace()
-            ok = numpy.isfinite(edges)
-            if not ok.all():
-                edges = edges[ok]
-                edges = edges.reshape((-1, 3))
-
-            # Loop over segments in trace
-            for i in range(edges.shape[0] - 1):
-                # Get u_i and t_i
-                u_i, t_i = self._get_ut_i(edges[i:(i + 2), :], sx, sy)
-                # If t_i is 0 and u_i is within the section length then site is
-                # directly on the edge - therefore general_t is 0
-                w_i = numpy.zeros_like(lons)
-                ti0_check = numpy.fabs(t_i) < 1.0E-3  # < 1 m precision
-                on_segment_range = numpy.logical_and(
-                    u_i >= 0.0,
-                    u_i <= self.length_set[j][i])
-                # Deal with the case in which t_i is 0 and the site is inside
-                # of the segment
-                idx0 = numpy.logical_and(ti0_check, on_segment_range)
-                # In this null case w_i is ignored - however, null sites on
-                # previous segments would not be null sites on this segment,
-                # so we update the list of null sites
-                on_segment[numpy.logical_or(on_segment, idx0)] = True
-                # Also take care of the U case this time using
-                # equation 12 of Spudich and Chiou
-                s_ij = self.cum_length_set[j][i] + numpy.dot(
-                    (edges[0, :2] - self.p0), self.gc2_config["b_hat"])
-                general_u[idx0] = u_i[idx0] + s_ij
-
-                # In the first case, ti = 0, u_i is outside of the segment
-                # this implements equation 5
-                idx1 = numpy.logical_and(ti0_check,
-                                         numpy.logical_not(on_segment_range))
-                w_i[idx1] = ((1.0 / (u_i[idx1] - self.length_set[j][i])) -
-                             (1.0 / u_i[idx1]))
-
-                # In the last case the site is not on the edge (t != 0)
-                # implements equation 4
-                idx2 = numpy.logical_not(ti0_check)
-                w_i[idx2] = ((1. / t_i[idx2]) * (numpy.arctan(
-                             (self.length_set[j][i] - u_i[idx2]) / t_i[idx2]) -
-                             numpy.arctan(-u_i[idx2] / t_i[idx2])))
-
-                idx = numpy.logical_or(idx1, idx2)
-                # Equation 3
-                sum_w_i[idx] += w_i[idx]
-                # Part of equation 2
-                sum_w_i_t_i[idx] += (w_i[idx] * t_i[idx])
-                # Part of equation 9
-                sum_wi_ui_si[idx] += (w_i[idx] * (u_i[idx] + s_ij))
-
+        # Vectors from the origins of the S segments to the N sites
+        rx = sx.reshape(-1, 1) - cfg["p0s"][:, 0]  # shape (N, S)
+        ry = sy.reshape(-1, 1) - cfg["p0s"][:, 1]  # shape (N, S)
+        u_i = rx * cfg["u_hats"][:, 0] + ry * cfg["u_hats"][:, 1]
+        t_i = rx * cfg["t_hats"][:, 0] + ry * cfg["t_hats"][:, 1]
+        length = cfg["lengths"]
+        # If t_i is 0 and u_i is within the section length then site is
+        # directly on the edge - therefore general_t is 0
+        ti0_check = numpy.fabs(t_i) < 1.0E-3  # < 1 m precision
+        on_segment_range = (u_i >= 0.0) & (u_i <= length)
+        idx0 = ti0_check & on_segment_range
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            # In the first case, ti = 0, u_i is outside of the segment
+            # this implements equation 5; in the last case the site is
+            # not on the edge (t != 0) and equation 4 applies
+            w_i = numpy.where(
+                ti0_check, 1.0 / (u_i - length) - 1.0 / u_i,
+                (numpy.arctan((length - u_i) / t_i) -
+                 numpy.arctan(-u_i / t_i)) / t_i)
+        # In the null case w_i is ignored
+        w_i[idx0] = 0.
+        # Equation 3, part of equation 2 and part of equation 9
+        sum_w_i = w_i.sum(axis=1)
+        sum_w_i_t_i = (w_i * t_i).sum(axis=1)
+        sum_wi_ui_si = (w_i * (u_i + cfg["sijs"])).sum(axis=1)
+
+        shape = numpy.shape(lons)
+        on_segment = idx0.any(axis=1)
+        general_t = numpy.zeros(len(on_segment))
+        general_u = numpy.zeros(len(on_segment))
+        # For the sites on a segment edge use equation 12 of Spudich and
+        # Chiou with the last segment containing the site
+        nseg = idx0.shape[1]
+        last = nseg - 1 - idx0[on_segment, ::-1].argmax(axis=1)
+        general_u[on_segment] = (u_i[on_segment, last] +
+                                 cfg["sijs"][last])
         # For those sites not on the segment edge itself
-        idx_t = numpy.logical_not(on_segment)
-        general_t[idx_t] = (1.0 / sum_w_i[idx_t]) * sum_w_i_t_i[idx_t]
-        general_u[idx_t] = (1.0 / sum_w_i[idx_t]) * sum_wi_ui_si[idx_t]
-        return general_t, general_u
+        idx_t = ~on_segment
+        general_t[idx_t] = sum_w_i_t_i[idx_t] / sum_w_i[idx_t]
+        general_u[idx_t] = sum_wi_ui_si[idx_t] / sum_w_i[idx_t]
+        return general_t.reshape(shape), general_u.reshape(shape)
 
     def get_rx_distance(self, mesh):
         """
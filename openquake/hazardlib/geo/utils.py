@@ -22,7 +22,6 @@ to several geographical primitives and some other low-level spatial operations.
 """
 import math
 import logging
-import operator
 import collections
 
 import numpy
@@ -32,6 +31,7 @@ import shapely.geometry
 from shapely.strtree import STRtree
 
 from openquake.baselib.hdf5 import vstr
+from openquake.baselib.python3compat import decode
 from openquake.hazardlib.geo import geodetic
 
 U32 = numpy.uint32
@@ -144,7 +144,7 @@ class _GeographicObjects(object):
         Associated a list of assets by site to the site collection used
         to instantiate GeographicObjects.
 
-        :param assets_by_sites: a list of lists of assets
+        :param assets_by_sites: a list of arrays of assets
         :param assoc_dist: the maximum distance for association
         :param mode: 'strict', 'warn' or 'filter'
         :returns: filtered site collection, filtered assets by site, discarded
@@ -156,27 +156,35 @@ class _GeographicObjects(object):
         assets_by_sid = collections.defaultdict(list)
         discarded = []
         for assets in assets_by_site:
-            lon, lat = assets[0].location
+            lon, lat = assets[0]['lon'], assets[0]['lat']
             obj, distance = self.get_closest(lon, lat)
             if distance <= assoc_dist:
                 # keep the assets, otherwise discard them
-                assets_by_sid[obj['sids']].extend(assets)
+                assets_by_sid[obj['sids']].append(assets)
             elif mode == 'strict':
                 raise SiteAssociationError(
                     'There is nothing closer than %s km '
                     'to site (%s %s)' % (assoc_dist, lon, lat))
             else:
-                discarded.extend(assets)
+                discarded.append(assets)
         sids = sorted(assets_by_sid)
         if not sids:
             raise SiteAssociationError(
                 'Could not associate any site to any assets within the '
                 'asset_hazard_distance of %s km' % assoc_dist)
-        assets_by_site = [
-            sorted(assets_by_sid[sid], key=operator.attrgetter('ordinal'))
-            for sid in sids]
-        data = [(asset.asset_id,) + asset.location for asset in discarded]
-        discarded = numpy.array(data, asset_dt)
+        assets_by_site = []
+        for sid in sids:
+            assets = numpy.concatenate(assets_by_sid[sid])
+            assets_by_site.append(
+                assets[numpy.argsort(assets['ordinal'], kind='stable')])
+        if discarded:
+            assets = numpy.concatenate(discarded)
+            discarded = numpy.zeros(len(assets), asset_dt)
+            discarded['asset_ref'] = [decode(aid) for aid in assets['id']]
+            discarded['lon'] = assets['lon']
+            discarded['lat'] = assets['lat']
+        else:
+            discarded = numpy.zeros(0, asset_dt)
         return self.objects.filtered(sids), assets_by_site, discarded
 
 
@@ -185,8 +193,8 @@ def assoc(objects, sitecol, assoc_dist, mode):
     Associate geographic objects to a site collection.
 
     :param objects:
-        something with .lons, .lats or ['lon'] ['lat'], or a list of lists
-        of objects with a .location attribute (i.e. assets_by_site)
+        something with .lons, .lats or ['lon'] ['lat'], or a list of arrays
+        of assets with fields lon, lat (i.e. assets_by_site)
     :param assoc_dist:
         the maximum distance for association
     :param mode:
@@ -617,6 +625,67 @@ def point_to_polygon_distance(polygon, pxx, pyy):
     return result.reshape(pxx.shape)
 
 
+def get_segments(polygon):
+    """
+    :param polygon:
+        Shapely Polygon or MultiPolygon on the 2d Cartesian plane
+    :returns:
+        an array of shape (S, 2, 2) with the segments of all the rings
+        of the polygon (exterior and interiors)
+    """
+    segments = [numpy.zeros((0, 2, 2))]
+    for poly in getattr(polygon, 'geoms', [polygon]):
+        for ring in [poly.exterior] + list(poly.interiors):
+            if ring.is_empty:
+                continue
+            xy = numpy.array(ring.coords)[:, :2]
+            segments.append(numpy.stack([xy[:-1], xy[1:]], axis=1))
+    return numpy.concatenate(segments)
+
+
+def point_to_segments_distance(segments, pxx, pyy, maxsize=1_000_000):
+    """
+    Vectorized version of :func:`point_to_polygon_distance`, working
+    on the segments returned by :func:`get_segments`. Points inside the
+    polygon are determined with the even-odd rule.
+
+    :param segments: an array of shape (S, 2, 2)
+    :param pxx: an array of abscissae
+    :param pyy: an array of ordinates, with the same shape as ``pxx``
+    :param maxsize: maximum size of the (points, segments) matrices
+    :returns:
+        an array of distances in units of coordinate system, with the same
+        shape as ``pxx``; points inside the polygon have zero distance
+    """
+    shape = numpy.shape(pxx)
+    pxx = numpy.ravel(pxx)
+    pyy = numpy.ravel(pyy)
+    if len(segments) == 0:
+        # empty polygon, shapely returns zero distances in this case
+        return numpy.zeros(shape)
+    x0, y0 = segments[:, 0, 0], segments[:, 0, 1]
+    dx = segments[:, 1, 0] - x0
+    dy = segments[:, 1, 1] - y0
+    len2 = dx * dx + dy * dy
+    len2[len2 == 0] = numpy.inf  # degenerate segments, t = 0
+    dists = numpy.zeros(len(pxx))
+    step = max(maxsize // len(segments), 1)
+    for start in range(0, len(pxx), step):
+        px = pxx[start:start + step, None] - x0
+        py = pyy[start:start + step, None] - y0
+        # projection of the points on the segments, clipped to the ends
+        t = numpy.clip((px * dx + py * dy) / len2, 0., 1.)
+        dist = numpy.hypot(px - t * dx, py - t * dy).min(axis=1)
+        # count the crossings of an horizontal ray going to the right
+        cross = (py < 0) != (py < dy)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            xcross = py * dx / dy
+        inside = (cross & (px < xcross)).sum(axis=1) % 2 == 1
+        dist[inside] = 0
+        dists[start:start + step] = dist
+    return dists.reshape(shape)
+
+
 def fix_lon(lon):
     """
     :returns: a valid longitude in the range -180 <= lon < 180
@@ -731,3 +800,28 @@ def geohash(lon, lat, length):
             bit = 0
             ch = 0
     return chars
+
+
+def geohash_bbox(code):
+    """
+    Decode a geohash into the bounding box of its cell
+
+    >>> geohash_bbox('spzpg')
+    (9.9755859375, 44.9560546875, 10.01953125, 45.0)
+    """
+    if isinstance(code, str):
+        code = code.encode('ascii')
+    lat_interval, lon_interval = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in code:
+        ch = BASE32.index(bytes([char]))
+        for bit in (16, 8, 4, 2, 1):
+            interval = lon_interval if even else lat_interval
+            mid = (interval[0] + interval[1]) / 2
+            if ch & bit:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return (lon_interval[0], lat_interval[0],
+            lon_interval[1], lat_interval[1])
@@ -527,3 +527,114 @@ class GMPETable(GMPE):
         # linearly (or approximately linearly) with magnitude
         m_interpolator = interp1d(self.m_w, numpy.log10(iml_table), axis=1)
         return 10.0 ** m_interpolator(mag)
+
+
+# rupture parameters and distances of the reference ruptures
+REFERENCE_PARAMS = dict(rake=0., dip=90., strike=0., ztor=0., width=10.,
+                        hypo_depth=10., hypo_lon=0., hypo_lat=0.)
+ZERO_DISTANCES = {'ry0', 'rvolc', 'rcdpp', 'azimuth'}
+MIN_DISTANCE = 0.1  # km, smaller distances are rounded up
+
+
+class MeanStdTable(object):
+    """
+    Interpolation table of the means and standard deviations of a GSIM
+    over a grid of magnitudes x distances x site classes, built by calling
+    the GSIM on reference ruptures. The site classes are the distinct
+    vs30 values of the site collection (at most `max_classes`); the
+    other rupture parameters are taken from REFERENCE_PARAMS. The
+    interpolation is linear in magnitude and in log-distance.
+
+    :param gsim: a GSIM instance
+    :param imts: a list of IMT instances
+    :param mags: a sorted array of magnitudes
+    :param maxdist: the maximum distance in km
+    :param sitecol: a SiteCollection instance
+    :param num_dists: the number of (logarithmic) distances in the grid
+    :param max_classes: the maximum number of site classes
+    """
+    def __init__(self, gsim, imts, mags, maxdist, sitecol, num_dists=50,
+                 max_classes=10):
+        self.gsim = gsim
+        self.imts = imts
+        self.mags = numpy.array(sorted(mags))
+        self.logdists = numpy.linspace(
+            numpy.log(MIN_DISTANCE), numpy.log(maxdist), num_dists)
+        for dist in ('rrup', 'rjb', 'rhypo', 'repi'):
+            if dist in gsim.REQUIRES_DISTANCES:
+                self.distance_type = dist
+                break
+        else:
+            self.distance_type = 'rrup'
+        vs30 = numpy.unique(sitecol.vs30)  # sorted
+        if 'vs30' not in gsim.REQUIRES_SITES_PARAMETERS:
+            vs30 = vs30[:1]
+        elif len(vs30) > max_classes:
+            idxs = numpy.linspace(0, len(vs30) - 1, max_classes)
+            vs30 = vs30[numpy.round(idxs).astype(int)]
+        self.vs30 = vs30
+        idxs = self.get_classes(sitecol.vs30)
+        # the first site of each class is used as representative
+        self.sids = [numpy.where(idxs == s)[0][0] for s in range(len(vs30))]
+        self.table = self._build(sitecol)  # shape (nm, S, D, 2, M)
+
+    def get_classes(self, vs30):
+        """
+        :param vs30: an array of vs30 values
+        :returns: the indices of the nearest site classes
+        """
+        return numpy.abs(vs30[:, None] - self.vs30).argmin(axis=1)
+
+    def _build(self, sitecol):
+        S, D = len(self.sids), len(self.logdists)
+        dists = numpy.exp(self.logdists)
+        ctxs = []
+        for mag in self.mags:
+            ctx = RuptureContext()
+            ctx.mag = mag
+            for par in self.gsim.REQUIRES_RUPTURE_PARAMETERS - {'mag'}:
+                setattr(ctx, par, REFERENCE_PARAMS.get(par, 0.))
+            for par in self.gsim.REQUIRES_SITES_PARAMETERS:
+                setattr(ctx, par, numpy.repeat(sitecol[par][self.sids], D))
+            for par in self.gsim.REQUIRES_DISTANCES | {self.distance_type}:
+                val = 0. if par in ZERO_DISTANCES else dists
+                setattr(ctx, par, numpy.tile(val * numpy.ones(D), S))
+            ctx.sids = numpy.arange(S * D)
+            ctxs.append(ctx)
+        mean_std = self.gsim.get_mean_std(ctxs, self.imts)  # (2, nm*S*D, M)
+        shp = (2, len(self.mags), S, D, len(self.imts))
+        return mean_std.reshape(shp).transpose(1, 2, 3, 0, 4)
+
+    def get_mean_std(self, ctxs, imts):
+        """
+        :param ctxs: a list of contexts
+        :param imts: the IMTs used to build the table
+        :returns: an array of shape (2, N, M) with means and stddevs
+        """
+        assert imts == self.imts, (imts, self.imts)
+        nm = len(self.mags)
+        out = []
+        for ctx in ctxs:
+            i = numpy.clip(numpy.searchsorted(self.mags, ctx.mag) - 1,
+                           0, nm - 1)
+            i1 = min(i + 1, nm - 1)
+            wm = 0. if i1 == i else numpy.clip(
+                (ctx.mag - self.mags[i]) / (self.mags[i1] - self.mags[i]),
+                0., 1.)
+            logd = numpy.log(numpy.clip(
+                getattr(ctx, self.distance_type), MIN_DISTANCE,
+                numpy.exp(self.logdists[-1])))
+            j = numpy.clip(numpy.searchsorted(self.logdists, logd) - 1,
+                           0, len(self.logdists) - 2)
+            wd = ((logd - self.logdists[j]) /
+                  (self.logdists[j + 1] - self.logdists[j]))[:, None, None]
+            if 'vs30' in self.gsim.REQUIRES_SITES_PARAMETERS:
+                s = self.get_classes(ctx.vs30)
+            else:
+                s = numpy.zeros(len(logd), int)
+            out.append(
+                (1. - wm) * ((1. - wd) * self.table[i, s, j] +
+                             wd * self.table[i, s, j + 1]) +
+                wm * ((1. - wd) * self.table[i1, s, j] +
+                      wd * self.table[i1, s, j + 1]))
+        return numpy.concatenate(out).transpose(1, 0, 2)  # (2, N, M)
@@ -25,7 +25,8 @@ from shapely import geometry
 from openquake.baselib.general import (
     split_in_blocks, not_equal, get_duplicates)
 from openquake.hazardlib.geo.utils import (
-    fix_lon, cross_idl, _GeographicObjects, geohash, spherical_to_cartesian)
+    fix_lon, cross_idl, _GeographicObjects, geohash, geohash_bbox,
+    spherical_to_cartesian)
 from openquake.hazardlib.geo.mesh import Mesh
 
 U32LIMIT = 2 ** 32
@@ -562,3 +563,64 @@ class SiteCollection(object):
         total_sites = len(self.complete.array)
         return '<SiteCollection with %d/%d sites>' % (
             len(self), total_sites)
+
+
+class SiteIndex(object):
+    """
+    A spatial index over the site coordinates. The sites are sorted by
+    longitude, so that a bounding box query only scans the sites in the
+    longitude band of the box and not the whole site collection.
+
+    :param sids: an array of site IDs
+    :param lons: an array of longitudes in the range [-180, 180]
+    :param lats: an array of latitudes
+    """
+    def __init__(self, sids, lons, lats):
+        order = numpy.argsort(lons, kind='stable')
+        self.sids = sids[order]
+        self.lons = lons[order]
+        self.lats = lats[order]
+
+    def _band(self, min_lon, max_lon):
+        # indices of the sorted sites with min_lon < lon < max_lon
+        start = numpy.searchsorted(self.lons, min_lon, 'right')
+        stop = numpy.searchsorted(self.lons, max_lon, 'left')
+        return numpy.arange(start, stop)
+
+    def _select(self, bbox):
+        # indices of the sorted sites within the bounding box
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if max_lon - min_lon >= 360:  # the whole globe
+            idx = numpy.arange(len(self.lons))
+        elif fix_lon(min_lon) <= fix_lon(max_lon):
+            idx = self._band(fix_lon(min_lon), fix_lon(max_lon))
+        else:  # crossing the International Date Line
+            idx = numpy.concatenate([self._band(fix_lon(min_lon), 181),
+                                     self._band(-181, fix_lon(max_lon))])
+        lats = self.lats[idx]
+        return idx[(min_lat < lats) & (lats < max_lat)]
+
+    def within_bbox(self, bbox):
+        """
+        :param bbox:
+            a quartet (min_lon, min_lat, max_lon, max_lat); if min_lon is
+            greater than max_lon the box crosses the International Date Line
+        :returns:
+            the ordered site IDs within the bounding box
+        """
+        return numpy.sort(self.sids[self._select(bbox)])
+
+    def within_geohash(self, code):
+        """
+        :param code: a geohash (string or bytes) of length 1..8
+        :returns: the ordered site IDs in the geohash cell
+        """
+        if isinstance(code, str):
+            code = code.encode('ascii')
+        min_lon, min_lat, max_lon, max_lat = geohash_bbox(code)
+        eps = 1E-9  # the cell is closed, while _select is open
+        idx = self._select(
+            (min_lon - eps, min_lat - eps, max_lon + eps, max_lat + eps))
+        ok = [geohash(lon, lat, len(code)) == code
+              for lon, lat in zip(self.lons[idx], self.lats[idx])]
+        return numpy.sort(self.sids[idx[ok]])
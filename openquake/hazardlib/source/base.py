@@ -21,9 +21,69 @@ import abc
 import zlib
 import numpy
 from openquake.hazardlib.geo import Point
+from openquake.hazardlib.geo.mesh import RectangularMesh
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 
 EPS = .01  # used for src.nsites outside the maximum_distance
+U32 = numpy.uint32
+F64 = numpy.float64
+rupslice_dt = numpy.dtype([('mag', F64), ('row0', U32), ('row1', U32),
+                           ('col0', U32), ('col1', U32)])
+
+
+class FaultGeom(object):
+    """
+    Geometry of a fault source, i.e. the mesh of the whole fault and,
+    for each magnitude, the index ranges of the floating ruptures.
+    The engine builds it in the preclassical phase, stores it in the
+    datastore under the .geom_key of the source and attaches it to the
+    source in the ._geom attribute.
+
+    :param mesh: a :class:`openquake.hazardlib.geo.mesh.RectangularMesh`
+    :param slices: a structured array of dtype rupslice_dt
+    """
+    def __init__(self, mesh, slices=()):
+        self.mesh = mesh
+        self.slices = {}  # mag -> array of shape (R, 4)
+        if len(slices):
+            for mag in numpy.unique(slices['mag']):
+                recs = slices[slices['mag'] == mag]
+                self.slices[float(mag)] = numpy.array(
+                    [recs['row0'], recs['row1'], recs['col0'], recs['col1']],
+                    U32).T
+
+    def get_slices(self, mag, float_slices):
+        """
+        :param mag: a magnitude
+        :param float_slices: a function (mesh, mag) -> (r0, r1, c0, c1) tuples
+        :returns: an array of shape (R, 4) with the rupture index ranges
+        """
+        try:
+            return self.slices[mag]
+        except KeyError:
+            arr = numpy.array(list(float_slices(self.mesh, mag)), U32)
+            self.slices[mag] = arr.reshape(-1, 4)
+            return self.slices[mag]
+
+    def to_arrays(self):
+        """
+        :returns: a mesh array of shape (3, rows, cols) and a slices array
+        """
+        mesh = numpy.array([self.mesh.lons, self.mesh.lats, self.mesh.depths])
+        recs = [(mag,) + tuple(slc) for mag in sorted(self.slices)
+                for slc in self.slices[mag]]
+        return mesh, numpy.array(recs, rupslice_dt)
+
+    @classmethod
+    def from_arrays(cls, mesh, slices):
+        """
+        :returns: a FaultGeom instance built from the output of .to_arrays
+        """
+        return cls(RectangularMesh(*mesh), slices)
+
+    def __repr__(self):
+        return '<%s %s, %d mags>' % (self.__class__.__name__,
+                                     self.mesh.shape, len(self.slices))
 
 
 class BaseSeismicSource(metaclass=abc.ABCMeta):
@@ -280,6 +340,9 @@ class ParametricSeismicSource(BaseSeismicSource, metaclass=abc.ABCMeta):
         If either rupture aspect ratio or rupture mesh spacing is not positive
         (if not None).
     """
+    _geom = None  # FaultGeom instance, used only by fault sources
+    geom_key = ''  # set in source_reader for fault sources
+
     def __init__(self, source_id, name, tectonic_region_type, mfd,
                  rupture_mesh_spacing, magnitude_scaling_relationship,
                  rupture_aspect_ratio, temporal_occurrence_model):
@@ -326,6 +389,17 @@ class ParametricSeismicSource(BaseSeismicSource, metaclass=abc.ABCMeta):
         min_mag, max_mag = self.mfd.get_min_max_mag()
         return max(self.min_mag, min_mag), max_mag
 
+    def get_geom(self):
+        """
+        :returns:
+            the :class:`FaultGeom` attached to a fault source or a new
+            one built from .get_fault_mesh(); NB: a new geometry is not
+            attached, to avoid transferring it together with the source
+        """
+        if self._geom is None:
+            return FaultGeom(self.get_fault_mesh())
+        return self._geom
+
     def __repr__(self):
         """
         String representation of a source, displaying the source class name
@@ -182,24 +182,16 @@ class ComplexFaultSource(ParametricSeismicSource):
         Uses :func:`_float_ruptures` for finding possible rupture locations
         on the whole fault surface.
         """
-        whole_fault_surface = ComplexFaultSurface.from_fault_data(
-            self.edges, self.rupture_mesh_spacing)
-        whole_fault_mesh = whole_fault_surface.mesh
-        cell_center, cell_length, cell_width, cell_area = (
-            whole_fault_mesh.get_cell_dimensions())
+        geom = self.get_geom()
+        whole_fault_mesh = geom.mesh
         for mag, mag_occ_rate in self.get_annual_occurrence_rates():
             # min_mag is inside get_annual_occurrence_rates
             if mag_occ_rate == 0:
                 continue
-            rupture_area = self.magnitude_scaling_relationship.get_median_area(
-                mag, self.rake)
-            rupture_length = numpy.sqrt(
-                rupture_area * self.rupture_aspect_ratio)
-            rupture_slices = _float_ruptures(
-                rupture_area, rupture_length, cell_area, cell_length)
+            rupture_slices = geom.get_slices(mag, self._float_slices)
             occurrence_rate = mag_occ_rate / float(len(rupture_slices))
-            for rupture_slice in rupture_slices:
-                mesh = whole_fault_mesh[rupture_slice]
+            for row0, row1, col0, col1 in rupture_slices:
+                mesh = whole_fault_mesh[row0:row1, col0:col1]
                 # XXX: use surface centroid as rupture's hypocenter
                 # XXX: instead of point with middle index
                 hypocenter = mesh.get_middle_point()
@@ -219,24 +211,37 @@ class ComplexFaultSource(ParametricSeismicSource):
         See :meth:
         `openquake.hazardlib.source.base.BaseSeismicSource.count_ruptures`.
         """
-        whole_fault_surface = ComplexFaultSurface.from_fault_data(
-            self.edges, self.rupture_mesh_spacing)
-        whole_fault_mesh = whole_fault_surface.mesh
-        cell_center, cell_length, cell_width, cell_area = (
-            whole_fault_mesh.get_cell_dimensions())
+        geom = self.get_geom()
         self._nr = []
         for (mag, mag_occ_rate) in self.get_annual_occurrence_rates():
             if mag_occ_rate == 0:
                 continue
-            rupture_area = self.magnitude_scaling_relationship.get_median_area(
-                mag, self.rake)
-            rupture_length = numpy.sqrt(
-                rupture_area * self.rupture_aspect_ratio)
-            rupture_slices = _float_ruptures(
-                rupture_area, rupture_length, cell_area, cell_length)
-            self._nr.append(len(rupture_slices))
+            self._nr.append(len(geom.get_slices(mag, self._float_slices)))
         return sum(self._nr)
 
+    def get_fault_mesh(self):
+        """
+        :returns: the mesh of the whole fault surface
+        """
+        return ComplexFaultSurface.from_fault_data(
+            self.edges, self.rupture_mesh_spacing).mesh
+
+    def _float_slices(self, whole_fault_mesh, mag):
+        # yield the index ranges of the ruptures of the given magnitude
+        nrows, ncols = whole_fault_mesh.shape
+        cell_center, cell_length, cell_width, cell_area = (
+            whole_fault_mesh.get_cell_dimensions())
+        rupture_area = self.magnitude_scaling_relationship.get_median_area(
+            mag, self.rake)
+        rupture_length = numpy.sqrt(rupture_area * self.rupture_aspect_ratio)
+        for slc in _float_ruptures(
+                rupture_area, rupture_length, cell_area, cell_length):
+            if isinstance(slc, slice):  # the whole fault
+                yield 0, nrows, 0, ncols
+            else:
+                rows, cols = slc
+                yield rows.indices(nrows)[:2] + cols.indices(ncols)[:2]
+
     def modify_set_geometry(self, edges, spacing):
         """
         Modifies the complex fault geometry
@@ -244,6 +249,7 @@ class ComplexFaultSource(ParametricSeismicSource):
         ComplexFaultSurface.check_fault_data(edges, spacing)
         self.edges = edges
         self.rupture_mesh_spacing = spacing
+        self._geom = None  # reset the cached geometry
 
     def __iter__(self):
         mag_rates = self.get_annual_occurrence_rates()
@@ -106,15 +106,14 @@ class KiteFaultSource(ParametricSeismicSource):
         # Counting ruptures and rates
         rates = {}
         count = {}
-        for rup in self.iter_ruptures():
-            mag = rup.mag
+        geom = self.get_geom()
+        for mag, mag_occ_rate in self.get_annual_occurrence_rates():
+            nrups = len(geom.get_slices(mag, self._float_slices))
+            if nrups < 1:
+                continue
             mag_lab = '{:.2f}'.format(mag)
-            if mag_lab in rates:
-                count[mag_lab] += 1
-                rates[mag_lab] += rup.occurrence_rate
-            else:
-                count[mag_lab] = 1
-                rates[mag_lab] = rup.occurrence_rate
+            count[mag_lab] = count.get(mag_lab, 0) + nrups
+            rates[mag_lab] = rates.get(mag_lab, 0) + mag_occ_rate
 
         # Saving
         self._rupture_rates = rates
@@ -122,52 +121,66 @@ class KiteFaultSource(ParametricSeismicSource):
 
         return sum(count[k] for k in count)
 
+    def get_fault_mesh(self):
+        """
+        :returns: the mesh of the whole fault surface
+        """
+        return self.surface.mesh
+
+    def _float_slices(self, omsh, mag):
+        # yield the index ranges of the ruptures of the given magnitude
+        rup_len, rup_wid = self._get_rupture_dimensions(mag)
+        yield from self._get_slices(omsh, rup_len, rup_wid)
+
+    def _get_rupture_dimensions(self, mag):
+        # Compute the area, length and width of the ruptures
+        area = self.magnitude_scaling_relationship.get_median_area(
+            mag=mag, rake=self.rake)
+        lng, wdt = get_discrete_dimensions(area, self.rupture_mesh_spacing,
+                                           self.rupture_aspect_ratio,
+                                           self.profiles_sampling)
+
+        # Get the number of nodes along the strike and dip. Note that
+        # len and wdt should be both multiples of the sampling distances
+        # used along the strike and width
+        rup_len = int(np.round(lng/self.rupture_mesh_spacing)) + 1
+        rup_wid = int(np.round(wdt/self.profiles_sampling)) + 1
+        return rup_len, rup_wid
+
     def iter_ruptures(self, **kwargs):
         """
         See :meth:
         `openquake.hazardlib.source.base.BaseSeismicSource.iter_ruptures`.
         """
 
-        # Set magnitude scaling relationship, temporal occurrence model and
-        # mesh of the fault surface
-        msr = self.magnitude_scaling_relationship
+        # Set temporal occurrence model and mesh of the fault surface
         tom = self.temporal_occurrence_model
-        surface = self.surface
+        geom = self.get_geom()
+        omsh = geom.mesh
 
         for mag, mag_occ_rate in self.get_annual_occurrence_rates():
 
-            # Compute the area, length and width of the ruptures
-            area = msr.get_median_area(mag=mag, rake=self.rake)
-            lng, wdt = get_discrete_dimensions(area, self.rupture_mesh_spacing,
-                                               self.rupture_aspect_ratio,
-                                               self.profiles_sampling)
-
-            # Get the number of nodes along the strike and dip. Note that
-            # len and wdt should be both multiples of the sampling distances
-            # used along the strike and width
-            rup_len = int(np.round(lng/self.rupture_mesh_spacing)) + 1
-            rup_wid = int(np.round(wdt/self.profiles_sampling)) + 1
-
             # Get the geometry of all the ruptures that the fault surface
             # accommodates
-            ruptures = []
-            for rup in self._get_ruptures(surface.mesh, rup_len, rup_wid):
-                ruptures.append(rup)
-            if len(ruptures) < 1:
+            slices = geom.get_slices(mag, self._float_slices)
+            if len(slices) < 1:
                 continue
-            occurrence_rate = mag_occ_rate / len(ruptures)
+            occurrence_rate = mag_occ_rate / len(slices)
 
             # Rupture generator
-            for rup in ruptures:
-                hypocenter = rup[0].get_center()
+            for j0, j1, i0, i1 in slices:
+                surface = KiteSurface(Mesh(omsh.lons[j0:j1, i0:i1],
+                                           omsh.lats[j0:j1, i0:i1],
+                                           omsh.depths[j0:j1, i0:i1]))
+                hypocenter = surface.get_center()
                 # Yield an instance of a ParametricProbabilisticRupture
                 yield ppr(mag, self.rake, self.tectonic_region_type,
-                          hypocenter, rup[0], occurrence_rate, tom)
+                          hypocenter, surface, occurrence_rate, tom)
 
-    def _get_ruptures(self, omsh, rup_s, rup_d, f_strike=1, f_dip=1):
+    def _get_slices(self, omsh, rup_s, rup_d, f_strike=1, f_dip=1):
         """
-        Returns all the ruptures admitted by a given geometry i.e. number of
-        nodes along strike and dip
+        Returns the index ranges of all the ruptures admitted by a given
+        geometry i.e. number of nodes along strike and dip
 
         :param omsh:
             A :class:`~openquake.hazardlib.geo.mesh.Mesh` instance describing
@@ -181,24 +194,9 @@ class KiteFaultSource(ParametricSeismicSource):
         :param f_dip:
             Floating distance along dip (multiple of sampling distance)
         :returns:
-            A tuple containing the rupture and the indexes of the top right
-            node of the mesh representing the rupture.
+            Tuples (j0, j1, i0, i1) with the rows and cols of the mesh
+            representing the rupture
         """
-
-        # When f_strike is negative, the floating distance is interpreted as
-        # a fraction of the rupture length (i.e. a multiple of the sampling
-        # distance)
-        if f_strike < 0:
-            f_strike = int(np.floor(rup_s * abs(f_strike) + 1e-5))
-            if f_strike < 1:
-                f_strike = 1
-
-        # See f_strike comment above
-        if f_dip < 0:
-            f_dip = int(np.floor(rup_d * abs(f_dip) + 1e-5))
-            if f_dip < 1:
-                f_dip = 1
-
         # Float the rupture on the mesh describing the surface of the fault
         for i in np.arange(0, omsh.lons.shape[1] - rup_s + 1, f_strike):
             for j in np.arange(0, omsh.lons.shape[0] - rup_d + 1, f_dip):
@@ -208,10 +206,7 @@ class KiteFaultSource(ParametricSeismicSource):
 
                 # Yield only the ruptures that do not contain NaN
                 if prc > 99.99 and nna >= 4:
-                    msh = Mesh(omsh.lons[j:j + rup_d, i:i + rup_s],
-                               omsh.lats[j:j + rup_d, i:i + rup_s],
-                               omsh.depths[j:j + rup_d, i:i + rup_s])
-                    yield (KiteSurface(msh), j, i)
+                    yield j, j + rup_d, i, i + rup_s
 
     # TODO
     def get_fault_surface_area(self) -> float:
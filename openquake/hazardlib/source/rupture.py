@@ -56,6 +56,13 @@ rupture_dt = numpy.dtype([('seed', U32),
                           ('kind', hdf5.vstr),
                           ('mesh', hdf5.vstr),
                           ('extra', hdf5.vstr)])
+rup_table_dt = numpy.dtype([('seed', U32),
+                            ('code', U8),
+                            ('n_occ', U32),
+                            ('mag', F64),
+                            ('rake', F64),
+                            ('occurrence_rate', F64),
+                            ('hypo', (F64, 3))])
 
 code2cls = {}
 
@@ -110,6 +117,57 @@ def from_array(aw):
     return rups
 
 
+def to_rup_table(ruptures):
+    """
+    Convert parametric ruptures into a rupture table, i.e. an array of
+    rupture parameters plus a list of 32 bit geometries in the same
+    format used by the event based calculator.
+
+    :param ruptures: a list of ParametricProbabilisticRuptures
+    :returns: an ArrayWrapper with an attribute .geom
+    """
+    if not BaseRupture._code:
+        BaseRupture.init()  # initialize rupture codes
+    arr = numpy.zeros(len(ruptures), rup_table_dt)
+    geoms = []
+    for rec, rup in zip(arr, ruptures):
+        rec['seed'] = rup.rup_id
+        rec['code'] = rup.code
+        rec['n_occ'] = 1
+        rec['mag'] = rup.mag
+        rec['rake'] = rup.rake
+        rec['occurrence_rate'] = rup.occurrence_rate
+        rec['hypo'] = rup.hypocenter.x, rup.hypocenter.y, rup.hypocenter.z
+        arrays = surface_to_arrays(rup.surface)  # one array per surface
+        shapes = []
+        for array in arrays:
+            shapes.extend(array.shape[1:])
+        geoms.append(F32(numpy.concatenate(
+            [[len(arrays)], shapes] + [a.flat for a in arrays])))
+    return hdf5.ArrayWrapper(arr, dict(geom=geoms))
+
+
+def from_rup_table(array, geoms, trt, tom):
+    """
+    Build parametric ruptures from a rupture table
+
+    :param array: an array of dtype rup_table_dt
+    :param geoms: a list of 32 bit geometries, one per rupture
+    :param trt: the tectonic region type of the ruptures
+    :param tom: the temporal occurrence model of the ruptures
+    :returns: a list of ParametricProbabilisticRuptures
+    """
+    rups = []
+    for rec, geom in zip(array, geoms):
+        # the computations on the meshes are performed in double precision
+        rup = _get_rupture(rec, F64(geom), trt)
+        rup.temporal_occurrence_model = tom
+        rup.rupture_slip_direction = None
+        rup.weight = None
+        rups.append(rup)
+    return rups
+
+
 def _get_rupture(rec, geom=None, trt=None):
     # rec: a dictionary or a record
     # geom: if any, an array of floats32 convertible into a mesh
@@ -134,51 +134,37 @@ class SimpleFaultSource(ParametricSeismicSource):
         rate of each of those ruptures is the magnitude occurrence rate
         divided by the number of ruptures that can be placed in a fault.
         """
-        whole_fault_surface = SimpleFaultSurface.from_fault_data(
-            self.fault_trace, self.upper_seismogenic_depth,
-            self.lower_seismogenic_depth, self.dip, self.rupture_mesh_spacing)
-        whole_fault_mesh = whole_fault_surface.mesh
-        mesh_rows, mesh_cols = whole_fault_mesh.shape
-        fault_length = float((mesh_cols - 1) * self.rupture_mesh_spacing)
-        fault_width = float((mesh_rows - 1) * self.rupture_mesh_spacing)
-
+        geom = self.get_geom()
+        whole_fault_mesh = geom.mesh
         for mag, mag_occ_rate in self.get_annual_occurrence_rates():
-            rup_cols, rup_rows = self._get_rupture_dimensions(
-                fault_length, fault_width, mag)
-            num_rup_along_length = mesh_cols - rup_cols + 1
-            num_rup_along_width = mesh_rows - rup_rows + 1
-            num_rup = num_rup_along_length * num_rup_along_width
-            occurrence_rate = mag_occ_rate / float(num_rup)
-            for first_row in range(num_rup_along_width):
-                for first_col in range(num_rup_along_length):
-                    mesh = whole_fault_mesh[first_row: first_row + rup_rows,
-                                            first_col: first_col + rup_cols]
-
-                    if not len(self.hypo_list) and not len(self.slip_list):
-
-                        hypocenter = mesh.get_middle_point()
-                        occurrence_rate_hypo = occurrence_rate
-                        surface = SimpleFaultSurface(mesh)
-
-                        yield ParametricProbabilisticRupture(
-                            mag, self.rake, self.tectonic_region_type,
-                            hypocenter, surface, occurrence_rate_hypo,
-                            self.temporal_occurrence_model)
-                    else:
-                        for hypo in self.hypo_list:
-                            for slip in self.slip_list:
-                                surface = SimpleFaultSurface(mesh)
-                                hypocenter = surface.get_hypo_location(
-                                    self.rupture_mesh_spacing, hypo[:2])
-                                occurrence_rate_hypo = occurrence_rate * \
-                                    hypo[2] * slip[1]
-                                rupture_slip_direction = slip[0]
-
-                                yield ParametricProbabilisticRupture(
-                                    mag, self.rake, self.tectonic_region_type,
-                                    hypocenter, surface, occurrence_rate_hypo,
-                                    self.temporal_occurrence_model,
-                                    rupture_slip_direction)
+            slices = geom.get_slices(mag, self._float_slices)
+            occurrence_rate = mag_occ_rate / float(len(slices))
+            for row0, row1, col0, col1 in slices:
+                mesh = whole_fault_mesh[row0:row1, col0:col1]
+                if not len(self.hypo_list) and not len(self.slip_list):
+                    hypocenter = mesh.get_middle_point()
+                    occurrence_rate_hypo = occurrence_rate
+                    surface = SimpleFaultSurface(mesh)
+
+                    yield ParametricProbabilisticRupture(
+                        mag, self.rake, self.tectonic_region_type,
+                        hypocenter, surface, occurrence_rate_hypo,
+                        self.temporal_occurrence_model)
+                else:
+                    for hypo in self.hypo_list:
+                        for slip in self.slip_list:
+                            surface = SimpleFaultSurface(mesh)
+                            hypocenter = surface.get_hypo_location(
+                                self.rupture_mesh_spacing, hypo[:2])
+                            occurrence_rate_hypo = occurrence_rate * \
+                                hypo[2] * slip[1]
+                            rupture_slip_direction = slip[0]
+
+                            yield ParametricProbabilisticRupture(
+                                mag, self.rake, self.tectonic_region_type,
+                                hypocenter, surface, occurrence_rate_hypo,
+                                self.temporal_occurrence_model,
+                                rupture_slip_direction)
 
     def get_fault_surface_area(self):
         """
@@ -198,11 +184,7 @@ class SimpleFaultSource(ParametricSeismicSource):
         See :meth:
         `openquake.hazardlib.source.base.BaseSeismicSource.count_ruptures`.
         """
-        whole_fault_surface = SimpleFaultSurface.from_fault_data(
-            self.fault_trace, self.upper_seismogenic_depth,
-            self.lower_seismogenic_depth, self.dip, self.rupture_mesh_spacing)
-        whole_fault_mesh = whole_fault_surface.mesh
-        mesh_rows, mesh_cols = whole_fault_mesh.shape
+        mesh_rows, mesh_cols = self.get_geom().mesh.shape
         fault_length = float((mesh_cols - 1) * self.rupture_mesh_spacing)
         fault_width = float((mesh_rows - 1) * self.rupture_mesh_spacing)
         self._nr = []
@@ -220,6 +202,29 @@ class SimpleFaultSource(ParametricSeismicSource):
         counts = sum(self._nr)
         return counts
 
+    def get_fault_mesh(self):
+        """
+        :returns: the mesh of the whole fault surface
+        """
+        return SimpleFaultSurface.from_fault_data(
+            self.fault_trace, self.upper_seismogenic_depth,
+            self.lower_seismogenic_depth, self.dip,
+            self.rupture_mesh_spacing).mesh
+
+    def _float_slices(self, whole_fault_mesh, mag):
+        # yield the index ranges of the ruptures of the given magnitude
+        mesh_rows, mesh_cols = whole_fault_mesh.shape
+        fault_length = float((mesh_cols - 1) * self.rupture_mesh_spacing)
+        fault_width = float((mesh_rows - 1) * self.rupture_mesh_spacing)
+        rup_cols, rup_rows = self._get_rupture_dimensions(
+            fault_length, fault_width, mag)
+        num_rup_along_length = mesh_cols - rup_cols + 1
+        num_rup_along_width = mesh_rows - rup_rows + 1
+        for first_row in range(num_rup_along_width):
+            for first_col in range(num_rup_along_length):
+                yield (first_row, first_row + rup_rows,
+                       first_col, first_col + rup_cols)
+
     def _get_rupture_dimensions(self, fault_length, fault_width, mag):
         """
         Calculate rupture dimensions for a given magnitude.
@@ -280,6 +285,7 @@ class SimpleFaultSource(ParametricSeismicSource):
         self.lower_seismogenic_depth = lower_seismogenic_depth
         self.dip = dip
         self.rupture_mesh_spacing = spacing
+        self._geom = None  # reset the cached geometry
 
     def modify_adjust_mfd_from_slip(self, slip_rate, rigidity):
         """
@@ -318,6 +324,7 @@ class SimpleFaultSource(ParametricSeismicSource):
             self.lower_seismogenic_depth, self.dip + increment,
             self.rupture_mesh_spacing)
         self.dip += increment
+        self._geom = None  # reset the cached geometry
 
     def modify_set_dip(self, dip):
         """
@@ -330,6 +337,7 @@ class SimpleFaultSource(ParametricSeismicSource):
             self.fault_trace, self.upper_seismogenic_depth,
             self.lower_seismogenic_depth, dip, self.rupture_mesh_spacing)
         self.dip = dip
+        self._geom = None  # reset the cached geometry
 
     def __iter__(self):
         mag_rates = self.get_annual_occurrence_rates()
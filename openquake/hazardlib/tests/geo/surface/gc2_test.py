@@ -296,6 +296,16 @@ class ConcordantSurfaceTestCase(unittest.TestCase):
         numpy.testing.assert_array_almost_equal(expected_t, gc2t)
         numpy.testing.assert_array_almost_equal(expected_u, gc2u)
 
+    def test_gc2_sites_on_trace(self):
+        """
+        Verifies that sites lying on the upper edge have T = 0
+        """
+        edges = numpy.vstack(self.model.edge_set)
+        gc2t, gc2u = self.model.get_generalised_coordinates(
+            edges[:, 0], edges[:, 1])
+        numpy.testing.assert_array_almost_equal(gc2t, 0.)
+        self.assertAlmostEqual(gc2u.max(), self.model.gc_length)
+
     def test_gc2_rx(self):
         """
         Verifies Rx for the concordant case
@@ -391,6 +391,21 @@ class ConvexToPointDistanceTestCase(unittest.TestCase):
             numpy.testing.assert_almost_equal(dist, [0.5, 1, 2])
 
 
+class PointToSegmentsDistanceTestCase(unittest.TestCase):
+    def test_nonconvex_polygon_with_hole(self):
+        shell = [(0, 0), (0, 3), (2, 2), (1, 2), (1, 1), (1, 0), (0, 0)]
+        hole = [(.2, .2), (.2, .8), (.8, .8), (.8, .2), (.2, .2)]
+        polygon = shapely.geometry.Polygon(shell, [hole])
+        segments = utils.get_segments(polygon)
+        self.assertEqual(segments.shape, (10, 2, 2))
+        rng = numpy.random.default_rng(42)
+        pxx = rng.uniform(-1, 3, (10, 10))
+        pyy = rng.uniform(-1, 4, (10, 10))
+        expected = utils.point_to_polygon_distance(polygon, pxx, pyy)
+        dist = utils.point_to_segments_distance(segments, pxx, pyy, 30)
+        numpy.testing.assert_allclose(dist, expected, atol=1E-12)
+
+
 class PlaneFit(unittest.TestCase):
     """
     In order to test the method we fit a plane to a cloud of points
@@ -26,7 +26,10 @@ from scipy.interpolate import interp1d
 
 from openquake.hazardlib import const
 from openquake.hazardlib.gsim.gmpe_table import (
-    GMPETable, AmplificationTable, hdf_arrays_to_dict)
+    GMPETable, AmplificationTable, MeanStdTable, hdf_arrays_to_dict)
+from openquake.hazardlib.gsim.sadigh_1997 import SadighEtAl1997
+from openquake.hazardlib.geo import Point
+from openquake.hazardlib.site import Site, SiteCollection
 from openquake.hazardlib.gsim.base import (
     RuptureContext, SitesContext, DistancesContext)
 from openquake.hazardlib.tests.gsim.utils import BaseGSIMTestCase
@@ -734,3 +737,37 @@ class GSIMTableQATestCase(BaseGSIMTestCase):
     def test_std_total(self):
         self.check(self.STD_TOTAL_FILE, max_discrep_percentage=0.7,
                    gmpe_table=GMPE_TABLE)
+
+
+class MeanStdTableTestCase(unittest.TestCase):
+    """
+    Tests the interpolation tables built from a regular GSIM
+    """
+    def setUp(self):
+        self.gsim = SadighEtAl1997()
+        self.imts = [imt_module.PGA(), imt_module.SA(0.2)]
+        self.sitecol = SiteCollection([
+            Site(Point(0, 0), vs30, z1pt0=40., z2pt5=1.)
+            for vs30 in (300., 760., 760.)])
+
+    def test_classes(self):
+        table = MeanStdTable(self.gsim, self.imts, [5., 6., 7.], 200.,
+                             self.sitecol)
+        np.testing.assert_equal(table.vs30, [300., 760.])
+        np.testing.assert_equal(table.get_classes(np.array([400., 800.])),
+                                [0, 1])
+        self.assertEqual(table.table.shape, (3, 2, 50, 2, 2))
+
+    def test_interpolation(self):
+        mags = np.arange(50, 71) / 10.  # as in a MFD with bin width 0.1
+        table = MeanStdTable(self.gsim, self.imts, mags, 200., self.sitecol)
+        ctx = RuptureContext()
+        ctx.mag = 6.35
+        ctx.rake = 0.
+        ctx.vs30 = np.array([300., 760., 760.])
+        ctx.rrup = np.array([3., 25., 150.])
+        ctx.sids = np.arange(3)
+        exact = self.gsim.get_mean_std([ctx], self.imts)
+        mean_std = table.get_mean_std([ctx], self.imts)
+        self.assertEqual(mean_std.shape, (2, 3, 2))
+        np.testing.assert_allclose(mean_std, exact, atol=.02)
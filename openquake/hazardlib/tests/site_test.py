@@ -22,7 +22,7 @@ import numpy
 from shapely import wkt
 
 from openquake.baselib import hdf5
-from openquake.hazardlib.site import Site, SiteCollection
+from openquake.hazardlib.site import Site, SiteCollection, SiteIndex
 from openquake.hazardlib.geo.point import Point
 
 assert_eq = numpy.testing.assert_equal
@@ -256,6 +256,33 @@ class WithinBBoxTestCase(unittest.TestCase):
         assert_eq(self.sites.within_bbox((-182, -28, -178, -26)), [0])
 
 
+
+class SiteIndexTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = numpy.random.default_rng(42)
+        lons = rng.uniform(-180, 180, 1000)
+        lats = rng.uniform(-60, 60, 1000)
+        cls.sites = SiteCollection.from_points(lons, lats)
+        cls.index = SiteIndex(cls.sites.sids, cls.sites.lons, cls.sites.lats)
+
+    def test_bbox(self):
+        for bbox in [(10, 0, 50, 30), (-30, -60, -20, 60), (0, 0, 0, 0)]:
+            assert_eq(self.index.within_bbox(bbox),
+                      self.sites.within_bbox(bbox))
+        # crossing the International Date Line
+        got = self.index.within_bbox((170, -10, -170, 10))
+        exp = numpy.union1d(self.sites.within_bbox((170, -10, 180, 10)),
+                            self.sites.within_bbox((-180, -10, -170, 10)))
+        assert_eq(got, exp)
+
+    def test_geohash(self):
+        codes = self.sites.geohash(2)
+        for code in codes[:10]:
+            assert_eq(self.index.within_geohash(code),
+                      (codes == code).nonzero()[0])
+
 class SiteCollectionIterTestCase(unittest.TestCase):
 
     def test(self):
@@ -246,6 +246,17 @@ class ComplexFaultSourceIterRupturesTestCase(
         self._test_ruptures(test_data.TEST4_RUPTURES, source)
 
 
+class ComplexFaultGeomTestCase(simple_fault_test._BaseFaultSourceTestCase):
+    _make_source = ComplexFaultSourceIterRupturesTestCase._make_source
+
+    def test_roundtrip(self):
+        source = self._make_source(test_data.TEST4_MFD,
+                                   test_data.TEST4_RUPTURE_ASPECT_RATIO,
+                                   test_data.TEST4_MESH_SPACING,
+                                   test_data.TEST4_EDGES)
+        simple_fault_test.check_geom_roundtrip(source)
+
+
 class FloatRupturesTestCase(unittest.TestCase):
     def test_reshaping_along_length(self):
         cell_area = numpy.array([[1, 1, 1],
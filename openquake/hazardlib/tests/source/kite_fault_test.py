@@ -31,6 +31,8 @@ from openquake.hazardlib.source.kite_fault import KiteFaultSource
 from openquake.hazardlib.mfd import TruncatedGRMFD
 
 from openquake.hazardlib.tests.geo.surface.kite_fault_test import ppp
+from openquake.hazardlib.tests.source.simple_fault_test import (
+    check_geom_roundtrip)
 
 # Movies are in /tmp
 MAKE_MOVIES = False
@@ -251,3 +253,18 @@ class SimpleFaultIterRupturesTestCase(_BaseFaultSourceTestCase):
             ruptures = [r for r in source.iter_ruptures()]
             self._ruptures_animation('test02', source.surface, ruptures,
                                      source.profiles)
+
+
+class KiteFaultGeomTestCase(_BaseFaultSourceTestCase):
+
+    def test_roundtrip(self):
+        # this is a case with NaNs in the mesh
+        profiles = [Line([Point(0.0, 0.0, 0.0), Point(0.0, 0.001, 15.0)]),
+                    Line([Point(0.1, 0.0, 0.0), Point(0.1, 0.010, 12.0)]),
+                    Line([Point(0.2, 0.0, 0.0), Point(0.2, 0.020,  9.0)]),
+                    Line([Point(0.3, 0.0, 0.0), Point(0.3, 0.030,  6.0)])]
+        mfd = TruncatedGRMFD(a_val=0.5, b_val=1.0, min_mag=5.8, max_mag=6.2,
+                             bin_width=0.1)
+        source = self._make_source(mfd=mfd, aspect_ratio=1.5,
+                                   profiles=profiles)
+        check_geom_roundtrip(source)
@@ -21,7 +21,8 @@ from openquake.hazardlib.geo import Point, Line
 from openquake.hazardlib.geo.surface.planar import PlanarSurface
 from openquake.hazardlib.tom import PoissonTOM
 from openquake.hazardlib.source.rupture import BaseRupture, \
-    ParametricProbabilisticRupture, NonParametricProbabilisticRupture
+    ParametricProbabilisticRupture, NonParametricProbabilisticRupture, \
+    to_rup_table, from_rup_table
 from openquake.hazardlib.pmf import PMF
 from openquake.hazardlib.geo.mesh import Mesh
 from openquake.hazardlib.geo.surface.simple_fault import SimpleFaultSurface
@@ -128,6 +129,34 @@ class ParametricProbabilisticRuptureTestCase(unittest.TestCase):
         )
 
 
+class RupTableTestCase(unittest.TestCase):
+    def test_roundtrip(self):
+        tom = PoissonTOM(50)
+        mesh = Mesh(numpy.array([[0., 0.1], [0., 0.1]]),
+                    numpy.array([[0., 0.], [0.05, 0.05]]),
+                    numpy.array([[1., 1.], [5., 5.]]))
+        rups = [make_rupture(ParametricProbabilisticRupture,
+                             occurrence_rate=0.01,
+                             temporal_occurrence_model=tom),
+                make_rupture(ParametricProbabilisticRupture,
+                             surface=SimpleFaultSurface(mesh),
+                             occurrence_rate=0.02,
+                             temporal_occurrence_model=tom)]
+        aw = to_rup_table(rups)
+        trt = const.TRT.STABLE_CONTINENTAL
+        [rup1, rup2] = from_rup_table(aw.array, aw.geom, trt, tom)
+        for rup, new in zip(rups, [rup1, rup2]):
+            self.assertIs(new.__class__, rup.__class__)
+            self.assertIs(new.surface.__class__, rup.surface.__class__)
+            self.assertEqual(new.mag, rup.mag)
+            self.assertEqual(new.rake, rup.rake)
+            self.assertEqual(new.occurrence_rate, rup.occurrence_rate)
+            self.assertEqual(new.hypocenter, rup.hypocenter)
+            self.assertIs(new.temporal_occurrence_model, tom)
+            numpy.testing.assert_allclose(
+                new.surface.mesh.array, rup.surface.mesh.array, atol=1E-6)
+
+
 class Cdppvalue(unittest.TestCase):
 
     def make_rupture_fordpp(self, rupture_class, **kwargs):
@@ -13,12 +13,14 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import pickle
 import unittest
 
 import numpy
 from copy import deepcopy
 from openquake.hazardlib.const import TRT
 from openquake.hazardlib.source.simple_fault import SimpleFaultSource
+from openquake.hazardlib.source.base import FaultGeom
 from openquake.hazardlib.source.rupture import ParametricProbabilisticRupture
 from openquake.hazardlib.mfd import TruncatedGRMFD, EvenlyDiscretizedMFD
 import openquake.hazardlib.mfd.evenly_discretized as mfdeven
@@ -620,3 +622,44 @@ class ModifySimpleFaultTestCase(_BaseFaultSourceTestCase):
         new_fault = deepcopy(self.fault) 
         new_fault.modify_set_dip(72.0)
         self.assertAlmostEqual(new_fault.dip, 72.0)
+
+
+def _rup_data(src):
+    # extract the relevant data from the ruptures of a source
+    return [(rup.mag, rup.occurrence_rate, rup.hypocenter.x,
+             rup.hypocenter.y, rup.hypocenter.z, rup.surface.mesh.lons,
+             rup.surface.mesh.lats, rup.surface.mesh.depths)
+            for rup in src.iter_ruptures()]
+
+
+def check_geom_roundtrip(src):
+    """
+    Make sure the ruptures generated from a FaultGeom stored as arrays
+    (as done in the engine) are the same as the original ruptures
+    """
+    expected = _rup_data(src)
+    geom = src.get_geom()
+    for mag, rate in src.get_annual_occurrence_rates():
+        geom.get_slices(mag, src._float_slices)
+    mesh, slices = pickle.loads(pickle.dumps(geom.to_arrays()))
+    src2 = deepcopy(src)
+    src2._geom = FaultGeom.from_arrays(mesh, slices)
+    got = _rup_data(src2)
+    assert len(expected) == len(got) == src2.count_ruptures(), (
+        len(expected), len(got))
+    for exp, rup in zip(expected, got):
+        numpy.testing.assert_allclose(exp[:5], rup[:5])
+        for e, g in zip(exp[5:], rup[5:]):
+            numpy.testing.assert_equal(e, g)
+
+
+class FaultGeomTestCase(_BaseFaultSourceTestCase):
+
+    def test_roundtrip(self):
+        mfd = TruncatedGRMFD(a_val=0.5, b_val=1.0, min_mag=3.0, max_mag=5.0,
+                             bin_width=1.0)
+        src = self._make_source(mfd=mfd, aspect_ratio=1.0)
+        check_geom_roundtrip(src)
+        # the geometry is not attached to the source by count_ruptures
+        src.count_ruptures()
+        self.assertIsNone(src._geom)
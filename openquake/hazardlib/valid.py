@@ -233,7 +233,8 @@ class Choices(Choice):
         return tuple(values)
 
 
-export_formats = Choices('', 'xml', 'geojson', 'txt', 'csv', 'npz')
+export_formats = Choices(
+    '', 'xml', 'geojson', 'txt', 'csv', 'csv.gz', 'npz', 'feather')
 
 
 class Regex(object):
@@ -22,7 +22,8 @@ import csv
 import os
 import numpy
 import pandas
-from shapely import wkt, geometry
+from shapely import wkt, vectorized
+from shapely.prepared import prep
 
 from openquake.baselib import hdf5, general
 from openquake.baselib.node import Node, context
@@ -33,6 +34,7 @@ from openquake.risklib import countries
 U8 = numpy.uint8
 U32 = numpy.uint32
 F32 = numpy.float32
+F64 = numpy.float64
 U64 = numpy.uint64
 TWO16 = 2 ** 16
 TWO32 = 2 ** 32
@@ -255,6 +257,22 @@ class TagCollection(object):
                 raise InvalidFile('contains more then %d tags' % TWO32)
             return idx
 
+    def add_many(self, tagname, tagvalues):
+        """
+        :param tagname: the name of the tag
+        :param tagvalues: an array of N tag values
+        :returns: an array of N tag indices
+
+        The new tags are added in order of first appearance, i.e. with the
+        same indices as calling `.add` for each tag value.
+        """
+        uniq, first, inv = numpy.unique(
+            tagvalues, return_index=True, return_inverse=True)
+        idxs = numpy.zeros(len(uniq), U32)
+        for u in numpy.argsort(first):
+            idxs[u] = self.add(tagname, uniq[u])
+        return idxs[inv]
+
     def add_tags(self, dic, prefix):
         """
         :param dic: a dictionary tagname -> tagvalue
@@ -378,7 +396,8 @@ class AssetCollection(object):
         self.aggregate_by = aggregate_by
         self.tot_sites = len(assets_by_site)
         self.array, self.occupancy_periods = build_asset_array(
-            assets_by_site, exposure.tagcol.tagnames, time_event)
+            assets_by_site, exposure.tagcol.tagnames, time_event,
+            exposure.cost_calculator)
         if 'id' in aggregate_by:
             self.tagcol.add_tagname('id')
             self.tagcol.id.extend(self['id'])
@@ -443,6 +462,26 @@ class AssetCollection(object):
             assets_by_site[ass['site_id']].append(self[i])
         return numpy.array(assets_by_site)
 
+    def get_kids(self, tagnames):
+        """
+        :param tagnames: a non-empty list of valid tag names
+        :returns: an array of aggregation key indices, one per asset
+
+        The indices are in the same order as the keys returned by
+        TagCollection.get_aggkey, i.e. they are the mixed-radix encoding
+        of the (1-based) tag indices of each asset.
+        """
+        idxs = []
+        for tagname in tagnames:
+            if tagname == 'id':
+                idxs.append(self['ordinal'])
+            elif tagname == 'site_id':
+                idxs.append(self['site_id'])
+            else:
+                idxs.append(self[tagname] - 1)
+        return numpy.ravel_multi_index(
+            idxs, self.tagcol.agg_shape(tagnames))
+
     # used in the extract API
     def aggregateby(self, tagnames, array):
         """
@@ -459,21 +498,10 @@ class AssetCollection(object):
                              (len(self), A))
         if not tagnames:
             return array.sum(axis=0)
-        elif len(tagnames) == 1:
-            # fast track for single-tag aggregation
-            # for the Canada exposure it is 30x faster
-            # fast_agg(assets['taxonomy'], values)  => 47.6 ms
-            # fast_agg2(assets[['taxonomy']], values) => 1.4 s
-            [tagname] = tagnames
-            avalues = general.fast_agg(self.array[tagname], array)[1:]
-            tagids = [(i + 1,) for i in range(len(avalues))]
-        else:  # multi-tag aggregation
-            tagids, avalues = general.fast_agg2(self.array[tagnames], array)
-        shape = [len(getattr(self.tagcol, tagname))-1 for tagname in tagnames]
-        arr = numpy.zeros(shape, (F32, tuple(shp)) if shp else F32)
-        for tagid, aval in zip(tagids, avalues):
-            arr[tuple(i - 1 for i in tagid)] = aval
-        return arr
+        shape = self.tagcol.agg_shape(tagnames)
+        kids = self.get_kids(tagnames)
+        arr = general.fast_agg(kids, array, M=numpy.prod(shape))
+        return F32(arr).reshape(shape + tuple(shp))
 
     def arr_value(self, loss_types):
         """
@@ -504,29 +532,19 @@ class AssetCollection(object):
         :returns:
             an array of shape (K+1, L)
         """
-        aggkey = {key: k for k, key in enumerate(
-            self.tagcol.get_aggkey(tagnames))}
-        K, L = len(aggkey), len(loss_names)
-        dic = {tagname: self[tagname] for tagname in tagnames}
-        for ln in loss_names:
+        K = numpy.prod(self.tagcol.agg_shape(tagnames)) if tagnames else 0
+        kids = self.get_kids(tagnames) if tagnames else None
+        agg_values = numpy.zeros((K+1, len(loss_names)))
+        for lni, ln in enumerate(loss_names):
             if ln.endswith('_ins'):
-                dic[ln] = self['value-' + ln[:-4]]
+                values = self['value-' + ln[:-4]]
             elif ln in self.fields:
-                dic[ln] = self['value-' + ln]
-        agg_values = numpy.zeros((K+1, L))
-        df = pandas.DataFrame(dic)
-        if tagnames:
-            df = df.set_index(list(tagnames))
-            if tagnames == ['id']:
-                df.index = self['ordinal'] + 1
-            elif tagnames == ['site_id']:
-                df.index = self['site_id'] + 1
-            for key, grp in df.groupby(df.index):
-                if isinstance(key, int):
-                    key = key,  # turn it into a 1-value tuple
-                agg_values[aggkey[key], :] = numpy.array(grp.sum())
-        if self.fields:  # missing in scenario_damage case_8
-            agg_values[-1, :] = [df[ln].sum() for ln in loss_names]
+                values = self['value-' + ln]
+            else:
+                continue
+            if tagnames:
+                agg_values[:K, lni] = numpy.bincount(kids, values, K)
+            agg_values[K, lni] = values.sum()
         return agg_values
 
     def reduce(self, sitecol):
@@ -605,21 +623,33 @@ class AssetCollection(object):
         return '<%s with %d asset(s)>' % (self.__class__.__name__, len(self))
 
 
-def build_asset_array(assets_by_site, tagnames=(), time_event=None):
+def build_asset_array(assets_by_site, tagnames=(), time_event=None,
+                      cost_calculator=None):
     """
-    :param assets_by_site: a list of lists of assets
+    :param assets_by_site: a list of arrays of assets, as in Exposure.array
     :param tagnames: a list of tag names
+    :param time_event: time event used for the occupants (or None)
+    :param cost_calculator: a CostCalculator instance
     :returns: an array `assetcol`
     """
-    for assets in assets_by_site:
+    arrays, sids = [], []
+    for sid, assets in enumerate(assets_by_site):
         if len(assets):
-            first_asset = assets[0]
-            break
-    else:  # no break
+            arrays.append(assets)
+            sids.append(numpy.full(len(assets), sid, U32))
+    if not arrays:
         raise ValueError('There are no assets!')
+    array = numpy.concatenate(arrays)
+    first_asset = array[0]
+    values = {}  # name -> field in the exposure array
+    for field in array.dtype.names:
+        if field.startswith('value-'):
+            values[field[6:]] = field
+        elif field.startswith('occupants_'):
+            values[field] = field
     loss_types = []
     occupancy_periods = []
-    for name in sorted(first_asset.values):
+    for name in sorted(values):
         if name.startswith('occupants_'):
             period = name.split('_', 1)[1]
             # see scenario_risk test_case_2d
@@ -630,50 +660,38 @@ def build_asset_array(assets_by_site, tagnames=(), time_event=None):
     # loss_types can be ['value-business_interruption', 'value-contents',
     # 'value-nonstructural', 'value-occupants', 'occupants_day',
     # 'occupants_night', 'occupants_transit']
-    retro = ['retrofitted'] if first_asset._retrofitted else []
+    retro = (first_asset['retrofitted']
+             if 'retrofitted' in array.dtype.names else 0)
+    retro = ['retrofitted'] if retro and not numpy.isnan(retro) else []
     float_fields = loss_types + retro
     int_fields = [(str(name), U32) for name in tagnames
                   if name not in ('id', 'site_id')]
-    tagi = {str(name): i for i, name in enumerate(tagnames)}
     asset_dt = numpy.dtype(
         [('id', (numpy.string_, valid.ASSET_ID_LENGTH)),
          ('ordinal', U32), ('lon', F32), ('lat', F32),
          ('site_id', U32), ('number', F32), ('area', F32)] + [
              (str(name), float) for name in float_fields] + int_fields)
-    num_assets = sum(len(assets) for assets in assets_by_site)
-    assetcol = numpy.zeros(num_assets, asset_dt)
-    asset_ordinal = 0
-    fields = set(asset_dt.fields)
-    for sid, assets_ in enumerate(assets_by_site):
-        for asset in assets_:
-            asset.ordinal = asset_ordinal
-            record = assetcol[asset_ordinal]
-            asset_ordinal += 1
-            for field in fields:
-                if field == 'id':
-                    value = asset.asset_id
-                elif field == 'ordinal':
-                    value = asset.ordinal
-                elif field == 'number':
-                    value = asset.number
-                elif field == 'area':
-                    value = asset.area
-                elif field == 'site_id':
-                    value = sid
-                elif field == 'lon':
-                    value = asset.location[0]
-                elif field == 'lat':
-                    value = asset.location[1]
-                elif field.startswith('occupants_'):
-                    value = asset.values[field]
-                elif field == 'retrofitted':
-                    value = asset.retrofitted()
-                elif field in tagnames:
-                    value = asset.tagidxs[tagi[field]]
-                else:
-                    name, lt = field.split('-')
-                    value = asset.value(lt, time_event)
-                record[field] = value
+    assetcol = numpy.zeros(len(array), asset_dt)
+    assetcol['ordinal'] = numpy.arange(len(array))
+    assetcol['site_id'] = numpy.concatenate(sids)
+    for field in ('id', 'lon', 'lat', 'number', 'area'):
+        assetcol[field] = array[field]
+    for name, _ in int_fields:
+        assetcol[name] = array[name]
+    vals = {name: array[field] for name, field in values.items()}
+    area, number = array['area'], array['number']
+    for field in float_fields:
+        if field.startswith('occupants_'):
+            assetcol[field] = array[field]
+        elif field == 'retrofitted':
+            assetcol[field] = cost_calculator(
+                'structural', {'structural': array['retrofitted']},
+                area, number)
+        elif field == 'value-occupants':
+            assetcol[field] = vals[
+                'occupants_%s' % time_event if time_event else 'occupants']
+        else:
+            assetcol[field] = cost_calculator(field[6:], vals, area, number)
     return assetcol, ' '.join(occupancy_periods)
 
 
@@ -762,7 +780,7 @@ def _get_exposure(fname, stop=None):
     exp = Exposure(
         exposure['id'], exposure['category'],
         description.text, cost_types, occupancy_periods, retrofitted,
-        area.attrib, [], cc, TagCollection(tagnames), fieldmap)
+        area.attrib, None, cc, TagCollection(tagnames), fieldmap)
     assets_text = exposure.assets.text.strip()
     if assets_text:
         # the <assets> tag contains a list of file names
@@ -834,22 +852,42 @@ def assets2array(asset_nodes, fields, retrofitted, ignore_missing_costs):
     return array
 
 
+def _concat(arrays):
+    """
+    Concatenate arrays of assets, filling the missing values with NaNs
+    """
+    dtdict = {}
+    for array in arrays:
+        dtdict.update(array.dtype.descr)
+    size = sum(len(array) for array in arrays)
+    out = numpy.zeros(size, list(dtdict.items()))
+    start = 0
+    for array in arrays:
+        slc = slice(start, start + len(array))
+        for name in out.dtype.names:
+            out[name][slc] = array[name] if name in array.dtype.names \
+                else numpy.nan
+        start += len(array)
+    return out
+
+
 class Exposure(object):
     """
-    A class to read the exposure from XML/CSV files
+    A class to read the exposure from XML/CSV files. The assets are stored
+    in the structured array `.array`, with fields id, ordinal, lon, lat,
+    number, area, the values and the tag indices.
     """
     fields = ['id', 'category', 'description', 'cost_types',
               'occupancy_periods', 'retrofitted',
-              'area', 'assets', 'cost_calculator', 'tagcol', 'fieldmap']
+              'area', 'array', 'cost_calculator', 'tagcol', 'fieldmap']
 
     @staticmethod
     def check(fname):
         exp = Exposure.read([fname])
         err = []
-        for asset in exp.assets:
-            if asset.number > 65535:
-                err.append('Asset %s has number %s > 65535' %
-                           (asset.asset_id, asset.number))
+        for rec in exp.array[exp.array['number'] > 65535]:
+            err.append('Asset %s has number %s > 65535' %
+                       (decode(rec['id']), rec['number']))
         return '\n'.join(err)
 
     @staticmethod
@@ -877,6 +915,7 @@ class Exposure(object):
             allargs.append((fname, calculation_mode, region_constraint,
                             ignore_missing_costs, check_dupl, prefix, tagcol))
         exp = None
+        arrays = []
         for exposure in itertools.starmap(Exposure.read_exp, allargs):
             if exp is None:  # first time
                 exp = exposure
@@ -886,13 +925,11 @@ class Exposure(object):
                 ae(exposure.occupancy_periods, exp.occupancy_periods)
                 ae(exposure.retrofitted, exp.retrofitted)
                 ae(exposure.area, exp.area)
-                exp.assets.extend(exposure.assets)
                 exp.tagcol.extend(exposure.tagcol)
+            arrays.append(exposure.array)
+        exp.array = _concat(arrays) if len(arrays) > 1 else arrays[0]
         exp.exposures = [os.path.splitext(os.path.basename(f))[0]
                          for f in fnames]
-        for i, ass in enumerate(exp.assets):
-            # used by the GED4ALL importer
-            ass.tags = exp.tagcol.get_tagdict(ass.tagidxs)
         return exp
 
     @staticmethod
@@ -913,23 +950,25 @@ class Exposure(object):
         if tagcol:
             exposure.tagcol = tagcol
         if assetnodes:
-            array = assets2array(
+            arrays = [assets2array(
                 assetnodes, exposure._csv_header(),
                 exposure.retrofitted or calculation_mode == 'classical_bcr',
-                ignore_missing_costs)
+                ignore_missing_costs)]
         else:
-            array = exposure._read_csv()
+            arrays = exposure._read_csv()
         param['relevant_cost_types'] = set(exposure.cost_types['name']) - set(
             ['occupants'])
-        exposure._populate_from(array, param, check_dupl)
+        exposure._populate_from(arrays, param, check_dupl)
         if param['region'] and param['out_of_region']:
             logging.info('Discarded %d assets outside the region',
                          param['out_of_region'])
-        if len(exposure.assets) == 0:
+        if len(exposure.array) == 0:
             raise RuntimeError('Could not find any asset within the region!')
         # sanity checks
-        values = any(len(ass.values) + ass.number for ass in exposure.assets)
-        assert values, 'Could not find any value??'
+        values = [f for f in exposure.array.dtype.names
+                  if f.startswith(('value-', 'occupants_'))]
+        assert values or exposure.array['number'].any(), (
+            'Could not find any value??')
         exposure.param = param
         return exposure
 
@@ -966,7 +1005,7 @@ class Exposure(object):
 
     def _read_csv(self):
         """
-        :yields: asset nodes
+        :yields: arrays of assets, one per CSV file
         """
         expected_header = set(self._csv_header('', ''))
         floatfields = set()
@@ -1005,88 +1044,145 @@ class Exposure(object):
             array = hdf5.read_csv(fname, conv, rename).array
             array['lon'] = numpy.round(array['lon'], 5)
             array['lat'] = numpy.round(array['lat'], 5)
-            yield from array
+            yield array
 
-    def _populate_from(self, asset_array, param, check_dupl):
-        asset_refs = set()
-        for idx, asset in enumerate(asset_array):
-            asset_id = asset['id']
+    def _populate_from(self, asset_arrays, param, check_dupl):
+        # build the array of assets in a vectorized way, one input array
+        # (i.e. one CSV file) at the time
+        asset_arrays = list(asset_arrays)
+        if check_dupl:
             # check_dupl is False only in oq prepare_site_model since
             # in that case we are only interested in the asset locations
-            if check_dupl and asset_id in asset_refs:
-                raise nrml.DuplicatedID(asset_id)
-            asset_refs.add(param['asset_prefix'] + asset_id)
-            self._add_asset(idx, asset, param)
-
-    def _add_asset(self, idx, asset, param):
-        values = {}
-        try:
-            retrofitted = asset['retrofitted']
-        except ValueError:
-            retrofitted = None
-        asset_id = asset['id']
+            ids = numpy.concatenate([array['id'] for array in asset_arrays])
+            uniq, first = numpy.unique(ids, return_index=True)
+            if len(uniq) < len(ids):
+                dupl = numpy.ones(len(ids), bool)
+                dupl[first] = False
+                raise nrml.DuplicatedID(ids[dupl.argmax()])
         prefix = param['asset_prefix']
-        # FIXME: in case of an exposure split in CSV files the line number
-        # is None because param['fname'] points to the .xml file :-(
-        taxonomy = asset['taxonomy']
-        number = asset['number']
-        location = asset['lon'], asset['lat']
-        if param['region'] and not geometry.Point(*location).within(
-                param['region']):
-            param['out_of_region'] += 1
-            return
-        dic = {tagname: asset[tagname] for tagname in self.tagcol.tagnames
-               if tagname not in ('country', 'exposure') and
-               asset[tagname] != '?'}
-        dic['taxonomy'] = taxonomy
-        idxs = self.tagcol.add_tags(dic, prefix)
-        tot_occupants = 0
-        num_occupancies = 0
-        for name in asset.dtype.names:
+        region = param['region'] and prep(param['region'])
+        arrays = []
+        start = 0
+        for array in asset_arrays:
+            ordinals = numpy.arange(start, start + len(array))
+            start += len(array)
+            if region:
+                ok = vectorized.contains(region, F64(array['lon']),
+                                         F64(array['lat']))
+                param['out_of_region'] += len(array) - ok.sum()
+                array, ordinals = array[ok], ordinals[ok]
+            if len(array):
+                arrays.append(self._build_array(array, ordinals, param))
+        self.array = _concat(arrays) if arrays else numpy.zeros(
+            0, [('id', (numpy.string_, valid.ASSET_ID_LENGTH)),
+                ('number', F64)])
+
+    def _build_array(self, array, ordinals, param):
+        prefix = param['asset_prefix']
+        names = array.dtype.names
+        values = {}
+        occupants = []
+        for name in names:
             if name.startswith('value-'):
-                values[name[6:]] = asset[name]
+                values[name] = F64(array[name])
             elif name.startswith('occupants_'):
-                values[name] = occ = float(asset[name])
-                tot_occupants += occ
-                num_occupancies += 1
-        if num_occupancies:
+                values[name] = occ = F64(array[name])
+                occupants.append(occ)
+        if occupants:
             # store average occupants
-            values['occupants'] = tot_occupants / num_occupancies
+            values['value-occupants'] = sum(occupants) / len(occupants)
 
         # check if we are not missing a cost type
-        missing = param['relevant_cost_types'] - set(values)
+        missing = param['relevant_cost_types'] - set(
+            name[6:] for name in values if name.startswith('value-'))
         if missing and missing <= param['ignore_missing_costs']:
             logging.warning(
-                'Ignoring asset %s, missing cost type(s): %s',
-                asset_id, ', '.join(missing))
+                'Ignoring %d asset(s), missing cost type(s): %s',
+                len(array), ', '.join(missing))
             for cost_type in missing:
-                values[cost_type] = None
+                values['value-' + cost_type] = numpy.full(
+                    len(array), numpy.nan)
         elif missing and 'damage' not in param['calculation_mode']:
             # missing the costs is okay for damage calculators
             raise ValueError("Invalid Exposure. "
                              "Missing cost %s for asset %s" % (
-                                 missing, asset_id))
-        try:
-            area = asset['area']
-        except ValueError:
-            area = 1
-        ass = Asset(prefix + asset_id, idx, idxs, number, location, values,
-                    area, retrofitted, self.cost_calculator)
-        self.assets.append(ass)
+                                 missing, array['id'][0]))
+
+        tagnames = self.tagcol.tagnames
+        dtlist = [('id', (numpy.string_, valid.ASSET_ID_LENGTH)),
+                  ('ordinal', U32), ('lon', F64), ('lat', F64),
+                  ('number', F64), ('area', F64)]
+        if 'retrofitted' in names:
+            dtlist.append(('retrofitted', F64))
+        dtlist.extend((name, F64) for name in values)
+        dtlist.extend((tagname, U32) for tagname in tagnames)
+        arr = numpy.zeros(len(array), dtlist)
+        arr['id'] = numpy.char.add(prefix, array['id'].astype(str))
+        arr['ordinal'] = ordinals
+        for name in ('lon', 'lat', 'number') + (
+                ('retrofitted',) if 'retrofitted' in names else ()):
+            arr[name] = array[name]
+        arr['area'] = array['area'] if 'area' in names else 1
+        for name, vals in values.items():
+            arr[name] = vals
+        for tagname in tagnames:
+            if tagname in ('exposure', 'country'):
+                arr[tagname] = self.tagcol.add(tagname, prefix)
+                continue
+            tagvalues = array[tagname]
+            invalid = ['', '*', '?*']
+            if tagname == 'taxonomy':
+                invalid.append('?')
+            bad = numpy.isin(tagvalues, invalid)
+            if bad.any():
+                raise ValueError('Invalid tagvalue="%s"' % tagvalues[bad][0])
+            arr[tagname] = self.tagcol.add_many(tagname, tagvalues)
+        return arr
+
+    @property
+    def assets(self):
+        """
+        :returns: a list of :class:`Asset` instances (slow, for the tools
+                  still requiring asset objects, like the GED4ALL importer)
+        """
+        names = self.array.dtype.names
+        valnames = [name for name in names
+                    if name.startswith(('value-', 'occupants_'))]
+        assets = []
+        for rec in self.array:
+            values = {name[6:] if name.startswith('value-') else name:
+                      rec[name] for name in valnames}
+            for name, val in values.items():
+                if numpy.isnan(val):  # missing cost type
+                    values[name] = None
+            tagidxs = [rec[tagname] for tagname in self.tagcol.tagnames]
+            retrofitted = rec['retrofitted'] if 'retrofitted' in names \
+                else None
+            ass = Asset(decode(rec['id']), rec['ordinal'], tagidxs,
+                        rec['number'], (rec['lon'], rec['lat']), values,
+                        rec['area'], retrofitted, self.cost_calculator)
+            # used by the GED4ALL importer
+            ass.tags = self.tagcol.get_tagdict(tagidxs)
+            assets.append(ass)
+        return assets
 
     def get_mesh_assets_by_site(self):
         """
-        :returns: (Mesh instance, assets_by_site list)
+        :returns: (Mesh instance, assets_by_site list of arrays)
         """
-        assets_by_loc = general.groupby(self, key=lambda a: a.location)
-        mesh = geo.Mesh.from_coords(list(assets_by_loc))
-        assets_by_site = [
-            assets_by_loc[lonlat] for lonlat in zip(mesh.lons, mesh.lats)]
-        return mesh, assets_by_site
+        # sort by location, preserving the order of the assets on each site
+        array = self.array[
+            numpy.lexsort((self.array['lat'], self.array['lon']))]
+        lons, lats = array['lon'], array['lat']
+        new = numpy.ones(len(array), bool)
+        new[1:] = (lons[1:] != lons[:-1]) | (lats[1:] != lats[:-1])
+        starts = numpy.where(new)[0]
+        mesh = geo.Mesh(lons[starts], lats[starts])
+        return mesh, numpy.split(array, starts[1:])
 
     def __iter__(self):
         return iter(self.assets)
 
     def __repr__(self):
         return '<%s with %s assets>' % (self.__class__.__name__,
-                                        len(self.assets))
+                                        len(self.array))
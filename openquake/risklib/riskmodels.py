@@ -192,7 +192,7 @@ def rescale(curves, values):
     A, _, C = curves.shape
     assert A == len(values), (A, len(values))
     array = numpy.zeros((A, C), loss_poe_dt)
-    array['loss'] = [c * v for c, v in zip(curves[:, 0], values)]
+    array['loss'] = curves[:, 0] * values[:, None]
     array['poe'] = curves[:, 1]
     return array
 
@@ -272,9 +272,10 @@ class RiskModel(object):
         lratios = self.loss_ratios[loss_type]
         imls = self.hazard_imtls[vf.imt]
         values = assets['value-' + loss_type].to_numpy()
-        lrcurves = numpy.array(
-            [scientific.classical(vf, imls, hazard_curve, lratios)] * n)
-        return rescale(lrcurves, values)
+        # the loss ratio curve is computed once and broadcast to the assets
+        lrcurve = scientific.classical(vf, imls, hazard_curve, lratios)
+        return rescale(numpy.broadcast_to(lrcurve, (n,) + lrcurve.shape),
+                       values)
 
     def classical_bcr(self, loss_type, assets, hazard,
                       col=None, rng=None):
@@ -368,7 +369,8 @@ class RiskModel(object):
         gmvs = gmf_df[col].to_numpy()
         ffs = self.risk_functions[loss_type, 'fragility']
         damages = scientific.scenario_damage(ffs, gmvs).T
-        return numpy.array([damages] * len(assets))
+        # a read-only view, without copying the damages for each asset
+        return numpy.broadcast_to(damages, (len(assets),) + damages.shape)
 
     event_based_damage = scenario_damage
 
@@ -459,10 +461,10 @@ class CompositeRiskModel(collections.abc.Mapping):
 
     def compute_csq(self, asset, fractions, loss_type):
         """
-        :param asset: asset record
-        :param fractions: array of probabilies of shape (E, D)
+        :param asset: asset record or array of A asset records
+        :param fractions: array of probabilies of shape (E, D) or (A, E, D)
         :param loss_type: loss type as a string
-        :returns: a dict consequence_name -> array of length E
+        :returns: a dict consequence_name -> array of shape E or (A, E)
         """
         csq = {}  # cname -> values per event
         for byname, coeffs in self.consdict.items():
@@ -470,8 +472,19 @@ class CompositeRiskModel(collections.abc.Mapping):
             if len(coeffs):
                 cname, tagname = byname.split('_by_')
                 func = scientific.consequence[cname]
-                cs = coeffs[asset[tagname]][loss_type]
-                csq[cname] = func(cs, asset, fractions[:, 1:], loss_type)
+                if asset.ndim == 0:  # single asset
+                    cs = coeffs[asset[tagname]][loss_type]
+                    csq[cname] = func(cs, asset, fractions[:, 1:], loss_type)
+                    continue
+                # the assets are usually of the same taxonomy
+                res = numpy.zeros(fractions.shape[:-1])
+                tags = asset[tagname]
+                for tag in numpy.unique(tags):
+                    ok = tags == tag
+                    cs = coeffs[tag][loss_type]
+                    res[ok] = func(cs, asset[ok], fractions[ok, :, 1:],
+                                   loss_type)
+                csq[cname] = res
         return csq
 
     def init(self):
@@ -712,6 +725,92 @@ class CompositeRiskModel(collections.abc.Mapping):
             sec_loss.update(dic, assets)
         return dic
 
+    def get_vtables(self):
+        """
+        :returns: a dictionary loss_type -> VulnerabilityTable, or an empty
+                  dictionary if some taxonomy has multiple risk models or
+                  a vulnerability function which is not LN/BT
+        """
+        vtables = {}
+        for lt in self.loss_types:
+            vfs = []
+            for items in self.tmap[lt]:
+                if len(items) > 1:  # multiple weighted risk models
+                    return {}
+                [(key, weight)] = items
+                if key not in self._riskmodels:  # i.e. the taxonomy "?"
+                    vfs.append(None)
+                    continue
+                vf = self._riskmodels[key].risk_functions.get(
+                    (lt, 'vulnerability'))
+                if vf is None or vf.distribution_name not in ('LN', 'BT'):
+                    return {}
+                vfs.append(vf)
+            vtables[lt] = scientific.VulnerabilityTable(vfs)
+        return vtables
+
+    def get_event_losses(self, assets_df, gmf_df, vtables, rndgen=None):
+        """
+        Compute the losses for all the assets at once, by using the packed
+        vulnerability tables; it is equivalent to calling .get_output for
+        each taxonomy, including the order of the random draws.
+
+        :param assets_df: a DataFrame of assets with fields site_id, taxonomy
+        :param gmf_df: a DataFrame of GMFs with fields sid, eid, gmv_...
+        :param vtables: a dictionary loss_type -> VulnerabilityTable
+        :param rndgen: a MultiEventRNG instance or None
+        :returns: a dictionary loss_type -> DataFrame(eid, aid, loss, variance)
+        """
+        oq = self.oqparam
+        alias = {imt: 'gmv_%d' % i for i, imt in enumerate(self.primary_imtls)}
+        dic = dict(aid=assets_df.index.to_numpy(),
+                   taxi=assets_df.taxonomy.to_numpy())
+        for lt in self.loss_types:
+            if lt == 'occupants' and oq.time_event:
+                dic[lt] = assets_df['occupants_%s' % oq.time_event].to_numpy()
+            else:
+                dic[lt] = assets_df['value-' + lt].to_numpy()
+        adf = pandas.DataFrame(dic, assets_df.site_id.to_numpy())
+        df = pandas.DataFrame(
+            {col: gmf_df[col].to_numpy() for col in gmf_df.columns
+             if col != 'sid'}, gmf_df.sid.to_numpy()).join(adf, how='inner')
+        # sorting by taxonomy gives the same order of the taxonomy loop
+        df = df.iloc[numpy.argsort(df.taxi.to_numpy(), kind='stable')]
+        eids = df.eid.to_numpy()
+        aids = df.aid.to_numpy()
+        taxis = df.taxi.to_numpy()
+        means, covs, losses = {}, {}, {}
+        for lt in self.loss_types:
+            vt = vtables[lt]
+            gmvs = numpy.zeros(len(df))
+            imts = numpy.array(vt.imts, object)[taxis]
+            for imt in set(vt.imts) - {None}:
+                ok = imts == imt
+                gmvs[ok] = df[alias.get(imt, imt)].to_numpy()[ok]
+            means[lt], covs[lt] = vt.interpolate(gmvs, taxis)
+            losses[lt] = df[lt].to_numpy() * means[lt]
+        if rndgen:
+            # sampling the taxonomies in order, to keep the random sequences
+            uniq, starts = numpy.unique(taxis, return_index=True)
+            stops = numpy.append(starts[1:], len(taxis))
+            for taxi, start, stop in zip(uniq, starts, stops):
+                slc = slice(start, stop)
+                for lt in self.loss_types:
+                    vt = vtables[lt]
+                    if not vt.has_covs[taxi]:
+                        continue
+                    sample = (rndgen.lognormal if vt.distnames[taxi] == 'LN'
+                              else rndgen.beta)
+                    losses[lt][slc] = df[lt].to_numpy()[slc] * sample(
+                        eids[slc], means[lt][slc], covs[lt][slc])
+        out = {}
+        for lt in self.loss_types:
+            ok = losses[lt] > oq.minimum_asset_loss[lt]
+            out[lt] = pandas.DataFrame(dict(
+                eid=eids[ok], aid=aids[ok], loss=losses[lt][ok],
+                variance=(losses[lt][ok] * covs[lt][ok]) ** 2))
+        return out
+
     def get_rmodels_weights(self, loss_type, taxidx):
         """
         :returns: a list of weighted risk models for the given taxonomy index
@@ -206,16 +206,9 @@ class VulnerabilityFunction(object):
            DataFrame of interpolated loss ratios and covs
         """
         gmvs = gmf_df[col].to_numpy()
-        dic = dict(eid=gmf_df.eid.to_numpy(),
-                   mean=numpy.zeros(len(gmvs)),
-                   cov=numpy.zeros(len(gmvs)))
-        # gmvs are clipped to max(iml)
-        gmvs_curve = numpy.piecewise(
-            gmvs, [gmvs > self.imls[-1]], [self.imls[-1], lambda x: x])
-        ok = gmvs_curve >= self.imls[0]  # indices over the minimum
-        curve_ok = gmvs_curve[ok]
-        dic['mean'][ok] = self._mlr_i1d(curve_ok)
-        dic['cov'][ok] = self._cov_for(curve_ok)
+        means, covs = VulnerabilityTable([self]).interpolate(
+            gmvs, numpy.zeros(len(gmvs), U32))
+        dic = dict(eid=gmf_df.eid.to_numpy(), mean=means, cov=covs)
         return pandas.DataFrame(dic, gmf_df.sid)
 
     def survival(self, loss_ratio, mean, stddev):
@@ -478,6 +471,78 @@ class VulnerabilityFunctionWithPMF(VulnerabilityFunction):
         return '<VulnerabilityFunctionWithPMF(%s, %s)>' % (self.id, self.imt)
 
 
+class VulnerabilityTable(object):
+    """
+    Packed representation of T continuous vulnerability functions, one per
+    taxonomy index: the IMLs, mean loss ratios and covs of all functions
+    are concatenated in flat arrays and the boundaries of the t-th function
+    are given by `offsets[t]:offsets[t + 1]`.
+
+    :param vfs: a list of T VulnerabilityFunctions, with None for the
+                taxonomies without a vulnerability function
+    """
+    def __init__(self, vfs):
+        imls, mlrs, covs, sizes = [], [], [], []
+        self.imts, self.distnames, self.has_covs = [], [], []
+        for vf in vfs:
+            if vf is None:  # a single infinite IML, so the ratios are zero
+                imls.append([numpy.inf])
+                mlrs.append([0.])
+                covs.append([0.])
+                self.imts.append(None)
+                self.distnames.append(None)
+                self.has_covs.append(False)
+            else:
+                imls.append(vf.imls)
+                mlrs.append(vf.mean_loss_ratios)
+                covs.append(vf.covs)
+                self.imts.append(vf.imt)
+                self.distnames.append(vf.distribution_name)
+                self.has_covs.append(bool(vf.covs.any()))
+            sizes.append(len(imls[-1]))
+        self.imls = numpy.concatenate(imls).astype(F64)
+        self.mlrs = numpy.concatenate(mlrs).astype(F64)
+        self.covs = numpy.concatenate(covs).astype(F64)
+        self.offsets = numpy.zeros(len(vfs) + 1, int)
+        self.offsets[1:] = numpy.cumsum(sizes)
+
+    def interpolate(self, gmvs, taxidxs):
+        """
+        Linear interpolation of the mean loss ratios and covs, with the
+        same semantics of VulnerabilityFunction.interpolate: the gmvs are
+        clipped to the maximum IML and the gmvs below the minimum IML
+        give zeros.
+
+        :param gmvs: an array of N ground motion values
+        :param taxidxs: an array of N taxonomy indices
+        :returns: two arrays of N mean loss ratios and covs
+        """
+        gmvs = F64(gmvs)
+        means = numpy.zeros(len(gmvs))
+        covs = numpy.zeros(len(gmvs))
+        start = self.offsets[taxidxs]
+        stop = self.offsets[taxidxs + 1]
+        ok = gmvs >= self.imls[start]  # indices over the minimum
+        gmvs = numpy.minimum(gmvs[ok], self.imls[stop[ok] - 1])
+        start, stop = start[ok], stop[ok]
+        # vectorized binary search of the leftmost IML >= gmv
+        lo, hi = start.copy(), stop.copy()
+        while (lo < hi).any():
+            mid = (lo + hi) // 2
+            less = self.imls[numpy.minimum(mid, stop - 1)] < gmvs
+            active = lo < hi
+            lo = numpy.where(active & less, mid + 1, lo)
+            hi = numpy.where(active & ~less, mid, hi)
+        # consider the interval idx - 1, idx as scipy.interpolate.interp1d
+        idx = numpy.maximum(lo, start + 1)
+        x_lo, x_hi = self.imls[idx - 1], self.imls[idx]
+        for ys, out in [(self.mlrs, means), (self.covs, covs)]:
+            y_lo, y_hi = ys[idx - 1], ys[idx]
+            slope = (y_hi - y_lo) / (x_hi - x_lo)
+            out[ok] = slope * (gmvs - x_lo) + y_lo
+        return means, covs
+
+
 # this is meant to be instantiated by riskmodels.get_risk_functions
 class VulnerabilityModel(dict):
     """
@@ -739,6 +804,38 @@ def _alpha_beta(mean, stddev):
     return c * mean ** 2, c * (mean - mean ** 2)
 
 
+def multinomial(rng, numbers, fractions):
+    """
+    Vectorized multinomial sampling by sequential binomial decomposition,
+    with D - 1 calls to ``rng.binomial`` whatever the number of draws.
+
+    :param rng: a numpy Generator (or RandomState)
+    :param numbers: integers broadcastable to ``fractions.shape[:-1]``
+    :param fractions: array of shape (..., D) normalized on the last axis
+    :returns: array of U32 with the same shape as ``fractions``
+
+    >>> rng = numpy.random.default_rng(42)
+    >>> multinomial(rng, [10, 20], numpy.array([[.8, .1, .1], [.5, .5, 0]]))
+    array([[ 7,  1,  2],
+           [10, 10,  0]], dtype=uint32)
+    """
+    shp = fractions.shape[:-1]
+    D = fractions.shape[-1]
+    ddd = numpy.zeros(fractions.shape, U32)
+    left = numpy.zeros(shp, numpy.int64)  # the draws still to assign
+    left[:] = numpy.asarray(numbers).astype(numpy.int64)
+    rest = numpy.ones(shp)  # the probability still to assign
+    for d in range(D - 1):
+        frac = fractions[..., d]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            prob = numpy.clip(numpy.where(rest > 0, frac / rest, 0.), 0., 1.)
+        ddd[..., d] = n = rng.binomial(left, prob)
+        left -= n
+        rest -= frac
+    ddd[..., D - 1] = left
+    return ddd
+
+
 class MultiEventRNG(object):
     """
     An object ``MultiEventRNG(master_seed, eids, asset_correlation=0)``
@@ -757,7 +854,7 @@ class MultiEventRNG(object):
     array([0.4372343 , 0.57308132, 0.56392573])
     >>> fractions = numpy.array([[[.8, .1, .1]]])
     >>> rng.discrete_dmg_dist([0], fractions, [10])
-    array([[[8, 2, 0]]], dtype=uint32)
+    array([[[10,  0,  0]]], dtype=uint32)
     """
     def __init__(self, master_seed, eids, asset_correlation=0):
         self.master_seed = master_seed
@@ -813,8 +910,9 @@ class MultiEventRNG(object):
 
     def discrete_dmg_dist(self, eids, fractions, numbers):
         """
-        Converting fractions into discrete damage distributions using bincount
-        and rng.choice.
+        Converting fractions into discrete damage distributions using
+        a multinomial sampling vectorized on the assets, with the
+        random generator of each event.
 
         :param eids: E event IDs
         :param fractions: array of shape (A, E, D)
@@ -824,14 +922,10 @@ class MultiEventRNG(object):
         A, E, D = fractions.shape
         assert len(eids) == E, (len(eids), E)
         assert len(numbers) == A, (len(eids), A)
+        fractions = fractions / fractions.sum(axis=2)[:, :, None]
         ddd = numpy.zeros(fractions.shape, U32)
         for e, eid in enumerate(eids):
-            choice = self.rng[eid].choice
-            for a, n in enumerate(numbers):
-                frac = fractions[a, e]  # shape D
-                states = choice(D, n, p=frac/frac.sum())  # n states
-                # ex. [0, 0, 0, 1, 0, 0, 0, 1, 0, 0], 8 times 0, 2 times 1
-                ddd[a, e] = numpy.bincount(states, minlength=D)
+            ddd[:, e] = multinomial(self.rng[eid], numbers, fractions[:, e])
         return ddd
 
 
@@ -1033,11 +1127,11 @@ def insured_losses(losses, deductible, insured_limit):
     - if the loss is 3 (< 5) the company does not pay anything
     - if the loss is 20 the company pays 20 - 5 = 15
     - if the loss is 101 the company pays 100 - 5 = 95
+
+    The deductible and the limit can also be arrays with the same length
+    as the losses.
     """
-    return numpy.piecewise(
-        losses,
-        [losses < deductible, losses > insured_limit],
-        [0, insured_limit - deductible, lambda x: x - deductible])
+    return numpy.clip(losses, deductible, insured_limit) - deductible
 
 
 def insured_loss_curve(curve, deductible, insured_limit):
@@ -1154,7 +1248,9 @@ def average_loss(lc):
            loss bin width.
     """
     losses, poes = (lc['loss'], lc['poe']) if lc.dtype.names else lc
-    return -pairwise_diff(losses) @ pairwise_mean(poes)
+    # works also on arrays of curves, with shape (..., C)
+    return ((losses[..., 1:] - losses[..., :-1]) *
+            (poes[..., 1:] + poes[..., :-1])).sum(axis=-1) / 2
 
 
 def normalize_curves_eb(curves):
@@ -1302,6 +1398,71 @@ def losses_by_period(losses, return_periods, num_events=None, eff_time=None):
     return curve
 
 
+
+def losses_by_period_batch(losses, offsets, return_periods, num_events,
+                           eff_time=None):
+    """
+    Vectorized version of :func:`losses_by_period` computing the curves
+    for G groups of losses at once.
+
+    :param losses: an array of N losses, concatenated group by group
+    :param offsets: an array of G + 1 offsets (CSR layout)
+    :param return_periods: return periods of interest
+    :param num_events: the number of events, a scalar or an array of G values
+    :param eff_time: investigation_time * ses_per_logic_tree_path
+    :returns: an array of shape (G, P), possibly with NaNs
+
+    >>> losses = [3, 2, 3.5, 4, 3, 23, 11, 2, 1, 4, 5, 7, 8, 9, 13, 2, 3]
+    >>> losses_by_period_batch(
+    ...     losses, [0, 15, 17], [1, 2, 5, 10, 20, 50, 100], 20)
+    array([[ 0. ,  0. ,  0. ,  3.5,  8. , 13. , 23. ],
+           [ 0. ,  0. ,  0. ,  0. ,  0. ,  2. ,  3. ]])
+    """
+    losses = numpy.asarray(losses)
+    offsets = numpy.asarray(offsets)
+    return_periods = numpy.asarray(return_periods)
+    counts = numpy.diff(offsets)
+    G, P = len(counts), len(return_periods)
+    num_events = numpy.broadcast_to(num_events, G)
+    if (num_events < counts).any():
+        g = numpy.argmax(num_events < counts)
+        raise ValueError(
+            'There are not enough events (%d<%d) to compute the loss curve'
+            % (num_events[g], counts[g]))
+    if eff_time is None:
+        eff_time = return_periods[-1]
+    # sort all the segments at once
+    gids = numpy.repeat(numpy.arange(G), counts)
+    losses = losses[numpy.lexsort((losses, gids))]
+    logr = numpy.log(return_periods)
+    curves = numpy.zeros((G, P), losses.dtype)
+    # the periods depend only on the number of events, i.e. on the rlz
+    uniq, inv = numpy.unique(num_events, return_inverse=True)
+    for u, E in enumerate(uniq):
+        gs, = numpy.where(inv == u)
+        periods = eff_time / numpy.arange(E, 0., -1)
+        logp = numpy.log(periods)
+        ok = (return_periods >= periods[0]) & (return_periods <= periods[-1])
+        x = logr[ok]
+        # index of the left point, as in numpy.interp
+        j = numpy.searchsorted(logp, x, 'right') - 1
+        last = j == E - 1
+        j1 = numpy.where(last, j, j + 1)
+        # losses are padded with zeros on the left up to E events
+        start = offsets[gs, None] - E + counts[gs, None]  # shape (g, 1)
+        y0 = numpy.where(j >= E - counts[gs, None],
+                         losses[numpy.clip(start + j, 0, None)], 0.)
+        y1 = numpy.where(j1 >= E - counts[gs, None],
+                         losses[numpy.clip(start + j1, 0, None)], 0.)
+        y0, y1 = F64(y0), F64(y1)
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            slope = (y1 - y0) / (logp[j1] - logp[j])
+            res = numpy.where(last, y0, slope * (x - logp[j]) + y0)
+        curves[gs[:, None], numpy.where(ok)[0]] = res
+        curves[gs[:, None], return_periods > periods[-1]] = numpy.nan
+    return curves
+
+
 class LossCurvesMapsBuilder(object):
     """
     Build losses curves and maps for all loss types at the same time.
@@ -1327,15 +1488,30 @@ class LossCurvesMapsBuilder(object):
             self.poes = 1. - numpy.exp(
                 - risk_investigation_time / return_periods)
 
-    # used in post_risk
     def build_curve(self, losses, rlzi=0):
         return losses_by_period(
             losses, self.return_periods, self.num_events[rlzi], self.eff_time)
 
+    # used in post_risk
+    def build_curves(self, losses, offsets, rlzs=0):
+        """
+        :param losses: an array of losses, concatenated group by group
+        :param offsets: an array of G + 1 offsets
+        :param rlzs: the realization index for each group
+        :returns: an array of curves of shape (G, P)
+        """
+        num_events = numpy.vectorize(self.num_events.__getitem__)(rlzs)
+        return losses_by_period_batch(
+            losses, offsets, self.return_periods, num_events, self.eff_time)
+
 
 class InsuredLosses(object):
     """
     There is an insured loss for each loss type in the policy dictionary.
+    The policy arrays have shape (P, 2) or (P, Y, 2), being P the number
+    of policies and Y the number of layers, with (deductible, limit)
+    pairs expressed as fractions of the asset value; the insured loss
+    is the sum of the insured losses on each layer.
     """
     def __init__(self, policy_name, policy_dict):
         self.policy_name = policy_name
@@ -1348,22 +1524,31 @@ class InsuredLosses(object):
         :param asset_df: a DataFrame of assets with index "ordinal"
         """
         for lt in self.policy_dict:
-            o = out[lt]
-            policy = self.policy_dict[lt]
-            eids, aids, ilosses = [], [], []
-            for aid, df in o.groupby('aid'):
-                asset = asset_df.loc[aid]
-                avalue = asset['value-' + lt]
-                policy_idx = asset[self.policy_name]
-                ded, lim = policy[policy_idx]
-                ins = insured_losses(
-                    df.loss.to_numpy(), ded * avalue, lim * avalue)
-                eids.extend(df.eid)
-                aids.extend([aid] * len(df))
-                ilosses.extend(ins)
-            out[lt + '_ins'] = pandas.DataFrame(
-                dict(eid=U32(eids), aid=U32(aids), loss=ilosses,
-                     variance=numpy.zeros_like(ilosses)))
+            out[lt + '_ins'] = self.apply(lt, out[lt], asset_df)
+
+    def apply(self, lt, df, asset_df):
+        """
+        :param lt: a loss type with a policy
+        :param df: a DataFrame of ground-up losses (eid, aid, loss, ...)
+        :param asset_df: a DataFrame of assets with index "ordinal"
+        :returns: a DataFrame of insured losses (eid, aid, loss, variance)
+        """
+        aids = df.aid.to_numpy()
+        idxs = asset_df.index.get_indexer(aids)
+        avalues = asset_df['value-' + lt].to_numpy()[idxs]
+        policy = self.policy_dict[lt]
+        if policy.ndim == 2:  # single layer
+            policy = policy[:, None]
+        # shape (N, Y, 2)
+        dedlim = policy[asset_df[self.policy_name].to_numpy()[idxs]]
+        dedlim *= avalues[:, None, None]
+        losses = df.loss.to_numpy()
+        ilosses = numpy.zeros(len(losses), losses.dtype)
+        for y in range(dedlim.shape[1]):
+            ilosses += insured_losses(losses, dedlim[:, y, 0], dedlim[:, y, 1])
+        return pandas.DataFrame(
+            dict(eid=U32(df.eid.to_numpy()), aid=U32(aids), loss=ilosses,
+                 variance=numpy.zeros_like(ilosses)))
 
 
 # not used anymore
@@ -1396,12 +1581,14 @@ consequence = CallableDict()
 def economic_losses(coeffs, asset, dmgdist, loss_type):
     """
     :param coeffs: coefficients per damage state
-    :param asset: asset record
-    :param dmgdist: an array of probabilies of shape (E, D - 1)
+    :param asset: asset record or array of A asset records
+    :param dmgdist:
+        an array of probabilies of shape (E, D - 1) or (A, E, D - 1)
     :param loss_type: loss type string
-    :returns: array of economic losses of length E
+    :returns: array of economic losses of shape E or (A, E)
     """
-    return dmgdist @ coeffs * asset['value-' + loss_type]
+    values = numpy.asarray(asset['value-' + loss_type])
+    return dmgdist @ coeffs * values[..., None]
 
 
 if __name__ == '__main__':
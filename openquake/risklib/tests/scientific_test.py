@@ -310,6 +310,22 @@ class VulnerabilityLossRatioStepsTestCase(unittest.TestCase):
         pickle.loads(pickle.dumps(vf))
 
 
+class VulnerabilityTableTestCase(unittest.TestCase):
+    def test_interpolate(self):
+        vf1 = scientific.VulnerabilityFunction(
+            'V1', 'PGA', [0.1, 0.2, 0.4], [0.1, 0.3, 0.9], [0.1, 0.2, 0.3])
+        vf2 = scientific.VulnerabilityFunction(
+            'V2', 'SA(0.3)', [0.2, 1], [0.5, 0.7], [0, 0], 'BT')
+        vtable = scientific.VulnerabilityTable([None, vf1, vf2])
+        self.assertEqual(vtable.imts, [None, 'PGA', 'SA(0.3)'])
+        self.assertEqual(vtable.has_covs, [False, True, False])
+        gmvs = numpy.array([0.3, 0.05, 0.2, 0.3, 0.5, 0.1, 0.6, 2.])
+        taxidxs = numpy.array([0, 1, 1, 1, 1, 2, 2, 2])
+        means, covs = vtable.interpolate(gmvs, taxidxs)
+        aae(means, [0, 0, 0.3, 0.6, 0.9, 0, 0.6, 0.7])
+        aae(covs, [0, 0, 0.2, 0.25, 0.3, 0, 0, 0])
+
+
 class FragilityFunctionTestCase(unittest.TestCase):
     def test_dda_iml_above_range(self):
         # corner case where we have a ground motion value
@@ -436,6 +452,21 @@ class InsuredLossesTestCase(unittest.TestCase):
         numpy.testing.assert_allclose((m1 * l1 + m2 * l2) / (l1 + l2), m)
 
 
+    def test_policy_layers(self):
+        asset_df = pandas.DataFrame({'value-structural': [100., 200.],
+                                     'policy': [1, 2]}, index=[3, 5])
+        # policy 1 has a single layer, policy 2 has two layers
+        policy = numpy.array([[[0, 0], [0, 0]],
+                              [[.1, .5], [0, 0]],
+                              [[.1, .3], [.3, .8]]])
+        ins = scientific.InsuredLosses('policy', {'structural': policy})
+        df = pandas.DataFrame(dict(eid=[0, 0, 1, 1], aid=[3, 5, 3, 5],
+                                   loss=[5., 50., 60., 120.]))
+        out = {'structural': df}
+        ins.update(out, asset_df)
+        numpy.testing.assert_allclose(
+            out['structural_ins'].loss, [0, 30, 40, 100])
+
 class InsuredLossCurveTestCase(unittest.TestCase):
     def test_curve(self):
         curve = numpy.array(
@@ -564,3 +595,51 @@ class LossesByEventTestCase(unittest.TestCase):
         full = scientific.losses_by_period(
             losses, periods, eff_time=2*eff_time)
         aae(mean, full, rtol=1E-2)  # converges only at 1%
+
+
+    def test_batch(self):
+        # the batched curves are identical to the curves group by group
+        periods = [10, 20, 50, 100, 150, 200, 250, 500, 1000]
+        rng = numpy.random.default_rng(42)
+        counts = [1000, 5, 600, 800]
+        num_events = [1000, 1000, 800, 1200]
+        losses = 10**rng.random(sum(counts))
+        offsets = numpy.cumsum([0] + counts)
+        curves = scientific.losses_by_period_batch(
+            losses, offsets, periods, num_events, eff_time=500)
+        for g, curve in enumerate(curves):
+            expected = scientific.losses_by_period(
+                losses[offsets[g]:offsets[g + 1]], periods, num_events[g],
+                eff_time=500)
+            numpy.testing.assert_equal(curve, expected)
+
+class MultinomialTestCase(unittest.TestCase):
+    def test_sampling(self):
+        rng = numpy.random.default_rng(42)
+        fractions = numpy.array([[.7, .2, .1, 0.], [.1, .2, .3, .4]])
+        fractions = numpy.broadcast_to(fractions, (5000, 2, 4))
+        numbers = numpy.array([10, 20, 30, 40, 50] * 1000)[:, None]
+        ddd = scientific.multinomial(rng, numbers, fractions)
+        self.assertEqual(ddd.dtype, numpy.uint32)
+        # the number of buildings is preserved
+        numpy.testing.assert_equal(ddd.sum(axis=2), numpy.broadcast_to(
+            numbers, (5000, 2)))
+        # the damage state with zero probability is never sampled
+        self.assertEqual(ddd[:, 0, 3].sum(), 0)
+        # the mean fractions are close to the expected ones
+        aae(ddd.sum(axis=0) / ddd.sum(axis=(0, 2))[:, None],
+            fractions[0], atol=2E-3)
+
+    def test_discrete_dmg_dist(self):
+        rng = scientific.MultiEventRNG(42, [0, 1, 2])
+        fractions = numpy.zeros((4, 3, 3))
+        fractions[:] = [.6, .3, .1]
+        numbers = numpy.array([10, 100, 1000, 10000])
+        ddd = rng.discrete_dmg_dist([0, 1, 2], fractions, numbers)
+        self.assertEqual(ddd.shape, (4, 3, 3))
+        numpy.testing.assert_equal(ddd.sum(axis=2), [[10] * 3, [100] * 3,
+                                                     [1000] * 3, [10000] * 3])
+        # the samples depend only on the event, not on the other events
+        rng = scientific.MultiEventRNG(42, [0, 1, 2])
+        ddd2 = rng.discrete_dmg_dist([2], fractions[:, 2:], numbers)
+        numpy.testing.assert_equal(ddd2[:, 0], ddd[:, 2])
@@ -16,6 +16,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with OpenQuake.  If not, see <http://www.gnu.org/licenses/>.
 import os
+import shutil
 import psutil
 import getpass
 import operator
@@ -378,6 +379,8 @@ def del_calc(db, job_id, user, force=False):
         os.remove(fname)
     except OSError as exc:  # permission error
         return {"error": 'Could not remove %s: %s' % (fname, exc)}
+    # remove the cache of the extracted data, if any
+    shutil.rmtree(path + '_extract', ignore_errors=True)
     return {"success": fname}
 
 
@@ -402,6 +405,24 @@ def log(db, job_id, timestamp, level, process, message):
        'VALUES (?X)', (job_id, timestamp, level, process, message))
 
 
+
+def log_many(db, records):
+    """
+    Write several log records in the database in a single transaction.
+
+    :param db:
+        a :class:`openquake.server.dbapi.Db` instance
+    :param records:
+        a list of tuples (job_id, timestamp, level, process, message)
+    """
+    if not records:
+        return
+    with db:  # commit or rollback
+        if db.conn.isolation_level is None:  # autocommit mode
+            db('BEGIN')
+        db.insert('log', 'job_id timestamp level process message'.split(),
+                  records)
+
 def get_log(db, job_id):
     """
     Extract the logs as a big string
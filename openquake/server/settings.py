@@ -167,6 +167,10 @@ LOGGING = {
 
 FILE_UPLOAD_MAX_MEMORY_SIZE = 1
 
+# Maximum size in bytes of the cache of the extracted data, stored in the
+# directory <calc_dir>_extract of each completed calculation
+EXTRACT_CACHE_SIZE = 1024 ** 3
+
 # A server name can be specified to customize the WebUI in case of
 # multiple installations of the Engine are available. This helps avoiding
 # confusion between different installations when the WebUI is used
@@ -32,7 +32,7 @@ from urllib.parse import unquote_plus
 from xml.parsers.expat import ExpatError
 from django.http import (
     HttpResponse, HttpResponseNotFound, HttpResponseBadRequest,
-    HttpResponseForbidden)
+    HttpResponseForbidden, StreamingHttpResponse)
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.shortcuts import render
@@ -44,7 +44,7 @@ from openquake.hazardlib import nrml, gsim, valid
 from openquake.commonlib import readinput, oqvalidation, logs, datastore
 from openquake.calculators import base
 from openquake.calculators.export import export
-from openquake.calculators.extract import extract as _extract
+from openquake.calculators.extract import extract as _extract, cached_npz
 from openquake.engine import __version__ as oqversion
 from openquake.engine.export import core
 from openquake.engine import engine
@@ -719,14 +719,17 @@ def extract(request, calc_id, what):
     path = request.get_full_path()
     n = len(request.path_info)
     query_string = unquote_plus(path[n:])
+    # the datastore of a completed calculation does not change anymore,
+    # so the extracted data can be cached
+    cached = job.status == 'complete'
     try:
-        # read the data and save them on a temporary .npz file
         with datastore.read(job.ds_calc_dir + '.hdf5') as ds:
-            fd, fname = tempfile.mkstemp(
-                prefix=what.replace('/', '-'), suffix='.npz')
-            os.close(fd)
-            obj = _extract(ds, what + query_string)
-            hdf5.save_npz(obj, fname)
+            if cached:
+                fname = cached_npz(
+                    ds, what + query_string, job.ds_calc_dir + '_extract',
+                    settings.EXTRACT_CACHE_SIZE)
+            else:
+                obj = _extract(ds, what + query_string)
     except Exception as exc:
         tb = ''.join(traceback.format_tb(exc.__traceback__))
         return HttpResponse(
@@ -735,12 +738,15 @@ def extract(request, calc_id, what):
             content_type='text/plain', status=500)
 
     # stream the data back
-    stream = FileWrapper(open(fname, 'rb'))
-    stream.close = lambda: (FileWrapper.close(stream), os.remove(fname))
-    response = FileResponse(stream, content_type='application/octet-stream')
+    if cached:
+        response = FileResponse(FileWrapper(open(fname, 'rb')),
+                                content_type='application/octet-stream')
+        response['Content-Length'] = str(os.path.getsize(fname))
+    else:  # stream the .npz chunk by chunk, without temporary files
+        response = StreamingHttpResponse(
+            hdf5.gen_npz(obj), content_type='application/octet-stream')
     response['Content-Disposition'] = (
-        'attachment; filename=%s' % os.path.basename(fname))
-    response['Content-Length'] = str(os.path.getsize(fname))
+        'attachment; filename=%s.npz' % what.replace('/', '-'))
     return response
 
 
@@ -83,6 +83,9 @@ extras_require = {
     'osgeo':  [
         'GDAL >= 2.4',
     ],
+    'arrow':  [
+        'pyarrow >= 1.0',  # for the .feather exports
+    ],
     'dev':  [
         'pytest >=4.5',
         'flake8 >=3.5, <3.8',